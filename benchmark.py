@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Benchmark de los flujos de expedientes con una generación sintética de alumnos.
+
+Genera en una carpeta de trabajo:
+    - Excel de alumnos (roster)
+    - Excel de reportes con una hoja por semana (encabezado en B11)
+    - Carpeta de plantillas con .docx llenos de marcadores y la carpeta de evidencias
+    - Fotos de evidencia tipo celular
+y mide cada etapa (leer_tabla_reporte, crear_expedientes, llenar_documentos,
+consolidado, reemplazar_en_docx, ...) para cada tamaño pedido.
+El resultado se escribe en JSON para comparar corridas.
+
+Ejemplos:
+    python benchmark.py --alumnos 50 500 --semanas 30
+    python benchmark.py --alumnos 5000 --semanas 30 --salida bench_5000.json
+    python benchmark.py --alumnos 200 --etapas leer_tabla_reporte consolidado --sin-paralelo
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+from datetime import datetime, timedelta, time
+from time import perf_counter
+
+import main
+
+
+NOMBRES = ["Juan", "Ana", "Luis", "María", "José", "Sofía", "Carlos", "Lucía", "Miguel", "Elena",
+           "Diego", "Paula", "Jorge", "Valeria", "Pedro", "Camila", "Andrés", "Fernanda"]
+APELLIDOS = ["Pérez", "López", "García", "Martínez", "Hernández", "González", "Rodríguez", "Sánchez",
+             "Ramírez", "Torres", "Flores", "Rivera", "Gómez", "Díaz", "Cruz", "Morales", "Reyes", "Ortiz"]
+PROGRAMAS = ["LIC", "ING", "BUNLA", "BIUNLA"]
+DIAS = ["lunes", "martes", "miércoles", "jueves", "viernes"]
+TEMAS = ["Revisión de calificaciones", "Hábitos de estudio", "Orientación vocacional",
+         "Seguimiento de materias", "Plan de trabajo", "Asesoría de tareas"]
+SITUACIONES = ["Regular", "En riesgo", "Sobresaliente", "Irregular"]
+TUTOR = "Tutor Benchmark"
+PREFIJO = "2025A"
+PERIODO = "2025A"
+
+ETAPAS = (
+    "leer_roster",
+    "leer_tabla_reporte",
+    "indice_libro_reporte",
+    "reemplazar_en_docx",
+    "crear_expedientes",
+    "llenar_documentos",
+    "crear_y_llenar",
+    "consolidado_un_alumno",
+    "consolidado",
+    "consolidado_sin_cambios",
+    "normalizar_evidencia",
+)
+
+
+# -------------------------------------------------------------------------------
+# Generación sintética
+# -------------------------------------------------------------------------------
+
+def generar_alumnos(n, semilla=0) -> list:
+    """[(matrícula, nombre, apellidos, programa)] únicos y reproducibles."""
+    rnd = random.Random(semilla)
+    alumnos = []
+    for i in range(n):
+        nombre = rnd.choice(NOMBRES)
+        apellidos = f"{rnd.choice(APELLIDOS)} {rnd.choice(APELLIDOS)}"
+        # El número al final mantiene los nombres completos únicos en cohortes grandes
+        alumnos.append((f"A{i + 1:06d}", nombre, f"{apellidos} {i + 1}", rnd.choice(PROGRAMAS)))
+    return alumnos
+
+
+def generar_roster(ruta, alumnos):
+    """Excel de alumnos con las columnas que usa construir_marcadores_alumno."""
+    import openpyxl
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Alumnos")
+    ws.append(["Nombre completo", "Matrícula", "Programa", "Período", "Dia", "Hora inicio",
+               "Hora final", "Grupo", "Edad", "Semestre", "Área de intervención", "Situación"])
+    for i, (matricula, nombre, apellidos, programa) in enumerate(alumnos):
+        ws.append([f"{nombre} {apellidos}", matricula, programa, PERIODO, DIAS[i % len(DIAS)],
+                   time(8 + i % 8, 0), time(9 + i % 8, 0), str(1 + i % 6), 18 + i % 5,
+                   1 + i % 9, "Académica", SITUACIONES[i % len(SITUACIONES)]])
+    wb.save(ruta)
+
+
+def generar_reportes(ruta, alumnos, semanas, registros_por_semana=2, semilla=0):
+    """
+    Libro de reportes con una hoja por semana. Como en el reporte real, las filas 1-10
+    son encabezado libre y la tabla empieza en B11 (Nombre, Apellidos, Fecha de atención, ...).
+    """
+    import openpyxl
+
+    rnd = random.Random(semilla)
+    inicio = datetime(2025, 1, 6)
+    wb = openpyxl.Workbook(write_only=True)
+    for s in range(semanas):
+        ws = wb.create_sheet(f"Semana{s + 1}")
+        ws.append(["Reporte semanal de tutorías"])
+        ws.append([f"Semana {s + 1}"])
+        for _ in range(8):
+            ws.append([])
+        ws.append([None, "Nombre", "Apellidos", "Matrícula", "Fecha de atención", "Hora",
+                   "Tema o asunto tratado", "Situación del alumno", "Tutor"])
+        for matricula, nombre, apellidos, _ in alumnos:
+            for k in range(registros_por_semana):
+                fecha = inicio + timedelta(days=7 * s + k)
+                ws.append([None, nombre, apellidos, matricula, fecha, time(10 + k, 0),
+                           f"{rnd.choice(TEMAS)} {s + 1}-{k + 1}", rnd.choice(SITUACIONES), TUTOR])
+    wb.save(ruta)
+
+
+def generar_plantillas(carpeta, filas_tabla=40):
+    """Plantillas .docx con marcadores (algunos partidos entre runs y en encabezados)."""
+    import docx
+
+    os.makedirs(os.path.join(carpeta, "6_Evidencias"), exist_ok=True)
+    main.crear_imagen_blanca(os.path.join(carpeta, "6_Evidencias", "foto.jpeg"))
+
+    # Seguimiento: datos del alumno y la tabla donde se insertan los reportes
+    d = docx.Document()
+    d.sections[0].header.paragraphs[0].text = "Seguimiento individual - {NOMBREMAY} ({MATRICULA})"
+    d.add_paragraph("Nombre: {NOMBRE}    Matrícula: {MATRICULA}    Programa: {PROGRAMA}{PROGRAMABACH}")
+    p = d.add_paragraph()
+    for trozo in ("Tutor: {TU", "TOR}    Periodo: {PERI", "ODO}    Horario: {HORARIO}"):
+        p.add_run(trozo)
+    d.add_paragraph("Fecha: {FECHALARGA}    Próxima reunión: {PROXREUNION}")
+    tabla = d.add_table(rows=filas_tabla, cols=6)
+    for col, texto in enumerate(["No.", "Fecha", "Tema", "Situación", "Asistencia", "Tutor"]):
+        tabla.cell(0, col).text = texto
+    d.save(os.path.join(carpeta, "5_Seguimiento individual.docx"))
+
+    # Entrevista extendida
+    d = docx.Document()
+    d.add_paragraph("Entrevista extendida de {NOMBRE} ({MATRICULA})")
+    for marcador in ("{EDAD}", "{SEMESTRE}", "{AREA}", "{SITUACIÓN}", "{PROMEDIO}", "{HABILIDADES}"):
+        d.add_paragraph(f"Dato: {marcador}")
+    d.add_paragraph("Tutor: {TUTOR}    Fecha: {FECHA}")
+    d.save(os.path.join(carpeta, "3_Entrevista extendida.docx"))
+
+    # Ficha con texto corrido (más párrafos sin marcadores)
+    d = docx.Document()
+    d.add_paragraph("Ficha de identificación - {NOMBREMAY}")
+    for i in range(60):
+        d.add_paragraph(f"Sección {i + 1}: texto de relleno de la ficha para {{NOMBRE}} " * 2)
+    d.save(os.path.join(carpeta, "1_Ficha de identificación.docx"))
+
+
+def generar_fotos(carpeta, n, ancho=3000, alto=4000):
+    """Fotos JPEG de alta resolución con ruido (se comprimen como fotos reales, no como lisas)."""
+    from PIL import Image
+
+    os.makedirs(carpeta, exist_ok=True)
+    base = Image.merge("RGB", [Image.effect_noise((ancho // 4, alto // 4), 60 + 10 * c) for c in range(3)])
+    base = base.resize((ancho, alto))
+    rutas = []
+    for i in range(n):
+        ruta = os.path.join(carpeta, f"IMG_{i + 1:04d}.jpg")
+        base.rotate(i % 4 * 90, expand=True).save(ruta, quality=95)
+        rutas.append(ruta)
+    return rutas
+
+
+def generar_cohorte(carpeta, n, semanas, fotos) -> dict:
+    """Genera todos los insumos para `n` alumnos y retorna sus rutas."""
+    os.makedirs(carpeta, exist_ok=True)
+    alumnos = generar_alumnos(n)
+    rutas = {
+        "roster": os.path.join(carpeta, "alumnos.xlsx"),
+        "reportes": os.path.join(carpeta, "reportes.xlsx"),
+        "plantillas": os.path.join(carpeta, "plantillas"),
+        "fotos": os.path.join(carpeta, "fotos"),
+    }
+    generar_roster(rutas["roster"], alumnos)
+    generar_reportes(rutas["reportes"], alumnos, semanas)
+    generar_plantillas(rutas["plantillas"])
+    rutas["lista_fotos"] = generar_fotos(rutas["fotos"], fotos)
+    return rutas
+
+
+# -------------------------------------------------------------------------------
+# Medición
+# -------------------------------------------------------------------------------
+
+def medir(funcion, *args, **kwargs):
+    """Retorna (resultado, segundos)."""
+    inicio = perf_counter()
+    resultado = funcion(*args, **kwargs)
+    return resultado, perf_counter() - inicio
+
+
+def _etapa(segundos, elementos=None, **extra) -> dict:
+    """Registro de una etapa: total, por elemento y datos adicionales."""
+    registro = {"segundos": round(segundos, 4)}
+    if elementos:
+        registro["elementos"] = elementos
+        registro["ms_por_elemento"] = round(segundos * 1000 / elementos, 3)
+    registro.update(extra)
+    return registro
+
+
+def correr_tamano(n, semanas, etapas, carpeta, fotos, repeticiones) -> dict:
+    """Genera la cohorte de `n` alumnos y mide cada etapa pedida."""
+    corrida = {"alumnos": n, "semanas": semanas, "etapas": {}}
+    resultados = corrida["etapas"]
+
+    rutas, segundos = medir(generar_cohorte, os.path.join(carpeta, "insumos"), n, semanas, fotos)
+    corrida["generacion_segundos"] = round(segundos, 2)
+    corrida["reportes_mb"] = round(os.path.getsize(rutas["reportes"]) / 1e6, 2)
+
+    # Estado global que usan los flujos de la aplicación
+    raiz = os.path.join(carpeta, "expedientes")
+    main.ruta_excel_principal = rutas["reportes"]
+    main.ruta_plantillas = rutas["plantillas"]
+    main.ruta_carpeta_global = raiz
+
+    datos, segundos = medir(main.leer_roster, rutas["roster"])
+    if "leer_roster" in etapas:
+        _, segundos_cache = medir(main.leer_roster, rutas["roster"])
+        resultados["leer_roster"] = _etapa(segundos, n, con_cache_segundos=round(segundos_cache, 4))
+
+    if "leer_tabla_reporte" in etapas:
+        df, segundos = medir(main.leer_tabla_reporte, rutas["reportes"], hoja=2)
+        resultados["leer_tabla_reporte"] = _etapa(segundos, len(df))
+
+    if "indice_libro_reporte" in etapas:
+        indice, segundos = medir(main.construir_indice_libro_reporte, rutas["reportes"])
+        resultados["indice_libro_reporte"] = _etapa(segundos, len(indice["hojas"]))
+
+    if "reemplazar_en_docx" in etapas:
+        import docx
+
+        plantilla = os.path.join(rutas["plantillas"], "5_Seguimiento individual.docx")
+        veces = min(n, repeticiones)
+        inicio = perf_counter()
+        reemplazos = 0
+        for i in range(veces):
+            _, markers = main.construir_marcadores_alumno(datos, i, TUTOR)
+            reemplazos += main.reemplazar_en_docx(docx.Document(plantilla), markers)
+        resultados["reemplazar_en_docx"] = _etapa(perf_counter() - inicio, veces, reemplazos=reemplazos)
+
+    if etapas & {"crear_expedientes", "llenar_documentos", "consolidado_un_alumno", "consolidado"}:
+        resumen, segundos = medir(main.crear_expedientes_lote, datos, raiz, rutas["plantillas"], PREFIJO)
+        if "crear_expedientes" in etapas:
+            resultados["crear_expedientes"] = _etapa(segundos, n)
+
+    if "llenar_documentos" in etapas:
+        resumen, segundos = medir(main.llenar_documentos_lote, datos, raiz, TUTOR)
+        resultados["llenar_documentos"] = _etapa(segundos, len(resumen["archivos"]), fallos=len(resumen["fallos"]))
+
+    if "crear_y_llenar" in etapas:
+        raiz_llenos = os.path.join(carpeta, "expedientes_llenos")
+        resumen, segundos = medir(main.crear_expedientes_lote, datos, raiz_llenos, rutas["plantillas"], PREFIJO, TUTOR)
+        resultados["crear_y_llenar"] = _etapa(segundos, n, documentos=len(resumen["archivos"]), fallos=len(resumen["fallos"]))
+        shutil.rmtree(raiz_llenos, ignore_errors=True)
+
+    if "consolidado_un_alumno" in etapas:
+        alumno = {col: [valores[0]] for col, valores in datos.items()}
+        _, segundos = medir(main.consolidar_lote, alumno, TUTOR, rutas["reportes"])
+        resultados["consolidado_un_alumno"] = _etapa(segundos, 1)
+
+    if "consolidado" in etapas:
+        lote, segundos = medir(main.consolidar_lote, datos, TUTOR, rutas["reportes"])
+        estados = {}
+        for r in lote:
+            estados[r["estado"]] = estados.get(r["estado"], 0) + 1
+        resultados["consolidado"] = _etapa(segundos, n, estados=estados)
+
+        if "consolidado_sin_cambios" in etapas:
+            _, segundos = medir(main.consolidar_lote, datos, TUTOR, rutas["reportes"])
+            resultados["consolidado_sin_cambios"] = _etapa(segundos, n)
+
+    if "normalizar_evidencia" in etapas and rutas["lista_fotos"]:
+        destino = os.path.join(carpeta, "evidencias")
+        os.makedirs(destino, exist_ok=True)
+        etapa = main.EtapaNormalizacion()
+        inicio = perf_counter()
+        for i, ruta in enumerate(rutas["lista_fotos"]):
+            etapa.enviar(ruta, os.path.join(destino, f"Sesión{i + 1}_Bench_XX.jpeg"))
+        resumen = etapa.terminar()
+        resultados["normalizar_evidencia"] = _etapa(
+            perf_counter() - inicio, resumen["archivos"],
+            mb_antes=round(resumen["bytes_antes"] / 1e6, 2), mb_despues=round(resumen["bytes_despues"] / 1e6, 2),
+        )
+
+    return corrida
+
+
+def main_benchmark(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de los flujos de expedientes con datos sintéticos.")
+    parser.add_argument("--alumnos", type=int, nargs="+", default=[50, 500], help="Tamaños de cohorte a medir")
+    parser.add_argument("--semanas", type=int, default=30, help="Hojas semanales del Excel de reportes")
+    parser.add_argument("--etapas", nargs="+", choices=ETAPAS, default=list(ETAPAS), help="Etapas a medir")
+    parser.add_argument("--fotos", type=int, default=8, help="Fotos de evidencia a normalizar")
+    parser.add_argument("--repeticiones", type=int, default=200, help="Documentos para reemplazar_en_docx")
+    parser.add_argument("--sin-paralelo", action="store_true", help="Desactivar el pool de procesos")
+    parser.add_argument("--carpeta", help="Carpeta de trabajo (por omisión una temporal que se borra)")
+    parser.add_argument("--conservar", action="store_true", help="No borrar la carpeta de trabajo")
+    parser.add_argument("--salida", help="Escribir el JSON en este archivo en lugar de stdout")
+    args = parser.parse_args(argv)
+
+    main.MODO_HEADLESS = True
+    main.MODO_PARALELO = not args.sin_paralelo
+    base = args.carpeta or tempfile.mkdtemp(prefix="bench_expedientes_")
+
+    # Cachés de la aplicación (roster, derivados) dentro de la carpeta de trabajo; por
+    # variable de entorno para que también la usen los procesos del pool
+    cache_anterior = os.environ.get("EXPEDIENTES_CACHE")
+    os.environ["EXPEDIENTES_CACHE"] = os.path.join(base, "cache")
+
+    resultado = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "paralelo": main.MODO_PARALELO,
+        "corridas": [],
+    }
+    stdout = sys.stdout
+    # Los mensajes de la aplicación van a stderr; stdout queda solo para el JSON
+    sys.stdout = sys.stderr
+    try:
+        for n in args.alumnos:
+            carpeta = os.path.join(base, f"n{n}")
+            print(f"== {n} alumnos x {args.semanas} semanas ==")
+            corrida = correr_tamano(n, args.semanas, set(args.etapas), carpeta, args.fotos, args.repeticiones)
+            for etapa, datos in corrida["etapas"].items():
+                print(f"  {etapa:<28} {datos['segundos']:9.3f} s")
+            resultado["corridas"].append(corrida)
+            if not args.conservar:
+                shutil.rmtree(carpeta, ignore_errors=True)
+    finally:
+        sys.stdout = stdout
+        if cache_anterior is None:
+            os.environ.pop("EXPEDIENTES_CACHE", None)
+        else:
+            os.environ["EXPEDIENTES_CACHE"] = cache_anterior
+        if not args.conservar and not args.carpeta:
+            shutil.rmtree(base, ignore_errors=True)
+
+    texto = json.dumps(resultado, ensure_ascii=False, indent=2)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto)
+    else:
+        print(texto)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_benchmark())
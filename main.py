@@ -1,21 +1,151 @@
 #!/usr/bin/env python3
+from __future__ import annotations
+
+from time import perf_counter, time as marca_tiempo
+_T_ARRANQUE = perf_counter()
+
 import os
 import sys
 import platform
 import shutil
-import pandas as pd
 import tkinter as tk
 from tkinter import filedialog, messagebox, simpledialog, ttk
 import pickle
 import json
+import re
+import unicodedata
+import functools
+import contextlib
+from collections import deque
+import hashlib
+import zlib
+import tempfile
+import zipfile
+import struct
+import copy
+from types import SimpleNamespace
+from xml.sax.saxutils import escape as escapar_xml
+from bisect import bisect_right
 import locale
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
 from datetime import datetime, timedelta, time
-import docx
-from docx.shared import Pt
-from docx.enum.text import WD_ALIGN_PARAGRAPH, WD_BREAK
-from PIL import Image
-from docx.shared import Inches
-from docx import Document
+
+# -------------------------------------------------------------------------------
+# Arranque: importaciones diferidas y reporte de tiempos
+# -------------------------------------------------------------------------------
+
+# EXPEDIENTES_PERFIL_INICIO=1 imprime en stderr el desglose del arranque
+PERFIL_INICIO = os.environ.get("EXPEDIENTES_PERFIL_INICIO", "") not in ("", "0")
+# Objetivo de arranque en frío (segundos); el reporte avisa si se excede
+OBJETIVO_INICIO_SEGUNDOS = float(os.environ.get("EXPEDIENTES_OBJETIVO_INICIO", "2.0"))
+
+_tiempos_inicio = []            # [(etapa, segundos)] en orden de ocurrencia
+_ultima_marca_inicio = _T_ARRANQUE
+
+
+def marcar_inicio(etapa):
+    """Registra cuánto tardó la etapa de arranque desde la marca anterior."""
+    global _ultima_marca_inicio
+    ahora = perf_counter()
+    _tiempos_inicio.append((etapa, ahora - _ultima_marca_inicio))
+    _ultima_marca_inicio = ahora
+
+
+def reporte_inicio() -> str:
+    """Texto con el desglose del arranque y el total contra el objetivo."""
+    total = perf_counter() - _T_ARRANQUE
+    lineas = ["Tiempos de arranque:"]
+    for etapa, segundos in _tiempos_inicio:
+        lineas.append(f"  {etapa:<40} {segundos * 1000:8.1f} ms")
+    estado = "OK" if total <= OBJETIVO_INICIO_SEGUNDOS else "EXCEDIDO"
+    lineas.append(f"  {'Total':<40} {total * 1000:8.1f} ms "
+                  f"(objetivo {OBJETIVO_INICIO_SEGUNDOS:.1f} s: {estado})")
+    return "\n".join(lineas)
+
+
+class _ImportacionDiferida:
+    """
+    Sustituto de un módulo (o de un objeto dentro de él) que lo importa la
+    primera vez que se usa. pandas, python-docx, lxml y Pillow tardan en
+    cargarse y la ventana de bienvenida no los necesita.
+    """
+
+    def __init__(self, nombre, cargar, registrar=True):
+        self._nombre = nombre
+        self._cargar = cargar
+        self._registrar = registrar
+        self._objeto = None
+
+    def _real(self):
+        if self._objeto is None:
+            inicio = perf_counter()
+            self._objeto = self._cargar()
+            segundos = perf_counter() - inicio
+            if self._registrar and segundos >= 0.001:
+                _tiempos_inicio.append((f"importar {self._nombre} (diferido)", segundos))
+                if PERFIL_INICIO:
+                    print(f"importar {self._nombre}: {segundos * 1000:.1f} ms", file=sys.stderr)
+        return self._objeto
+
+    def __getattr__(self, atributo):
+        return getattr(self._real(), atributo)
+
+    def __call__(self, *args, **kwargs):
+        return self._real()(*args, **kwargs)
+
+    def __repr__(self):
+        estado = "cargado" if self._objeto is not None else "sin cargar"
+        return f"<importación diferida {self._nombre} ({estado})>"
+
+
+# Cada cargador usa sentencias import normales para que PyInstaller siga
+# detectando y empaquetando los módulos.
+def _cargar_pandas():
+    import pandas
+    return pandas
+
+
+def _cargar_docx():
+    import docx
+    import docx.enum.text
+    import docx.opc.constants
+    import docx.opc.exceptions
+    import docx.opc.pkgwriter
+    import docx.shared
+    import docx.table
+    return docx
+
+
+def _cargar_etree():
+    from lxml import etree
+    return etree
+
+
+def _cargar_imagen():
+    from PIL import Image
+    return Image
+
+
+def _cargar_imageops():
+    from PIL import ImageOps
+    return ImageOps
+
+
+pd = _ImportacionDiferida("pandas", _cargar_pandas)
+docx = _ImportacionDiferida("docx", _cargar_docx)
+etree = _ImportacionDiferida("lxml", _cargar_etree)
+Image = _ImportacionDiferida("PIL", _cargar_imagen)
+ImageOps = _ImportacionDiferida("PIL", _cargar_imageops, registrar=False)
+Pt = _ImportacionDiferida("docx", lambda: docx.shared.Pt, registrar=False)
+Inches = _ImportacionDiferida("docx", lambda: docx.shared.Inches, registrar=False)
+WD_ALIGN_PARAGRAPH = _ImportacionDiferida("docx", lambda: docx.enum.text.WD_ALIGN_PARAGRAPH, registrar=False)
+WD_BREAK = _ImportacionDiferida("docx", lambda: docx.enum.text.WD_BREAK, registrar=False)
+RT = _ImportacionDiferida("docx", lambda: docx.opc.constants.RELATIONSHIP_TYPE, registrar=False)
+
+marcar_inicio("importar biblioteca estándar y tkinter")
 
 # Variable global para reutilizar la ruta
 ruta_excel_principal = None
@@ -23,8 +153,22 @@ ruta_carpeta_global = None
 ruta_plantillas = None
 seleccion_primera_vez = True
 
-# DEBUG flag (poner True solo mientras se depura)
-DEBUG_LEER_REPORTE = True
+# Procesamiento en paralelo (un proceso por núcleo) para los lotes de alumnos
+MODO_PARALELO = True
+
+# True cuando se ejecuta desde la línea de comandos (sin ventanas de Tk)
+MODO_HEADLESS = False
+
+# Normalización de evidencias (opcional, con pérdida): las fotos del celular se reducen
+# a EVIDENCIA_LADO_MAX, se les quitan los metadatos (EXIF, GPS) y se recomprimen a JPEG
+# en lugar de copiarse tal cual; la copia guardada ya no es el original.
+# Desactivada por omisión; en la línea de comandos se activa con --normalizar-evidencias
+NORMALIZAR_EVIDENCIAS = False
+EVIDENCIA_LADO_MAX = 1600       # píxeles del lado más largo
+EVIDENCIA_CALIDAD_JPEG = 82
+
+# Resolución con la que se incrustan las imágenes en los Word (a su tamaño en la página)
+IMAGEN_DOCX_DPI = 200
 
 # -------------------------------------------------------------------------------
 # CONFIGURACIÓN Y ESTILOS UI
@@ -123,6 +267,35 @@ def aplicar_estilo(root):
     style.configure("TCheckbutton", background=COLOR_BG, foreground=COLOR_FG, font=FONT_MAIN)
     style.map("TCheckbutton", background=[("active", COLOR_BG)])
 
+    # Entry
+    style.configure("TEntry", fieldbackground=COLOR_ENTRY_BG, foreground=COLOR_FG,
+                    insertcolor=COLOR_FG, bordercolor=COLOR_ENTRY_BG)
+
+    # Treeview (listas de alumnos)
+    style.configure("Treeview",
+                    background=COLOR_ENTRY_BG,
+                    fieldbackground=COLOR_ENTRY_BG,
+                    foreground=COLOR_FG,
+                    borderwidth=0,
+                    rowheight=24,
+                    font=FONT_MAIN)
+    style.map("Treeview",
+              background=[("selected", COLOR_SECONDARY)],
+              foreground=[("selected", "white")])
+    style.configure("Treeview.Heading",
+                    background=COLOR_BG,
+                    foreground=COLOR_FG,
+                    relief="flat",
+                    font=(FONT_FAMILY, 10, "bold"))
+    style.map("Treeview.Heading", background=[("active", "#505050")])
+
+    # Combobox (tutor en la tabla de asistencia)
+    style.configure("TCombobox", fieldbackground=COLOR_ENTRY_BG, background=COLOR_ENTRY_BG,
+                    foreground=COLOR_FG, arrowcolor=COLOR_FG, bordercolor=COLOR_ENTRY_BG)
+    style.map("TCombobox",
+              fieldbackground=[("readonly", COLOR_ENTRY_BG)],
+              foreground=[("readonly", COLOR_FG)])
+
     # Configurar root
     root.configure(bg=COLOR_BG)
 
@@ -155,6 +328,325 @@ def crear_ventana_toplevel(titulo, ancho=400, alto=300):
     force_focus(win)
     return win
 
+# -------------------------------------------------------------------------------
+# Trabajos en segundo plano (barra de progreso y cancelación)
+# -------------------------------------------------------------------------------
+
+class ProgresoTrabajo:
+    """
+    Canal entre un trabajo que corre en un hilo secundario y su ventana de progreso.
+    El trabajo solo llama a estos métodos (nunca a Tk); la ventana lee la cola con `after`.
+    """
+
+    def __init__(self):
+        self.cola = queue.Queue()
+        self.evento_cancelar = threading.Event()
+
+    def iniciar(self, total, mensaje=None):
+        """Fija cuántos pasos (alumnos o documentos) tiene la barra."""
+        self.cola.put(("total", total, mensaje))
+
+    def mensaje(self, texto):
+        self.cola.put(("mensaje", texto))
+
+    def estado(self, alumno, texto, avanzar=False):
+        """Actualiza el renglón del alumno; con avanzar=True cuenta un paso terminado."""
+        self.cola.put(("alumno", alumno, texto, avanzar))
+
+    def avanzar(self, alumno, texto):
+        self.estado(alumno, texto, avanzar=True)
+
+    def cancelado(self) -> bool:
+        """El trabajo lo revisa entre alumnos para detenerse limpiamente."""
+        return self.evento_cancelar.is_set()
+
+
+# Título del trabajo en segundo plano que está corriendo (solo uno a la vez: los lotes
+# escriben los mismos Word y comparten las cachés del módulo)
+_trabajo_en_curso = {"titulo": None}
+
+
+def ejecutar_trabajo(titulo, trabajo, al_terminar):
+    """
+    Corre trabajo(progreso) en un hilo secundario mientras muestra una ventana modal con
+    barra de progreso, estado por alumno y botón Cancelar. Al acabar cierra la ventana
+    y llama al_terminar(resultado, error) en el hilo de Tk.
+    Todo lo interactivo (tutor, archivos, etc.) debe pedirse ANTES de llamar aquí.
+    Si ya hay un trabajo corriendo, avisa y no inicia otro (retorna None).
+    """
+    if _trabajo_en_curso["titulo"]:
+        messagebox.showwarning(
+            "Trabajo en curso",
+            f"Espera a que termine «{_trabajo_en_curso['titulo']}» antes de iniciar otro proceso.",
+        )
+        return None
+    _trabajo_en_curso["titulo"] = titulo
+    progreso = ProgresoTrabajo()
+    win = crear_ventana_toplevel(titulo, ancho=560, alto=440)
+
+    lbl_estado = ttk.Label(win, text="Preparando...", style="Header.TLabel")
+    lbl_estado.pack(pady=(15, 8))
+
+    barra = ttk.Progressbar(win, mode="indeterminate", length=480)
+    barra.pack(padx=20)
+    barra.start(12)
+
+    frame = ttk.Frame(win)
+    frame.pack(fill="both", expand=True, padx=20, pady=10)
+    tree = ttk.Treeview(frame, columns=("alumno", "estado"), show="headings", selectmode="none")
+    tree.heading("alumno", text="Alumno")
+    tree.heading("estado", text="Estado")
+    tree.column("alumno", width=230)
+    tree.column("estado", width=250)
+    scrollbar = ttk.Scrollbar(frame, orient="vertical", command=tree.yview, style="Vertical.TScrollbar")
+    tree.configure(yscrollcommand=scrollbar.set)
+    tree.pack(side="left", fill="both", expand=True)
+    scrollbar.pack(side="right", fill="y")
+
+    def cancelar():
+        if progreso.cancelado():
+            return
+        progreso.evento_cancelar.set()
+        btn_cancelar.state(["disabled"])
+        lbl_estado.config(text="Cancelando... se detendrá al terminar el alumno actual.")
+
+    btn_cancelar = ttk.Button(win, text="✖ Cancelar", style="Danger.TButton", command=cancelar)
+    btn_cancelar.pack(pady=(0, 15))
+    win.protocol("WM_DELETE_WINDOW", cancelar)
+    # Modal: mientras corre no se puede lanzar otro lote desde las demás ventanas
+    win.grab_set()
+
+    conteo = {"hechos": 0, "total": 0}
+    filas = {}
+    salida = {}
+
+    def correr():
+        try:
+            salida["resultado"] = trabajo(progreso)
+        except Exception as e:
+            salida["error"] = e
+        finally:
+            progreso.cola.put(("fin",))
+
+    def sondear():
+        try:
+            while True:
+                evento = progreso.cola.get_nowait()
+                tipo = evento[0]
+                if tipo == "total":
+                    _, total, mensaje = evento
+                    conteo["total"] = total
+                    barra.stop()
+                    barra.config(mode="determinate", maximum=max(total, 1), value=conteo["hechos"])
+                    if mensaje and not progreso.cancelado():
+                        lbl_estado.config(text=mensaje)
+                elif tipo == "mensaje":
+                    if not progreso.cancelado():
+                        lbl_estado.config(text=evento[1])
+                elif tipo == "alumno":
+                    _, alumno, texto, avanzar = evento
+                    if alumno in filas:
+                        tree.set(filas[alumno], "estado", texto)
+                    else:
+                        filas[alumno] = tree.insert("", "end", values=(alumno, texto))
+                    tree.see(filas[alumno])
+                    if avanzar:
+                        conteo["hechos"] += 1
+                        barra.config(value=conteo["hechos"])
+                        if not progreso.cancelado():
+                            lbl_estado.config(text=f"{conteo['hechos']} de {conteo['total']}")
+                elif tipo == "fin":
+                    barra.stop()
+                    _trabajo_en_curso["titulo"] = None
+                    win.destroy()
+                    al_terminar(salida.get("resultado"), salida.get("error"))
+                    return
+        except queue.Empty:
+            pass
+        win.after(100, sondear)
+
+    threading.Thread(target=correr, name=f"Trabajo: {titulo}", daemon=True).start()
+    win.after(100, sondear)
+    return progreso
+
+# -------------------------------------------------------------------------------
+# Instrumentación: tiempos por etapa y por alumno
+# -------------------------------------------------------------------------------
+
+# Etapas que se miden en los lotes
+ETAPA_EXCEL = "excel"               # leer hojas del Excel de reportes
+ETAPA_CARPETA = "carpeta"           # ubicar/crear la carpeta y los archivos del alumno
+ETAPA_ABRIR_DOCX = "abrir_docx"
+ETAPA_INSERTAR = "insertar"         # renglones, marcadores o imágenes
+ETAPA_GUARDAR_DOCX = "guardar_docx"
+ETAPA_IMAGENES = "imagenes"         # evidencias y derivados de imágenes
+ETAPA_EXPORTAR = "exportar"         # escribir reportes .xlsx
+ORDEN_ETAPAS = (ETAPA_EXCEL, ETAPA_CARPETA, ETAPA_ABRIR_DOCX, ETAPA_INSERTAR, ETAPA_GUARDAR_DOCX, ETAPA_IMAGENES,
+                ETAPA_EXPORTAR)
+
+# Los tiempos de lo que no es de un alumno (p. ej. leer el Excel) se anotan aquí
+ALUMNO_LOTE = "(lote)"
+
+# Registros JSON-lines en carpeta_cache("registros"); se rotan al pasar de este tamaño
+REGISTRO_TIEMPOS = "tiempos.jsonl"
+REGISTRO_EVENTOS = "eventos.jsonl"
+REGISTRO_MAX_BYTES = 5 * 1024 * 1024
+
+_tiempos_hilo = threading.local()
+
+
+@contextlib.contextmanager
+def medir_etapa(etapa):
+    """Suma la duración del bloque a `etapa` en los tiempos de la tarea en curso (si hay)."""
+    inicio = perf_counter()
+    try:
+        yield
+    finally:
+        tiempos = getattr(_tiempos_hilo, "actual", None)
+        if tiempos is not None:
+            tiempos[etapa] = tiempos.get(etapa, 0.0) + perf_counter() - inicio
+
+
+@contextlib.contextmanager
+def tiempos_tarea():
+    """Junta lo que midan los medir_etapa del bloque y produce {etapa: segundos}."""
+    anterior = getattr(_tiempos_hilo, "actual", None)
+    _tiempos_hilo.actual = tiempos = {}
+    try:
+        yield tiempos
+    finally:
+        _tiempos_hilo.actual = anterior
+        if anterior is not None:
+            for etapa, segundos in tiempos.items():
+                anterior[etapa] = anterior.get(etapa, 0.0) + segundos
+
+
+def _tarea_con_tiempos(funcion, args):
+    """Corre funcion(*args) (en el pool) y regresa (resultado, {etapa: segundos}) al proceso principal."""
+    with tiempos_tarea() as tiempos:
+        resultado = funcion(*args)
+    return resultado, tiempos
+
+
+def _escribir_jsonl(nombre_archivo, registros) -> str:
+    """Agrega los registros (uno por línea) al archivo de la carpeta de registros."""
+    ruta = os.path.join(carpeta_cache("registros"), nombre_archivo)
+    try:
+        if os.path.getsize(ruta) > REGISTRO_MAX_BYTES:
+            os.replace(ruta, ruta + ".1")
+    except OSError:
+        pass
+    with open(ruta, "a", encoding="utf-8") as f:
+        for registro in registros:
+            f.write(json.dumps(registro, ensure_ascii=False, default=str) + "\n")
+    return ruta
+
+
+def registrar_evento(mensaje, nivel="info", **campos):
+    """Escribe el aviso en stderr y en el registro de eventos (JSON-lines)."""
+    print(f"[{nivel}] {mensaje}", file=sys.stderr)
+    try:
+        _escribir_jsonl(REGISTRO_EVENTOS, [{
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "nivel": nivel,
+            "mensaje": mensaje,
+            **campos,
+        }])
+    except OSError:
+        pass
+
+
+def _percentil(valores_ordenados, p):
+    """Percentil por rango más cercano de una lista ya ordenada."""
+    if not valores_ordenados:
+        return 0.0
+    k = max(0, min(len(valores_ordenados) - 1, -(-p * len(valores_ordenados) // 100) - 1))
+    return valores_ordenados[k]
+
+
+class RegistroTiempos:
+    """
+    Tiempos de un lote por alumno y etapa. Los lotes lo llenan con medir_etapa dentro
+    de alumno() o con los tiempos que regresan los procesos del pool (agregar).
+    terminar() agrega el lote al registro JSON-lines y devuelve resumen(): totales,
+    p50/p95 por etapa y los alumnos más lentos.
+    """
+
+    def __init__(self, proceso):
+        self.proceso = proceso
+        self.id = f"{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}"
+        self.por_alumno = {}        # alumno -> {etapa: segundos}
+        self.segundos = 0.0
+        self._inicio = perf_counter()
+
+    def agregar(self, alumno, tiempos):
+        destino = self.por_alumno.setdefault(alumno, {})
+        for etapa, segundos in tiempos.items():
+            destino[etapa] = destino.get(etapa, 0.0) + segundos
+
+    @contextlib.contextmanager
+    def alumno(self, alumno):
+        """Anota a `alumno` lo que se mida dentro del bloque (aunque termine con error)."""
+        with tiempos_tarea() as tiempos:
+            try:
+                yield
+            finally:
+                self.agregar(alumno, tiempos)
+
+    def resumen(self, mas_lentos=5) -> dict:
+        alumnos = {a: t for a, t in self.por_alumno.items() if a != ALUMNO_LOTE}
+        nombres_etapas = {e for t in self.por_alumno.values() for e in t}
+        etapas = {}
+        for etapa in sorted(nombres_etapas, key=lambda e: (ORDEN_ETAPAS + (e,)).index(e)):
+            valores = sorted(t[etapa] for t in alumnos.values() if etapa in t)
+            etapas[etapa] = {
+                "total": round(sum(t.get(etapa, 0.0) for t in self.por_alumno.values()), 4),
+                "p50": round(_percentil(valores, 50), 4),
+                "p95": round(_percentil(valores, 95), 4),
+                "max": round(valores[-1], 4) if valores else 0.0,
+                "alumnos": len(valores),
+            }
+        lentos = sorted(((sum(t.values()), a) for a, t in alumnos.items()), reverse=True)[:mas_lentos]
+        return {
+            "proceso": self.proceso,
+            "lote": self.id,
+            "segundos": round(self.segundos or perf_counter() - self._inicio, 3),
+            "alumnos": len(alumnos),
+            "etapas": etapas,
+            "mas_lentos": [{"alumno": a, "segundos": round(total, 4)} for total, a in lentos],
+        }
+
+    def terminar(self) -> dict:
+        """Cierra el lote, lo agrega a tiempos.jsonl y regresa el resumen."""
+        self.segundos = perf_counter() - self._inicio
+        resumen = self.resumen()
+        fecha = datetime.now().isoformat(timespec="seconds")
+        registros = [
+            {"tipo": "alumno", "lote": self.id, "proceso": self.proceso, "fecha": fecha, "alumno": a,
+             "total": round(sum(t.values()), 4), "etapas": {e: round(v, 4) for e, v in t.items()}}
+            for a, t in self.por_alumno.items()
+        ]
+        registros.append({"tipo": "resumen", "fecha": fecha, **resumen})
+        try:
+            _escribir_jsonl(REGISTRO_TIEMPOS, registros)
+        except OSError as e:
+            print(f"No se pudo escribir el registro de tiempos: {e}", file=sys.stderr)
+        return resumen
+
+
+def texto_tiempos(resumen: dict) -> str:
+    """Texto corto del resumen de tiempos para las ventanas de fin de lote."""
+    lineas = [f"Tiempo total: {resumen['segundos']:.1f} s"]
+    for etapa, t in resumen["etapas"].items():
+        if t["alumnos"]:
+            lineas.append(f"• {etapa}: {t['total']:.1f} s (p50 {t['p50'] * 1000:.0f} ms, p95 {t['p95'] * 1000:.0f} ms)")
+        else:
+            lineas.append(f"• {etapa}: {t['total']:.1f} s")
+    if resumen["mas_lentos"]:
+        lentos = ", ".join(f"{r['alumno']} ({r['segundos']:.1f} s)" for r in resumen["mas_lentos"][:3])
+        lineas.append(f"Más lentos: {lentos}")
+    return "\n".join(lineas)
+
 # -------------------------------------------------------------------------------
 # Utilidades generales
 # -------------------------------------------------------------------------------
@@ -163,6 +655,70 @@ def obtener_iniciales(nombre_completo: str) -> str:
     partes = str(nombre_completo).split()
     return ''.join([p[0].upper() for p in partes if p])
 
+def _inicializar_proceso(headless):
+    """Configura cada proceso del pool como el proceso principal (modo línea de comandos)."""
+    global MODO_HEADLESS
+    MODO_HEADLESS = headless
+    if headless:
+        # stdout queda reservado para el resultado JSON
+        sys.stdout = sys.stderr
+
+
+def ejecutar_en_paralelo(funcion, tareas, max_workers=None, al_medir=None):
+    """
+    Ejecuta funcion(*args) para cada (clave, args) de `tareas` en un pool de procesos
+    del tamaño de los núcleos de la máquina y produce (clave, resultado, error)
+    conforme van terminando. `funcion` debe estar definida a nivel de módulo y
+    no debe usar Tk (corre en otro proceso).
+    Como máximo hay 2 tareas pendientes por proceso, así `tareas` puede ser un generador.
+    Con `al_medir`, se llama al_medir(clave, {etapa: segundos}) con lo que midió cada
+    tarea exitosa (medir_etapa dentro del proceso del pool).
+    """
+    def _resultado(clave, valor):
+        if al_medir is None:
+            return valor
+        valor, tiempos = valor
+        al_medir(clave, tiempos)
+        return valor
+
+    if al_medir is not None:
+        medida = funcion
+        funcion, tareas = _tarea_con_tiempos, ((clave, (medida, args)) for clave, args in tareas)
+
+    max_workers = max_workers or os.cpu_count() or 1
+    if not MODO_PARALELO or max_workers < 2:
+        for clave, args in tareas:
+            try:
+                valor = funcion(*args)
+            except Exception as e:
+                yield clave, None, e
+                continue
+            yield clave, _resultado(clave, valor), None
+        return
+
+    tareas = iter(tareas)
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_inicializar_proceso, initargs=(MODO_HEADLESS,)) as pool:
+        pendientes = {}
+
+        def _llenar_cola():
+            for clave, args in tareas:
+                pendientes[pool.submit(funcion, *args)] = clave
+                if len(pendientes) >= max_workers * 2:
+                    break
+
+        _llenar_cola()
+        while pendientes:
+            terminadas, _ = wait(pendientes, return_when=FIRST_COMPLETED)
+            for futuro in terminadas:
+                clave = pendientes.pop(futuro)
+                try:
+                    valor = futuro.result()
+                except Exception as e:
+                    yield clave, None, e
+                    continue
+                yield clave, _resultado(clave, valor), None
+            _llenar_cola()
+
 try:
     # Intento 1: Formato estándar (Mac / Linux / GitHub Actions)
     locale.setlocale(locale.LC_TIME, "es_MX.UTF-8")
@@ -175,12 +731,33 @@ except locale.Error:
         try:
             locale.setlocale(locale.LC_TIME, "es_ES") # A veces Windows moderno acepta esto
         except locale.Error:
-            print("No se pudo configurar el idioma a Español. Se usará el predeterminado del sistema.")
+            print("No se pudo configurar el idioma a Español. Se usará el predeterminado del sistema.", file=sys.stderr)
             pass
 
 CONFIG_FILE = "config.json"
 
 
+def carpeta_cache(*subcarpetas) -> str:
+    """
+    Carpeta de caché de la aplicación (por usuario); se crea si no existe.
+    EXPEDIENTES_CACHE la reemplaza completa; al ser variable de entorno también la
+    heredan los procesos del pool.
+    """
+    if os.environ.get("EXPEDIENTES_CACHE"):
+        ruta = os.path.join(os.environ["EXPEDIENTES_CACHE"], *subcarpetas)
+        os.makedirs(ruta, exist_ok=True)
+        return ruta
+    if SYSTEM_OS == "Darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    elif SYSTEM_OS == "Windows":
+        base = os.environ.get("LOCALAPPDATA", os.path.expanduser("~"))
+    else:
+        base = os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache"))
+    ruta = os.path.join(base, "ExpedientesMac", *subcarpetas)
+    os.makedirs(ruta, exist_ok=True)
+    return ruta
+
+
 def guardar_config(carpeta_raiz):
     with open(CONFIG_FILE, "w") as f:
         json.dump({"carpeta_raiz": carpeta_raiz}, f)
@@ -244,24 +821,126 @@ def seleccionar_excel_tabla_reporte() -> str:
     return ruta_excel_principal
 
 
-def leer_tabla_reporte(ruta_excel_principal: str, hoja=2, DEBUG_LEER_REPORTE=False) -> pd.DataFrame:
+# Columnas de la tabla de reporte (B:K) y límites de la lectura por streaming
+COL_REPORTE_INICIO = 2   # B
+COL_REPORTE_FIN = 11     # K
+FILAS_BUSQUEDA_ENCABEZADO = 30   # filas iniciales donde se busca el encabezado
+FILAS_VACIAS_FIN = 20            # filas vacías seguidas que marcan el fin de la tabla
+
+
+def leer_tabla_reporte(ruta_excel_principal: str, hoja=2) -> pd.DataFrame:
     """
     Lee una hoja específica del Excel (por índice o nombre) y devuelve un DataFrame filtrado.
-    Detecta automáticamente el encabezado en B11:J11 y valida que existan las columnas 'Nombre' y 'Apellidos'.
+    Detecta automáticamente el encabezado (fila con 'Nombre' y 'Apellidos' en B:K, normalmente
+    B11) y valida que existan las columnas 'Nombre' y 'Apellidos'.
+    Solo lanza la excepción (puede correr en un hilo de trabajo): el aviso al usuario lo
+    da quien la llama, en el hilo de Tk.
+    """
+    # closing: el libro se cierra al salir aunque no se agote el generador
+    with contextlib.closing(_hojas_excel_por_filas(ruta_excel_principal, [hoja])) as hojas:
+        for _, filas in hojas:
+            return _tabla_reporte_desde_filas(filas)
+    raise ValueError(f"No existe la hoja {hoja} en el Excel.")
+
+
+def _hojas_excel_por_filas(ruta_excel: str, hojas=None):
     """
+    Genera (nombre de hoja, iterador de filas B:K) para las hojas indicadas (por índice o
+    nombre; None = todas; las que no existen se omiten). Los .xlsx/.xlsm se leen con
+    openpyxl en modo solo lectura, fila por fila y solo en las columnas B:K; los .xls se
+    leen con pandas. El libro queda abierto mientras se itera: consumirlo dentro de
+    contextlib.closing.
+    """
+    if not zipfile.is_zipfile(ruta_excel):
+        libro = pd.read_excel(ruta_excel, sheet_name=None if hojas is None else list(hojas),
+                              header=None, keep_default_na=False)
+        for hoja, df_full in libro.items():
+            df_cols = df_full.reindex(columns=range(COL_REPORTE_INICIO - 1, COL_REPORTE_FIN), fill_value="")
+            yield hoja, df_cols.itertuples(index=False, name=None)
+        return
+
+    import openpyxl
+
+    wb = openpyxl.load_workbook(ruta_excel, read_only=True, data_only=True)
     try:
-        # Leer la hoja completa
-        # Si 'hoja' es int, usa sheet_name por índice, si es str usa por nombre
-        df_full = pd.read_excel(ruta_excel_principal, sheet_name=hoja, header=None, keep_default_na=False)
-    except Exception as e:
-        messagebox.showerror("Error de Lectura", f"No se pudo leer la hoja 3 del Excel.\n\nAsegúrate de que el archivo no esté corrupto.\n\nDetalle: {e}")
-        raise
+        if hojas is None:
+            hojas_ws = wb.worksheets
+        else:
+            hojas_ws = [
+                wb.worksheets[h] if isinstance(h, int) else wb[h] for h in hojas
+                if (isinstance(h, int) and -len(wb.worksheets) <= h < len(wb.worksheets)) or h in wb.sheetnames
+            ]
+        for ws in hojas_ws:
+            yield ws.title, ws.iter_rows(min_col=COL_REPORTE_INICIO, max_col=COL_REPORTE_FIN, values_only=True)
+    finally:
+        wb.close()
+
+
+def tablas_reporte_del_libro(ruta_excel: str, hojas=None):
+    """
+    Genera (hoja, tabla de reporte) para cada hoja de reporte del libro (o de `hojas`).
+    Las hojas sin encabezado de reporte (Portada, Datos, etc.) se omiten en silencio; las
+    que fallan al leerse (dañadas, hojas de gráfico) se omiten con un aviso en el registro.
+    """
+    with contextlib.closing(_hojas_excel_por_filas(ruta_excel, hojas)) as hojas_libro:
+        for hoja, filas in hojas_libro:
+            try:
+                # La hoja se lee aquí, al recorrer `filas`
+                df = _tabla_reporte_desde_filas(filas)
+            except ValueError:
+                continue
+            except Exception as e:
+                registrar_evento(f"Se omitió la hoja {hoja!r} del Excel: {e}", "advertencia", hoja=str(hoja))
+                continue
+            yield hoja, df
+
+
+def _celda_vacia(valor) -> bool:
+    return valor is None or (isinstance(valor, float) and valor != valor) or (isinstance(valor, str) and not valor.strip())
+
+
+def _tabla_reporte_desde_filas(filas) -> pd.DataFrame:
+    """
+    Arma la tabla de reporte a partir de las filas B:K de una hoja: busca el encabezado en
+    las primeras FILAS_BUSQUEDA_ENCABEZADO filas y lee los datos hasta el primer bloque de
+    FILAS_VACIAS_FIN filas completamente vacías (no se recorren miles de celdas con formato).
+    Las filas vacías en medio de la tabla se conservan (como en la lectura con pandas);
+    solo se descartan las del final.
+    """
+    filas = iter(filas)
+    encabezado = None
+    for n, valores in enumerate(filas):
+        nombres = [str(v).strip().lower() for v in valores if not _celda_vacia(v)]
+        if "nombre" in nombres and ("apellidos" in nombres or "apellido" in nombres):
+            encabezado = valores
+            break
+        if n + 1 >= FILAS_BUSQUEDA_ENCABEZADO:
+            break
+    if encabezado is None:
+        raise ValueError(
+            f"La hoja 3 no contiene las columnas esperadas 'Nombre' y 'Apellidos' "
+            f"en las primeras {FILAS_BUSQUEDA_ENCABEZADO} filas."
+        )
+
+    datos = []
+    vacias = []
+    for valores in filas:
+        fila = ["" if v is None else v for v in valores]
+        if all(_celda_vacia(v) for v in valores):
+            vacias.append(fila)
+            if len(vacias) >= FILAS_VACIAS_FIN:
+                break
+            continue
+        datos += vacias
+        vacias = []
+        datos.append(fila)
+
+    columnas = ["" if v is None else str(v).strip() for v in encabezado]
+    return _preparar_tabla_reporte(pd.DataFrame(datos, columns=columnas, dtype=object))
 
-    # Tomar solo las columnas B:J y filas desde la fila 11 (índice 10) para detectar encabezado
-    df_header = df_full.iloc[10, 1:11]  # B11:K11
-    df_data = df_full.iloc[11:, 1:11]   # Datos debajo del encabezado
-    df_data.columns = [str(c).strip() for c in df_header]
 
+def _preparar_tabla_reporte(df_data: pd.DataFrame) -> pd.DataFrame:
+    """Valida las columnas críticas y agrega 'Nombre completo (Reporte)'."""
     # --- Validación de columnas críticas ---
     cols_lower = [c.lower() for c in df_data.columns]
     tiene_nombre = any(c == "nombre" for c in cols_lower)
@@ -279,43 +958,344 @@ def leer_tabla_reporte(ruta_excel_principal: str, hoja=2, DEBUG_LEER_REPORTE=Fal
         df_data["Apellidos"].astype(str).str.strip()
     ).str.strip()
 
-    return df_data.reset_index(drop=True)
+    return normalizar_fechas_reporte(df_data.reset_index(drop=True))
 
 
-def filtrar_fila_reciente_por_alumno(df_reporte: pd.DataFrame, nombre_objetivo: str) -> pd.Series:
+# Columnas que agrega normalizar_fechas_reporte (una vez por hoja, junto con la tabla)
+COL_FECHA_HORA = "Fecha y hora (Reporte)"   # datetime64; NaT si la fecha no se reconoce
+COL_FECHA_TEXTO = "Fecha (Reporte)"         # 'dd/mm/YYYY HH:MM', tal como se escribe en el Word
+# Formatos de texto aceptados en 'Fecha de atención', en orden de preferencia
+FORMATOS_FECHA_TEXTO = ("%d/%m/%Y", "%d/%m/%Y %H:%M", "%d/%m/%Y %H:%M:%S", "%d-%m-%Y", "%Y-%m-%d", "%Y-%m-%d %H:%M:%S")
+# Día 0 de los números de serie de fecha de Excel (sistema 1900) y último día válido
+ORIGEN_SERIE_EXCEL = "1899-12-30"
+SERIE_EXCEL_MAX = 2958465   # 31/12/9999
+_PATRON_HORA = r"(\d{1,2}):(\d{2})(?::(\d{2}))?"
+
+
+def _fechas_desde_columna(serie: pd.Series) -> pd.Series:
     """
-    Selecciona la fila más reciente del alumno en df_reporte comparando
-    'Nombre completo (Reporte)'. Si no encuentra, lanza error con pistas.
+    Convierte la columna de fechas tal como viene del Excel (fechas, números de serie de
+    Excel y texto dd/mm/YYYY, incluso mezclados) a datetime64: una conversión vectorizada
+    por tipo de valor y por formato de texto, no una por fila. NaT si no se reconoce.
     """
-    if "Nombre completo (Reporte)" not in df_reporte.columns:
-        # intentar reconstruir desde columnas detectables
-        cols = df_reporte.columns.tolist()
-        if any("nombre" in c.lower() for c in cols) and any("apell" in c.lower() for c in cols):
-            ncol = next(c for c in cols if "nombre" in c.lower())
-            acol = next(c for c in cols if "apell" in c.lower())
-            df_reporte["Nombre completo (Reporte)"] = (df_reporte[ncol].fillna("").astype(str).str.strip() + " " + df_reporte[acol].fillna("").astype(str).str.strip()).str.strip()
-        else:
-            raise ValueError("No se pudo construir 'Nombre completo (Reporte)' desde las columnas existentes.")
+    resultado = pd.Series(pd.NaT, index=serie.index, dtype="datetime64[ns]")
+    es_fecha = serie.map(lambda v: isinstance(v, datetime))
+    es_texto = serie.map(lambda v: isinstance(v, str))
+    if es_fecha.any():
+        resultado.loc[es_fecha] = pd.to_datetime(serie[es_fecha], errors="coerce")
+
+    # Números de serie de Excel, también si vienen como texto ('45663')
+    texto = serie[es_texto].str.strip()
+    numeros = pd.concat([
+        pd.to_numeric(serie[~es_fecha & ~es_texto], errors="coerce"),
+        pd.to_numeric(texto, errors="coerce"),
+    ])
+    numeros = numeros[numeros.between(1, SERIE_EXCEL_MAX)]
+    if len(numeros):
+        resultado.loc[numeros.index] = pd.to_datetime(numeros, unit="D", origin=ORIGEN_SERIE_EXCEL).dt.round("s")
+
+    pendiente = texto[texto.ne("") & ~texto.index.isin(numeros.index)]
+    for formato in FORMATOS_FECHA_TEXTO:
+        if pendiente.empty:
+            break
+        convertidas = pd.to_datetime(pendiente, format=formato, errors="coerce")
+        reconocidas = convertidas.notna()
+        resultado.loc[convertidas.index[reconocidas]] = convertidas[reconocidas]
+        pendiente = pendiente[~reconocidas]
+    return resultado
 
-    # Comparación insensible a mayúsculas y espacios
-    objetivo_norm = str(nombre_objetivo).strip().upper()
-    df_reporte["___NOM_SEARCH__"] = df_reporte["Nombre completo (Reporte)"].astype(str).str.strip().str.upper()
 
-    df_al = df_reporte[df_reporte["___NOM_SEARCH__"] == objetivo_norm].copy()
-    if df_al.empty:
-        # Preparar mensaje útil para depurar: listar algunos nombres detectados
-        uniques = df_reporte["Nombre completo (Reporte)"].dropna().unique().tolist()[:30]
-        raise ValueError(f"No se encontraron registros para '{nombre_objetivo}' en TablaReporte.\n\nVerifica que el nombre en el Excel coincida exactamente.")
-    # ordenar por Fecha de atención si existe
-    if "Fecha de atención" in df_al.columns:
-        df_al["Fecha de atención"] = pd.to_datetime(df_al["Fecha de atención"], errors="coerce")
-        df_al.sort_values(by="Fecha de atención", inplace=True, na_position="first")
-        fila = df_al.iloc[-1]
+def _horas_desde_columna(serie: pd.Series) -> pd.Series:
+    """
+    Convierte la columna 'Hora' (hora, fracción de día de Excel, fecha con hora o texto
+    'HH:MM[:SS]') a timedelta64, vectorizado. NaT si la celda no trae hora.
+    """
+    resultado = pd.Series(pd.NaT, index=serie.index, dtype="timedelta64[ns]")
+    es_numero = serie.map(lambda v: isinstance(v, (int, float)) and not isinstance(v, bool))
+    fracciones = pd.to_numeric(serie[es_numero], errors="coerce")
+    fracciones = fracciones[(fracciones >= 0) & (fracciones < 1)]
+    if len(fracciones):
+        resultado.loc[fracciones.index] = pd.to_timedelta(fracciones, unit="D").dt.round("s")
+
+    partes = serie[~es_numero].astype(str).str.extract(_PATRON_HORA).dropna(subset=[0, 1])
+    if len(partes):
+        partes = partes.fillna("0").astype(int)
+        resultado.loc[partes.index] = pd.to_timedelta(partes[0] * 3600 + partes[1] * 60 + partes[2], unit="s")
+    return resultado
+
+
+def normalizar_fechas_reporte(df_data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Agrega a la tabla de reporte, en una sola pasada por hoja, COL_FECHA_HORA ('Fecha de
+    atención' + 'Hora' como datetime64) y COL_FECHA_TEXTO ('dd/mm/YYYY HH:MM'; solo la
+    fecha si no hay hora; el texto original si la fecha no se reconoce).
+    """
+    if "Fecha de atención" not in df_data.columns:
+        df_data[COL_FECHA_HORA] = pd.Series(pd.NaT, index=df_data.index, dtype="datetime64[ns]")
+        df_data[COL_FECHA_TEXTO] = ""
+        return df_data
+
+    crudas = df_data["Fecha de atención"]
+    fechas = _fechas_desde_columna(crudas)
+    if "Hora" in df_data.columns:
+        horas = _horas_desde_columna(df_data["Hora"])
+    else:
+        horas = pd.Series(pd.NaT, index=df_data.index, dtype="timedelta64[ns]")
+    con_hora = horas.notna() & fechas.notna()
+    fecha_hora = fechas.where(~con_hora, fechas.dt.normalize() + horas)
+
+    texto = fecha_hora.dt.strftime("%d/%m/%Y %H:%M")
+    solo_fecha = fecha_hora.notna() & ~con_hora & fecha_hora.eq(fecha_hora.dt.normalize())
+    texto[solo_fecha] = fecha_hora[solo_fecha].dt.strftime("%d/%m/%Y")
+    sin_fecha = fecha_hora.isna()
+    texto[sin_fecha] = crudas[sin_fecha].map(lambda v: str(v).strip() if pd.notna(v) else "")
+
+    df_data[COL_FECHA_HORA] = fecha_hora
+    df_data[COL_FECHA_TEXTO] = texto.astype(object)
+    return df_data
+
+
+_PATRON_FECHA_CELDA = re.compile(
+    r"^(\d{1,2})/(\d{1,2})/(\d{4})(?:\s+(?:(\d{1,2}):(\d{2})(?::\d{2})?|none|nan|nat))?$", re.IGNORECASE
+)
+
+
+def clave_fecha_seguimiento(texto) -> str:
+    """
+    Forma canónica de la fecha de un renglón de seguimiento para detectar duplicados:
+    '6/1/2025 9:00:00', '06/01/2025 09:00' -> '06/01/2025 09:00'; '06/01/2025 nan' -> '06/01/2025'.
+    Así los renglones escritos con el formato anterior (hora con segundos) siguen coincidiendo.
+    """
+    texto = str(texto).strip()
+    m = _PATRON_FECHA_CELDA.match(texto)
+    if not m:
+        return texto
+    dia, mes, anio, hora, minuto = m.groups()
+    clave = f"{int(dia):02d}/{int(mes):02d}/{anio}"
+    return clave if hora is None else f"{clave} {int(hora):02d}:{minuto}"
+
+
+def normalizar_nombre_reporte(nombre) -> str:
+    """Clave de búsqueda de un alumno: nombre sin espacios extremos y en mayúsculas."""
+    return str(nombre).strip().upper()
+
+
+def _serie_nombre_completo(df_reporte: pd.DataFrame) -> pd.Series:
+    """
+    Devuelve la serie 'Nombre completo (Reporte)' sin modificar df_reporte.
+    Si la columna no existe, la reconstruye desde las columnas de nombre y apellidos.
+    """
+    if "Nombre completo (Reporte)" in df_reporte.columns:
+        return df_reporte["Nombre completo (Reporte)"]
+
+    # intentar reconstruir desde columnas detectables
+    cols = [str(c) for c in df_reporte.columns]
+    if any("nombre" in c.lower() for c in cols) and any("apell" in c.lower() for c in cols):
+        ncol = next(c for c in cols if "nombre" in c.lower())
+        acol = next(c for c in cols if "apell" in c.lower())
+        return (df_reporte[ncol].fillna("").astype(str).str.strip() + " " + df_reporte[acol].fillna("").astype(str).str.strip()).str.strip()
+    raise ValueError("No se pudo construir 'Nombre completo (Reporte)' desde las columnas existentes.")
+
+
+def construir_indice_alumnos(df_reporte: pd.DataFrame) -> dict:
+    """
+    Precalcula (vectorizado, una vez por hoja) la fila más reciente de cada alumno
+    según la fecha y hora de atención (COL_FECHA_HORA), sin modificar df_reporte.
+    Retorna:
+        {"tabla": df_reporte con las columnas de normalizar_fechas_reporte,
+         "nombre": {NOMBRE NORMALIZADO: posición},
+         "matricula": {MATRÍCULA: posición}}   (vacío si la hoja no trae Matrícula)
+    """
+    claves_nombre = _serie_nombre_completo(df_reporte).astype(str).str.strip().str.upper().reset_index(drop=True)
+
+    if COL_FECHA_HORA not in df_reporte.columns and "Fecha de atención" in df_reporte.columns:
+        # Tabla que no pasó por _preparar_tabla_reporte
+        df_reporte = normalizar_fechas_reporte(df_reporte.copy())
+    tabla = df_reporte
+    if "Fecha de atención" in df_reporte.columns:
+        fechas = df_reporte[COL_FECHA_HORA]
+        # Orden estable por fecha (sin fecha primero): la última aparición es la más reciente
+        orden = fechas.reset_index(drop=True).sort_values(kind="mergesort", na_position="first").index
     else:
-        fila = df_al.iloc[-1]
-    # limpiar columna temporal
-    df_reporte.drop(columns=["___NOM_SEARCH__"], errors="ignore", inplace=True)
-    return fila
+        orden = claves_nombre.index
+
+    def _ultima_posicion(claves: pd.Series) -> dict:
+        claves = claves.iloc[orden]
+        claves = claves[claves != ""]
+        ultimas = claves[~claves.duplicated(keep="last")]
+        return dict(zip(ultimas.tolist(), ultimas.index.tolist()))
+
+    col_matricula = next((c for c in df_reporte.columns if "matr" in str(c).lower()), None)
+    por_matricula = {}
+    if col_matricula is not None:
+        claves_mat = df_reporte[col_matricula].astype(str).str.strip().str.upper().reset_index(drop=True)
+        por_matricula = _ultima_posicion(claves_mat)
+
+    return {"tabla": tabla, "nombre": _ultima_posicion(claves_nombre), "matricula": por_matricula}
+
+
+def construir_indice_libro_reporte(ruta_excel: str, hojas=None) -> dict:
+    """
+    Lee UNA sola vez todas las hojas del Excel consolidado (o solo las de `hojas`)
+    y prepara el índice de alumnos de cada hoja (ver construir_indice_alumnos).
+    Retorna:
+        {"hojas": [hojas de reporte en orden],
+         "indices": {hoja: índice de alumnos de la hoja}}
+    Las hojas sin encabezado de reporte (Portada, Datos, etc.) se omiten.
+    """
+    if hojas is not None and not hojas:
+        return {"hojas": [], "indices": {}}
+
+    hojas_reporte = []
+    indices = {}
+    for hoja, df_rep in tablas_reporte_del_libro(ruta_excel, hojas):
+        hojas_reporte.append(hoja)
+        indices[hoja] = construir_indice_alumnos(df_rep)
+
+    return {"hojas": hojas_reporte, "indices": indices}
+
+
+def filas_alumno_en_libro(indice_libro: dict, nombre: str, matricula=None) -> list:
+    """Devuelve [(hoja, fila más reciente)] del alumno en cada hoja del libro donde aparece."""
+    filas = []
+    for hoja in indice_libro["hojas"]:
+        try:
+            fila = filtrar_fila_reciente_por_alumno(None, nombre, matricula, indice=indice_libro["indices"][hoja])
+        except ValueError:
+            # Alumno no está en esta hoja (semana)
+            continue
+        filas.append((hoja, fila))
+    return filas
+
+
+def filtrar_fila_reciente_por_alumno(df_reporte: pd.DataFrame, nombre_objetivo: str, matricula=None, indice=None) -> pd.Series:
+    """
+    Selecciona la fila más reciente del alumno en df_reporte comparando la Matrícula
+    (si la hoja la trae) o 'Nombre completo (Reporte)'. Si no encuentra, lanza error con pistas.
+    `indice` (de construir_indice_alumnos) evita recalcular la búsqueda en cada llamada.
+    """
+    if indice is None:
+        indice = construir_indice_alumnos(df_reporte)
+
+    pos = None
+    if matricula:
+        pos = indice["matricula"].get(str(matricula).strip().upper())
+    if pos is None:
+        # Comparación insensible a mayúsculas y espacios
+        pos = indice["nombre"].get(normalizar_nombre_reporte(nombre_objetivo))
+    if pos is None:
+        raise ValueError(f"No se encontraron registros para '{nombre_objetivo}' en TablaReporte.\n\nVerifica que el nombre en el Excel coincida exactamente.")
+
+    return indice["tabla"].iloc[pos]
+
+
+# -------------------------------------------------------------------------------
+# Índice en memoria de la carpeta maestra de expedientes
+# -------------------------------------------------------------------------------
+
+# Una sola lectura (os.scandir) de la carpeta maestra y, bajo demanda, del árbol de
+# cada alumno. Se revalida con el mtime de cada carpeta: solo se vuelve a leer lo que
+# cambió (importante en carpetas sincronizadas con la nube, donde cada stat es lento).
+_indice_carpetas = {"raiz": None, "mtime": None, "alumnos": {}, "por_matricula": {}}
+# Los trabajos en segundo plano y la ventana consultan el índice a la vez
+_lock_indice_carpetas = threading.Lock()
+
+
+def _mtime_carpeta(ruta):
+    try:
+        return os.stat(ruta).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _escanear_arbol_alumno(ruta_alumno: str) -> dict:
+    """
+    Recorre el árbol del alumno una vez (mismo orden que os.walk) y registra:
+    Word de seguimiento, Word de entrevista, carpeta de evidencias, todos los .docx
+    y el mtime de cada carpeta visitada.
+    """
+    entrada = {"ruta": ruta_alumno, "mtimes": {}, "seguimiento": None, "entrevista": None,
+               "evidencias": None, "docx": []}
+
+    def _visitar(carpeta):
+        entrada["mtimes"][carpeta] = _mtime_carpeta(carpeta)
+        try:
+            with os.scandir(carpeta) as it:
+                elementos = list(it)
+        except OSError:
+            return
+        subcarpetas = []
+        for e in elementos:
+            if e.is_dir():
+                # Como os.walk: un enlace a carpeta cuenta como carpeta, pero no se recorre
+                if e.is_dir(follow_symlinks=False):
+                    subcarpetas.append(e.path)
+                if entrada["evidencias"] is None and e.name.startswith("6_Evidencias_"):
+                    entrada["evidencias"] = e.path
+            elif e.name.lower().endswith(".docx") and not e.name.startswith("~$"):
+                entrada["docx"].append(e.path)
+                if entrada["seguimiento"] is None and e.name.startswith("5_Seguimiento individual_"):
+                    entrada["seguimiento"] = e.path
+                if entrada["entrevista"] is None and e.name.startswith("3_Entrevista extendida_"):
+                    entrada["entrevista"] = e.path
+        for sub in subcarpetas:
+            _visitar(sub)
+
+    _visitar(ruta_alumno)
+    return entrada
+
+
+def indexar_carpeta_maestra(ruta_raiz: str) -> dict:
+    """
+    Actualiza (si cambió) y devuelve el índice de la carpeta maestra:
+        {"alumnos": {nombre de carpeta: entrada o None si aún no se recorre},
+         "por_matricula": {Matrícula: [nombres de carpeta]}}
+    La carpeta raíz solo se vuelve a listar cuando cambia su mtime.
+    """
+    ruta_raiz = os.path.abspath(ruta_raiz)
+    mtime = _mtime_carpeta(ruta_raiz)
+    if mtime is None:
+        raise FileNotFoundError(f"No existe la carpeta maestra: {ruta_raiz}")
+
+    with _lock_indice_carpetas:
+        if _indice_carpetas["raiz"] != ruta_raiz:
+            _indice_carpetas.update({"raiz": ruta_raiz, "mtime": None, "alumnos": {}, "por_matricula": {}})
+
+        if _indice_carpetas["mtime"] != mtime:
+            anteriores = _indice_carpetas["alumnos"]
+            alumnos = {}
+            por_matricula = {}
+            with os.scandir(ruta_raiz) as it:
+                for e in it:
+                    if not e.is_dir():
+                        continue
+                    # Conservar lo ya recorrido; se revalida por mtime al consultarlo
+                    alumnos[e.name] = anteriores.get(e.name)
+                    por_matricula.setdefault(e.name.split("_", 1)[0].strip(), []).append(e.name)
+            _indice_carpetas.update({"mtime": mtime, "alumnos": alumnos, "por_matricula": por_matricula})
+
+    return _indice_carpetas
+
+
+def _entrada_alumno(ruta_alumno: str) -> dict:
+    """
+    Devuelve la entrada del índice para la carpeta del alumno, recorriéndola de nuevo
+    solo si alguna de sus carpetas cambió de mtime. Si la carpeta no pertenece a la
+    carpeta maestra indexada, se recorre sin guardar en caché.
+    """
+    ruta_alumno = os.path.abspath(ruta_alumno)
+    raiz, nombre_carpeta = os.path.split(ruta_alumno)
+    if not os.path.isdir(ruta_alumno):
+        raise FileNotFoundError(f"No se encontró la carpeta del alumno: {nombre_carpeta}")
+    with _lock_indice_carpetas:
+        if _indice_carpetas["raiz"] != raiz:
+            return _escanear_arbol_alumno(ruta_alumno)
+
+        entrada = _indice_carpetas["alumnos"].get(nombre_carpeta)
+        if entrada is None or any(_mtime_carpeta(c) != m for c, m in entrada["mtimes"].items()):
+            entrada = _escanear_arbol_alumno(ruta_alumno)
+            _indice_carpetas["alumnos"][nombre_carpeta] = entrada
+        return entrada
 
 
 def buscar_carpeta_alumno(ruta_carpeta_global: str, matricula: str, nombre_mayus: str, programa: str) -> str:
@@ -324,38 +1304,62 @@ def buscar_carpeta_alumno(ruta_carpeta_global: str, matricula: str, nombre_mayus
     Retorna la ruta completa si existe, o lanza FileNotFoundError.
     """
     base_folder = f"{matricula}_{nombre_mayus}_{programa}"
-    ruta = os.path.join(ruta_carpeta_global, base_folder)
-    if not os.path.isdir(ruta):
+    indice = indexar_carpeta_maestra(ruta_carpeta_global)
+    if base_folder not in indice["alumnos"]:
         raise FileNotFoundError(f"No se encontró la carpeta del alumno: {base_folder}")
-    return ruta
+    return os.path.join(indice["raiz"], base_folder)
+
+
+def localizar_carpeta_final_alumno(ruta_carpeta_global: str, matricula: str, nombre_mayus: str, programa: str) -> str:
+    """
+    Localiza la carpeta del alumno: primero por el nombre exacto
+    '{matricula}_{NOMBRE}_{programa}' y, si no existe (p. ej. cambió el programa o el
+    nombre), por la Matrícula al inicio del nombre de la carpeta.
+    Lanza FileNotFoundError si no hay coincidencia.
+    """
+    if not ruta_carpeta_global:
+        raise FileNotFoundError("No se ha seleccionado la carpeta maestra.")
+    try:
+        return buscar_carpeta_alumno(ruta_carpeta_global, matricula, nombre_mayus, programa)
+    except FileNotFoundError:
+        with _lock_indice_carpetas:
+            raiz = _indice_carpetas["raiz"]
+            candidatos = sorted(_indice_carpetas["por_matricula"].get(str(matricula).strip(), []))
+        if not candidatos:
+            raise
+        # Si hay varias carpetas con la misma matrícula, preferir la que trae el nombre
+        preferidas = [c for c in candidatos if str(nombre_mayus) in c]
+        return os.path.join(raiz, (preferidas or candidatos)[0])
 
 
 def encontrar_archivo_seguimiento(ruta_alumno: str) -> str:
     """Busca el archivo Word que comienza con '5_Seguimiento individual_' en el árbol del alumno."""
-    for root_dir, _, files in os.walk(ruta_alumno):
-        for f in files:
-            if f.lower().endswith(".docx") and f.startswith("5_Seguimiento individual_"):
-                return os.path.join(root_dir, f)
-    raise FileNotFoundError("No se encontró un archivo que comience con '5_Seguimiento individual_'.")
+    ruta = _entrada_alumno(ruta_alumno)["seguimiento"]
+    if ruta is None:
+        raise FileNotFoundError("No se encontró un archivo que comience con '5_Seguimiento individual_'.")
+    return ruta
 
 def encontrar_archivo_entrevista(ruta_alumno: str) -> str:
     """Busca el archivo Word que comienza con '3_Entrevista extendida_' en el árbol del alumno."""
-    for root_dir, _, files in os.walk(ruta_alumno):
-        for f in files:
-            if f.lower().endswith(".docx") and f.startswith("3_Entrevista extendida_"):
-                return os.path.join(root_dir, f)
-    raise FileNotFoundError("No se encontró un archivo que comience con '3_Entrevista extendida_'.")
+    ruta = _entrada_alumno(ruta_alumno)["entrevista"]
+    if ruta is None:
+        raise FileNotFoundError("No se encontró un archivo que comience con '3_Entrevista extendida_'.")
+    return ruta
 
 
 def encontrar_carpeta_evidencias(ruta_alumno: str) -> str:
     """
     Busca la carpeta que comienza con '6_Evidencias_' dentro de la carpeta del alumno.
     """
-    for root_dir, dirs, _ in os.walk(ruta_alumno):
-        for d in dirs:
-            if d.startswith("6_Evidencias_"):
-                return os.path.join(root_dir, d)
-    raise FileNotFoundError("No se encontró carpeta que comience con '6_Evidencias_'.")
+    ruta = _entrada_alumno(ruta_alumno)["evidencias"]
+    if ruta is None:
+        raise FileNotFoundError("No se encontró carpeta que comience con '6_Evidencias_'.")
+    return ruta
+
+
+def listar_docx_alumno(ruta_alumno: str) -> list:
+    """Devuelve todos los .docx del árbol del alumno (sin archivos temporales '~$' de Word)."""
+    return list(_entrada_alumno(ruta_alumno)["docx"])
 
 def crear_imagen_blanca(ruta_destino, ancho=200, alto=200):
     """Genera una imagen PNG en blanco en la ruta indicada."""
@@ -446,125 +1450,50 @@ def seleccionar_tutor_gui(titulo="Seleccionar Tutor"):
     return seleccion.get() if seleccion.get() else None
 
 
-def seleccionar_tutor_y_asistencia(nombre):
+# Columnas de la tabla de seguimiento (0-based)
+COL_SEG_FECHA = 1
+COL_SEG_TEMA = 2
+
+
+def indexar_tabla_seguimiento(tabla: docx.table.Table) -> dict:
     """
-    Muestra ventana para seleccionar tutor y si asistió el alumno.
-    Retorna:
-        nombre_tutor (str)
-        asistio (bool)
+    Recorre la tabla de seguimiento UNA vez (al abrir el Word) y arma:
+        {"claves": {(fecha, tema)} ya registrados,
+         "vacias": filas (w:tr) con 'Tema' vacío, en orden}
+    _escribir_renglon_seguimiento lo mantiene al día conforme inserta renglones.
     """
-    ventana = crear_ventana_toplevel(f"Información para {nombre}", ancho=800, alto=450)
-    
-    nombre_tutor = tk.StringVar(value="")
-    asistio = tk.StringVar(value="")
+    claves = set()
+    vacias = deque()
+    for row in tabla.rows:
+        celdas = row.cells
+        if len(celdas) <= COL_SEG_TEMA:
+            continue
+        tema = celdas[COL_SEG_TEMA].text.strip()
+        claves.add((clave_fecha_seguimiento(celdas[COL_SEG_FECHA].text), tema))
+        if not tema:
+            vacias.append(row._tr)
+    return {"claves": claves, "vacias": vacias}
 
-    # --- Sección Tutor ---
-    ttk.Label(ventana, text=f"Tutor para {nombre}:", style="Header.TLabel").pack(pady=10)
-    
-    frame_tutores = ttk.Frame(ventana)
-    frame_tutores.pack(pady=5, fill="x", padx=20)
-    
-    # Grid de tutores para mejor distribución
-    botones_tutores = {}
-    
-    def marcar_tutor(tutor):
-        nombre_tutor.set(tutor)
-        for t, btn in botones_tutores.items():
-            btn.configure(style="TButton")
-        botones_tutores[tutor].configure(style="Accent.TButton")
-
-    # Crear grid 2 columnas
-    for i, t in enumerate(LISTA_TUTORES):
-        btn = ttk.Button(frame_tutores, text=t, command=lambda t=t: marcar_tutor(t))
-        btn.grid(row=i//2, column=i%2, padx=5, pady=5, sticky="ew")
-        botones_tutores[t] = btn
-    
-    frame_tutores.columnconfigure(0, weight=1)
-    frame_tutores.columnconfigure(1, weight=1)
-
-    # --- Sección Asistencia ---
-    ttk.Label(ventana, text="¿Asistió el alumno?", style="Header.TLabel").pack(pady=(20,5))
-    frame_asistencia = ttk.Frame(ventana)
-    frame_asistencia.pack(pady=5)
-
-    botones_asistencia = {}
-
-    def marcar_asistencia(valor):
-        asistio.set(valor)
-        # Reset visual
-        for b in botones_asistencia.values():
-            b.configure(style="TButton")
-        
-        # Estilo según selección
-        estilo = "Accent.TButton" if valor == "Sí" else "Danger.TButton"
-        botones_asistencia[valor].configure(style=estilo)
-
-        # Auto-cerrar si ya hay tutor seleccionado? No, mejor esperar confirmación explícita o cerrar al final.
-        # En el diseño anterior se cerraba al seleccionar asistencia. Mantengamos eso pero validando tutor.
-        if not nombre_tutor.get():
-            messagebox.showwarning("Falta Tutor", "Primero selecciona un tutor.")
-            # Reset asistencia visualmente para no confundir
-            asistio.set("") 
-            botones_asistencia[valor].configure(style="TButton")
-            return
-        
-        ventana.destroy()
-
-    btn_si = ttk.Button(frame_asistencia, text="Sí", command=lambda: marcar_asistencia("Sí"))
-    btn_si.pack(side="left", padx=5)
-    botones_asistencia["Sí"] = btn_si
-
-    btn_no = ttk.Button(frame_asistencia, text="No", command=lambda: marcar_asistencia("No"))
-    btn_no.pack(side="left", padx=5)
-    botones_asistencia["No"] = btn_no
-
-    btn_na = ttk.Button(frame_asistencia, text="N/A", command=lambda: marcar_asistencia("N/A"))
-    btn_na.pack(side="left", padx=5)
-    botones_asistencia["N/A"] = btn_na
-
-    btn_tarea = ttk.Button(frame_asistencia, text="Tarea", command=lambda: marcar_asistencia("Tarea"))
-    btn_tarea.pack(side="left", padx=5)
-    botones_asistencia["Tarea"] = btn_tarea
-
-    btn_just = ttk.Button(frame_asistencia, text="Falta justificada", command=lambda: marcar_asistencia("Falta justificada"))
-    btn_just.pack(side="left", padx=5)
-    botones_asistencia["Falta justificada"] = btn_just
-
-    ventana.grab_set()
-    ventana.wait_window()
 
-    if not nombre_tutor.get() or not asistio.get():
-        # Si cerró la ventana sin seleccionar
-        if messagebox.askyesno("Cancelar", "¿Deseas cancelar la operación para este alumno?"):
-            raise InterruptedError("Operación cancelada por el usuario.")
-        else:
-            return seleccionar_tutor_y_asistencia(nombre) # Reintentar
-
-    return nombre_tutor.get(), asistio.get()
-
-
-def _escribir_renglon_seguimiento(tabla: docx.table.Table, fila: pd.Series, nombre_tutor, asistio):
+def _escribir_renglon_seguimiento(tabla: docx.table.Table, fila: pd.Series, nombre_tutor, asistio, indice=None):
     """
     Función interna para escribir una fila en la tabla Word sin abrir/guardar el archivo.
-    Retorna True si insertó, False si detectó duplicado (opcional, por ahora inserta siempre).
+    Retorna True si insertó, False si detectó duplicado (misma fecha y tema).
+    `indice` (de indexar_tabla_seguimiento) se reutiliza entre inserciones al mismo Word.
     """
-    col_fecha = 1
-    col_tema = 2
+    col_fecha = COL_SEG_FECHA
+    col_tema = COL_SEG_TEMA
     col_situacion = 3
     col_Asistencia = 4
     col_Tutor = 5
 
-    # Convertir valores a string seguro
-    fecha = fila.get("Fecha de atención")
-    Hora = str(fila.get("Hora"))
+    if indice is None:
+        indice = indexar_tabla_seguimiento(tabla)
 
-    if pd.notna(fecha):
-        if isinstance(fecha, pd.Timestamp):
-            fecha = fecha.strftime("%d/%m/%Y") + " " + Hora
-        else:
-            fecha = str(fecha).strip()
-    else:
-        fecha = ""
+    # Fecha ya renderizada al leer la hoja (normalizar_fechas_reporte)
+    fecha = fila.get(COL_FECHA_TEXTO)
+    if fecha is None:
+        fecha = normalizar_fechas_reporte(fila.to_frame().T.reset_index(drop=True))[COL_FECHA_TEXTO].iloc[0]
 
     # Fix: Handle 'nan' string or NaN values explicitly
     def clean_text(val):
@@ -577,49 +1506,48 @@ def _escribir_renglon_seguimiento(tabla: docx.table.Table, fila: pd.Series, nomb
     situacion = clean_text(fila.get("Situación del alumno", ""))
 
     # --- DETECCION DE DUPLICADOS ---
-    # Si ya existe EXACTAMENTE la misma fecha y tema, ignoramos.
-    for r in tabla.rows:
-        try:
-            cf = r.cells[col_fecha].text.strip()
-            ct = r.cells[col_tema].text.strip()
-            if cf == fecha and ct == tema:
-                 # Ya existe
-                 print(f"  [Info] Registro duplicado omitido: {fecha} - {tema}")
-                 return False
-        except IndexError:
-            pass
-
-    # Buscar índice de la primera fila vacía en la columna 2 (Tema)
-    idx_insert = None
-    for i, row in enumerate(tabla.rows):
-        celda = row.cells[col_tema]
-        if not celda.text.strip():
-            idx_insert = i
-            break
-    
-    if idx_insert is not None:
+    # Si ya existe la misma fecha (y hora) y tema, ignoramos. Si la fecha trae hora, un
+    # renglón anterior escrito solo con esa fecha también cuenta como el mismo registro
+    # (los textos que no son fecha se comparan completos).
+    clave = (clave_fecha_seguimiento(fecha), tema)
+    if clave in indice["claves"]:
+        return False
+    con_hora = _PATRON_FECHA_CELDA.match(clave[0])
+    if con_hora and con_hora.group(4) is not None and (clave[0][:10], tema) in indice["claves"]:
+        return False
+
+    # Primera fila vacía en la columna 2 (Tema)
+    vacias = indice["vacias"]
+    if vacias:
         if asistio == "N/A":
             # Si es N/A, insertar nueva fila antes de la vacía para desplazarla
-            fila_existente = tabla.rows[idx_insert]
             fila_insert = tabla.add_row()
-            fila_existente._tr.addprevious(fila_insert._tr)
+            vacias[0].addprevious(fila_insert._tr)
+            if not tema:
+                vacias.appendleft(fila_insert._tr)
         else:
             # Si es Sí/No, usar la fila vacía existente
-            fila_insert = tabla.rows[idx_insert]
+            fila_insert = docx.table._Row(vacias[0], tabla)
+            if tema:
+                vacias.popleft()
     else:
         # Si no hay vacías, agregar al final
         fila_insert = tabla.add_row()
+        if not tema:
+            vacias.append(fila_insert._tr)
+    indice["claves"].add(clave)
 
-    fila_insert.cells[col_fecha].text = fecha
-    fila_insert.cells[col_tema].text = tema
-    fila_insert.cells[col_situacion].text = situacion
-    fila_insert.cells[col_Asistencia].text = str(asistio)
-    fila_insert.cells[col_Tutor].text = str(nombre_tutor)
+    celdas = fila_insert.cells
+    celdas[col_fecha].text = fecha
+    celdas[col_tema].text = tema
+    celdas[col_situacion].text = situacion
+    celdas[col_Asistencia].text = str(asistio)
+    celdas[col_Tutor].text = str(nombre_tutor)
 
     # Estilo
-    for cell in [fila_insert.cells[col_fecha], fila_insert.cells[col_tema],
-                fila_insert.cells[col_situacion], fila_insert.cells[col_Asistencia],
-                fila_insert.cells[col_Tutor]]:
+    for cell in [celdas[col_fecha], celdas[col_tema],
+                celdas[col_situacion], celdas[col_Asistencia],
+                celdas[col_Tutor]]:
         
         cell.vertical_alignment = WD_ALIGN_PARAGRAPH.CENTER
         for p in cell.paragraphs:
@@ -630,30 +1558,13 @@ def _escribir_renglon_seguimiento(tabla: docx.table.Table, fila: pd.Series, nomb
     return True
 
 
-def insertar_actividad_en_word(ruta_docx: str, fila: pd.Series, nombre, tutor_predefinido=None, asistencia_predefinida=None):
+def escribir_actividad_docx(ruta_docx: str, fila: pd.Series, nombre_tutor, asistio) -> bool:
     """
-    Inserta los datos de una fila de reporte en la tabla del Word.
-    Si se dan tutor_predefinido y asistencia_predefinida, NO abre ventana de diálogo (modo silencioso).
-    Retorna: tuple: (nombre_tutor, asistio)
+    Abre el Word de seguimiento, inserta la fila del reporte y lo guarda (sin diálogos).
+    Retorna True si insertó, False si el registro ya existía.
     """
-    if not os.path.isfile(ruta_docx):
-        raise FileNotFoundError(f"No se encontró el archivo Word: {ruta_docx}")
-
-    # Solicitar tutor y asistencia o usar predefinidos
-    if tutor_predefinido is not None and asistencia_predefinida is not None:
-        nombre_tutor = tutor_predefinido
-        asistio = asistencia_predefinida
-    else:
-        try:
-            nombre_tutor, asistio = seleccionar_tutor_y_asistencia(nombre)
-        except InterruptedError:
-            return None, None # Señal de cancelación
-
-    try:
+    with medir_etapa(ETAPA_ABRIR_DOCX):
         doc = docx.Document(ruta_docx)
-    except Exception as e:
-        messagebox.showerror("Error de Archivo", f"No se pudo abrir el documento Word.\n\nCierra el archivo si lo tienes abierto.\n\nDetalle: {e}")
-        raise RuntimeError(f"No se pudo abrir el documento Word: {e}")
 
     # Buscar la primera tabla
     if not doc.tables:
@@ -667,40 +1578,537 @@ def insertar_actividad_en_word(ruta_docx: str, fila: pd.Series, nombre, tutor_pr
     if asistio in ["Tarea", "Falta justificada"]:
         asistio_para_reporte = "Sí"
 
-    _escribir_renglon_seguimiento(tabla, fila, nombre_tutor, asistio_para_reporte)
-    
-    try:
-        doc.save(ruta_docx)
-    except PermissionError:
-        messagebox.showerror("Error de Permiso", f"No se pudo guardar el archivo Word.\n\n¡CIERRA EL ARCHIVO WORD SI LO TIENES ABIERTO!\n\nRuta: {ruta_docx}")
-        raise
-
-    return nombre_tutor, asistio
+    with medir_etapa(ETAPA_INSERTAR):
+        inserto = _escribir_renglon_seguimiento(tabla, fila, nombre_tutor, asistio_para_reporte)
+    if inserto:
+        with medir_etapa(ETAPA_GUARDAR_DOCX):
+            guardar_docx(doc, ruta_docx)
+    return inserto
 
 
 def proximo_numero_sesion(carpeta_evidencias: str, iniciales: str) -> int:
-    """Calcula el siguiente número de sesión buscando archivos existentes 'sesión_#_..._INICIALES'."""
+    """
+    Calcula el siguiente número de sesión contando las imágenes .jpg/.jpeg/.png de la
+    carpeta, más las evidencias 'Sesión{n}_..._{INICIALES}' guardadas con otra extensión
+    (p. ej. .heic que no se pudo convertir).
+    """
     extensiones = (".jpg", ".jpeg", ".png")
-    archivos = [f for f in os.listdir(carpeta_evidencias) if f.lower().endswith(extensiones)]
+    patron = re.compile(rf"^Sesión\d+_.*_{re.escape(iniciales)}\.[^.]+$", re.IGNORECASE)
+    archivos = [
+        f for f in os.listdir(carpeta_evidencias)
+        if f.lower().endswith(extensiones) or patron.match(unicodedata.normalize("NFC", f))
+    ]
     return len(archivos) + 1
 
 
-def copiar_y_renombrar_evidencia(carpeta_evidencias: str, ruta_imagen_src: str, actividad: str, iniciales: str) -> str:
+def copiar_y_renombrar_evidencia(carpeta_evidencias: str, ruta_imagen_src: str, actividad: str, iniciales: str, etapa=None) -> str:
+    """
+    Guarda la evidencia como 'Sesión{n}_{actividad}_{iniciales}'. Con NORMALIZAR_EVIDENCIAS
+    la imagen se recomprime a .jpeg (en `etapa`, si se da, para hacerlo en segundo plano);
+    si no, o si Pillow no la puede leer, se copia tal cual con su extensión.
+    Retorna la ruta guardada; con `etapa` es la ruta prevista (.jpeg) y la real queda en
+    el "destinos" de etapa.terminar().
+    """
+    num_sesion = proximo_numero_sesion(carpeta_evidencias, iniciales)
+    if etapa is not None:
+        # Las que siguen en cola todavía no están en la carpeta
+        num_sesion += etapa.pendientes_en(carpeta_evidencias)
+    actividad_limpia = "_".join(str(actividad).strip().split())
+    extension = os.path.splitext(ruta_imagen_src)[1].lower()
+    normalizar = NORMALIZAR_EVIDENCIAS and extension in EXTENSIONES_NORMALIZABLES
+    if extension in (".heic", ".heif") and not _habilitar_heif():
+        # Sin pillow-heif no hay forma de decodificarla: se conserva el original
+        normalizar = False
+    nombre_dest = f"Sesión{num_sesion}_{actividad_limpia}_{iniciales}"
+    ruta_dest = os.path.join(carpeta_evidencias, nombre_dest + (".jpeg" if normalizar else extension))
+    if not normalizar:
+        shutil.copy2(ruta_imagen_src, ruta_dest)
+    elif etapa is not None:
+        etapa.enviar(ruta_imagen_src, ruta_dest)
+    else:
+        ruta_dest = normalizar_evidencia(ruta_imagen_src, ruta_dest)["destino"]
+    return ruta_dest
+
+
+# -------------------------------------------------------------------------------
+# Normalización de evidencias (Pillow)
+# -------------------------------------------------------------------------------
+
+EXTENSIONES_NORMALIZABLES = (".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff", ".heic", ".heif")
+
+
+@functools.lru_cache(maxsize=1)
+def _habilitar_heif() -> bool:
+    """Registra el lector HEIC de pillow-heif si está instalado (fotos de iPhone)."""
+    try:
+        import pillow_heif
+    except ImportError:
+        return False
+    pillow_heif.register_heif_opener()
+    return True
+
+
+def normalizar_evidencia(ruta_src: str, ruta_dest: str, lado_max=None, calidad=None) -> dict:
+    """
+    Escribe en `ruta_dest` la imagen reducida a `lado_max` píxeles (lado más largo),
+    girada según su orientación EXIF, sin metadatos y recomprimida a JPEG.
+    Si Pillow no puede leerla (p. ej. HEIC sin pillow-heif) se copia tal cual con la
+    extensión del original en lugar de la de `ruta_dest`.
+    Retorna {"origen", "previsto": ruta_dest, "destino": ruta realmente escrita,
+             "bytes_antes", "bytes_despues", "error"}.
+    """
+    lado_max = lado_max or EVIDENCIA_LADO_MAX
+    calidad = calidad or EVIDENCIA_CALIDAD_JPEG
+    bytes_antes = os.path.getsize(ruta_src)
+    if os.path.splitext(ruta_src)[1].lower() in (".heic", ".heif"):
+        _habilitar_heif()
+
+    try:
+        with Image.open(ruta_src) as original:
+            # JPEG: decodificar directo a una escala cercana (mucho más rápido que a tamaño completo)
+            original.draft("RGB", (lado_max, lado_max))
+            im = ImageOps.exif_transpose(original)
+            if im.mode in ("RGBA", "LA", "PA") or (im.mode == "P" and "transparency" in im.info):
+                im = im.convert("RGBA")
+                fondo = Image.new("RGB", im.size, (255, 255, 255))
+                fondo.paste(im, mask=im.getchannel("A"))
+                im = fondo
+            elif im.mode != "RGB":
+                im = im.convert("RGB")
+            im.thumbnail((lado_max, lado_max), Image.LANCZOS)
+
+            fd, ruta_tmp = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(ruta_dest) or ".")
+            os.close(fd)
+            try:
+                # Sin exif=...: no se copia ningún metadato (GPS, cámara, miniatura)
+                im.save(ruta_tmp, "JPEG", quality=calidad, optimize=True)
+                os.replace(ruta_tmp, ruta_dest)
+            except BaseException:
+                if os.path.exists(ruta_tmp):
+                    os.remove(ruta_tmp)
+                raise
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        ruta_copia = os.path.splitext(ruta_dest)[0] + os.path.splitext(ruta_src)[1].lower()
+        shutil.copy2(ruta_src, ruta_copia)
+        return {"origen": ruta_src, "previsto": ruta_dest, "destino": ruta_copia, "bytes_antes": bytes_antes,
+                "bytes_despues": bytes_antes, "error": str(e)}
+
+    return {"origen": ruta_src, "previsto": ruta_dest, "destino": ruta_dest, "bytes_antes": bytes_antes,
+            "bytes_despues": os.path.getsize(ruta_dest), "error": ""}
+
+
+class EtapaNormalizacion:
+    """
+    Recomprime evidencias en un pool de hilos mientras el hilo que la usa sigue con los
+    Word (Pillow suelta el GIL al decodificar, redimensionar y codificar).
+    terminar() espera a que acaben y devuelve el resumen.
+    """
+
+    def __init__(self, max_workers=None, lado_max=None, calidad=None):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers or min(4, os.cpu_count() or 1),
+                                        thread_name_prefix="evidencias")
+        self._lado_max = lado_max
+        self._calidad = calidad
+        self._futuros = []
+        self._carpetas = []
+
+    def pendientes_en(self, carpeta) -> int:
+        """Evidencias enviadas a `carpeta` que pueden no estar escritas todavía."""
+        return self._carpetas.count(os.path.abspath(carpeta))
+
+    def enviar(self, ruta_src, ruta_dest):
+        self._carpetas.append(os.path.abspath(os.path.dirname(ruta_dest)))
+        self._futuros.append(self._pool.submit(normalizar_evidencia, ruta_src, ruta_dest, self._lado_max, self._calidad))
+
+    def terminar(self) -> dict:
+        """
+        Retorna {"archivos", "bytes_antes", "bytes_despues", "ahorro",
+                 "por_destino": {ruta real: bytes ahorrados},
+                 "destinos": {ruta prevista: ruta real}, "fallos": [(origen, error)]}.
+        """
+        self._pool.shutdown(wait=True)
+        resumen = {"archivos": 0, "bytes_antes": 0, "bytes_despues": 0, "ahorro": 0,
+                   "por_destino": {}, "destinos": {}, "fallos": []}
+        for futuro in self._futuros:
+            try:
+                r = futuro.result()
+            except Exception as e:
+                resumen["fallos"].append(("", str(e)))
+                continue
+            if r["error"]:
+                resumen["fallos"].append((r["origen"], r["error"]))
+            resumen["archivos"] += 1
+            resumen["bytes_antes"] += r["bytes_antes"]
+            resumen["bytes_despues"] += r["bytes_despues"]
+            resumen["por_destino"][r["destino"]] = r["bytes_antes"] - r["bytes_despues"]
+            resumen["destinos"][r["previsto"]] = r["destino"]
+        resumen["ahorro"] = resumen["bytes_antes"] - resumen["bytes_despues"]
+        return resumen
+
+
+# Orientaciones EXIF que intercambian ancho y alto
+_EXIF_ORIENTACION = 0x0112
+_ORIENTACIONES_GIRADAS = (5, 6, 7, 8)
+
+
+def tamano_imagen_orientado(im) -> tuple:
+    """(ancho, alto) en píxeles ya aplicada la orientación EXIF; solo lee el encabezado."""
+    w, h = im.size
+    if im.getexif().get(_EXIF_ORIENTACION, 1) in _ORIENTACIONES_GIRADAS:
+        return h, w
+    return w, h
+
+
+def dpi_imagen_orientado(im) -> tuple:
+    """(dpi horizontal, dpi vertical) ya aplicada la orientación EXIF; 96 si no los trae."""
+    dpi = im.info.get("dpi") or (96, 96)
+    dpi_x, dpi_y = (float(d) or 96.0 for d in dpi[:2])
+    if im.getexif().get(_EXIF_ORIENTACION, 1) in _ORIENTACIONES_GIRADAS:
+        return dpi_y, dpi_x
+    return dpi_x, dpi_y
+
+
+# Límites de la caché de derivados (carpeta_cache("derivados")): se borran primero los
+# que llevan más días sin usarse y luego los menos recientes hasta quedar bajo el tope
+DERIVADOS_MAX_BYTES = 500 * 1024 * 1024
+DERIVADOS_MAX_DIAS = 30
+
+
+def podar_cache_derivados(max_bytes=None, max_dias=None) -> int:
+    """Aplica los límites de la caché de derivados. Retorna los bytes liberados."""
+    max_bytes = DERIVADOS_MAX_BYTES if max_bytes is None else max_bytes
+    max_dias = DERIVADOS_MAX_DIAS if max_dias is None else max_dias
+    carpeta = carpeta_cache("derivados")
+    archivos = []
+    for entrada in os.scandir(carpeta):
+        if entrada.is_file() and not entrada.name.endswith(".tmp"):
+            st = entrada.stat()
+            archivos.append((st.st_mtime, st.st_size, entrada.path))
+    archivos.sort()
+
+    limite = marca_tiempo() - max_dias * 86400
+    total = sum(tamano for _, tamano, _ in archivos)
+    liberados = 0
+    for mtime, tamano, ruta in archivos:
+        if mtime >= limite and total <= max_bytes:
+            break
+        try:
+            os.remove(ruta)
+        except OSError:
+            continue
+        total -= tamano
+        liberados += tamano
+    return liberados
+
+
+def derivado_imagen(ruta_src: str, ancho_px: int, alto_px: int) -> str:
+    """
+    Ruta de la imagen lista para incrustar a `ancho_px` × `alto_px`: orientada según EXIF
+    y reducida (nunca se amplía). Los derivados se guardan en la caché por
+    (hash del archivo, tamaño), así volver a insertar la misma foto no la decodifica otra vez;
+    usar un derivado renueva su fecha para podar_cache_derivados.
+    Si la original ya sirve tal cual (o Pillow no la puede leer) se devuelve la original.
+    """
+    try:
+        clave = f"{hash_archivo(ruta_src)}_{ancho_px}x{alto_px}"
+        carpeta = carpeta_cache("derivados")
+        for extension in (".jpg", ".png"):
+            ruta = os.path.join(carpeta, clave + extension)
+            if os.path.isfile(ruta):
+                os.utime(ruta)
+                return ruta
+
+        with Image.open(ruta_src) as original:
+            orientada = original.getexif().get(_EXIF_ORIENTACION, 1) != 1
+            ancho_src, alto_src = tamano_imagen_orientado(original)
+            if not orientada and ancho_px >= ancho_src and alto_px >= alto_src:
+                return ruta_src
+            es_jpeg = original.format == "JPEG"
+            if es_jpeg:
+                original.draft("RGB", (ancho_px, alto_px))
+            im = ImageOps.exif_transpose(original)
+            im.thumbnail((ancho_px, alto_px), Image.LANCZOS)
+
+            if es_jpeg:
+                ruta = os.path.join(carpeta, clave + ".jpg")
+                im = im if im.mode in ("RGB", "L") else im.convert("RGB")
+                opciones = {"format": "JPEG", "quality": 85, "optimize": True}
+            else:
+                ruta = os.path.join(carpeta, clave + ".png")
+                im = im if im.mode in ("RGB", "RGBA", "L", "LA", "P") else im.convert("RGBA")
+                opciones = {"format": "PNG", "optimize": True}
+
+            fd, ruta_tmp = tempfile.mkstemp(suffix=".tmp", dir=carpeta)
+            os.close(fd)
+            try:
+                im.save(ruta_tmp, **opciones)
+                os.replace(ruta_tmp, ruta)
+            except BaseException:
+                if os.path.exists(ruta_tmp):
+                    os.remove(ruta_tmp)
+                raise
+        return ruta
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        registrar_evento(f"Se usará la imagen original {os.path.basename(ruta_src)}: {e}", "advertencia", imagen=ruta_src)
+        return ruta_src
+
+
+def formato_bytes(n) -> str:
+    """12345678 -> '11.8 MB'."""
+    for unidad in ("B", "KB", "MB"):
+        if abs(n) < 1024:
+            return f"{n:.0f} {unidad}" if unidad == "B" else f"{n:.1f} {unidad}"
+        n /= 1024
+    return f"{n:.1f} GB"
+
+
+def crear_evidencia_en_blanco(carpeta_evidencias: str, iniciales: str) -> str:
+    """Crea la evidencia en blanco 'Sesión{n}_BORRAR_{iniciales}.jpeg' para una inasistencia."""
+    actividad = "BORRAR"
     num_sesion = proximo_numero_sesion(carpeta_evidencias, iniciales)
     actividad_limpia = "_".join(str(actividad).strip().split())
-    nombre_dest = f"Sesión{num_sesion}_{actividad_limpia}_{iniciales}{os.path.splitext(ruta_imagen_src)[1].lower()}"
+    nombre_dest = f"Sesión{num_sesion}_{actividad_limpia}_{iniciales}.jpeg"
     ruta_dest = os.path.join(carpeta_evidencias, nombre_dest)
-    shutil.copy2(ruta_imagen_src, ruta_dest)
+    crear_imagen_blanca(ruta_dest)
     return ruta_dest
 
 
+def registrar_actividad_alumno(datos, nombre_tutor, asistio, actividad=None, ruta_evidencia=None, indice_reporte=None, etapa=None) -> dict:
+    """
+    Registra la actividad semanal de un alumno sin diálogos: inserta su fila más reciente
+    de la hoja semanal en el Word de seguimiento y guarda la evidencia según la asistencia
+    (imagen copiada para Sí/Tarea/Falta justificada, imagen en blanco para No).
+    `indice_reporte` (de construir_indice_alumnos sobre la hoja semanal) y `etapa`
+    (EtapaNormalizacion para recomprimir la evidencia en segundo plano) se reutilizan en lote.
+    Retorna {"insertado": bool, "evidencia": ruta o None}.
+    """
+    nombre = datos["Nombre completo"][0]
+    matricula = datos.get("Matrícula", [""])[0]
+    programa = datos.get("Programa", [""])[0]
+
+    if indice_reporte is None:
+        with medir_etapa(ETAPA_EXCEL):
+            indice_reporte = construir_indice_alumnos(leer_tabla_reporte(ruta_excel_principal, hoja=2))
+    fila = filtrar_fila_reciente_por_alumno(None, nombre, matricula, indice=indice_reporte)
+
+    with medir_etapa(ETAPA_CARPETA):
+        ruta_alumno = localizar_carpeta_final_alumno(ruta_carpeta_global, matricula, nombre.upper(), programa)
+        ruta_docx = encontrar_archivo_seguimiento(ruta_alumno)
+    insertado = escribir_actividad_docx(ruta_docx, fila, nombre_tutor, asistio)
+
+    evidencia = None
+    with medir_etapa(ETAPA_IMAGENES):
+        if asistio in ["Sí", "Tarea", "Falta justificada"]:
+            if ruta_evidencia and actividad:
+                carpeta_evid = encontrar_carpeta_evidencias(ruta_alumno)
+                evidencia = copiar_y_renombrar_evidencia(carpeta_evid, ruta_evidencia, actividad, obtener_iniciales(nombre), etapa)
+        elif asistio == "No":
+            carpeta_evid = encontrar_carpeta_evidencias(ruta_alumno)
+            evidencia = crear_evidencia_en_blanco(carpeta_evid, obtener_iniciales(nombre))
+
+    return {"insertado": insertado, "evidencia": evidencia}
+
+
+def registrar_actividades_lote(datos, entradas, ruta_excel, progreso=None, registro_tiempos=None, normalizar=None) -> list:
+    """
+    Registra la actividad semanal de todos los alumnos de `datos`. `entradas` va en el
+    mismo orden: {"tutor", "asistencia", "actividad", "evidencia"} por alumno, o None
+    para omitirlo; una asistencia que no esté en ASISTENCIAS es error de ese alumno.
+    La hoja semanal se lee una sola vez y, con `normalizar` (por omisión
+    NORMALIZAR_EVIDENCIAS), las evidencias se recomprimen con pérdida en un pool de hilos.
+    Con `progreso` (ProgresoTrabajo) informa cada alumno y se detiene entre alumnos si se cancela.
+    Los tiempos por etapa van a `registro_tiempos` (RegistroTiempos); sin él, el lote
+    usa uno propio y lo cierra al final.
+    Retorna [{"alumno", "estado": "ok"|"error"|"omitido"|"cancelado", "insertado", "evidencia",
+              "ahorro_bytes", "error"}].
+    """
+    propio = registro_tiempos is None
+    if propio:
+        registro_tiempos = RegistroTiempos("actividad")
+    nombres = datos["Nombre completo"]
+    if progreso is not None:
+        progreso.iniciar(len(nombres), "Leyendo la hoja semanal...")
+    with registro_tiempos.alumno(ALUMNO_LOTE), medir_etapa(ETAPA_EXCEL):
+        indice_reporte = construir_indice_alumnos(leer_tabla_reporte(ruta_excel, hoja=2))
+    if normalizar is None:
+        normalizar = NORMALIZAR_EVIDENCIAS
+    etapa = EtapaNormalizacion() if normalizar else None
+
+    resultados = []
+    for idx, nombre in enumerate(nombres):
+        entrada = entradas[idx]
+        resultado = {"alumno": nombre, "estado": "ok", "insertado": False, "evidencia": None, "ahorro_bytes": 0, "error": ""}
+        resultados.append(resultado)
+        if progreso is not None and progreso.cancelado():
+            resultado["estado"] = "cancelado"
+            continue
+        if entrada is None:
+            resultado["estado"] = "omitido"
+            texto = "Omitido"
+        else:
+            alumno = {col: [datos[col][idx]] for col in datos}
+            try:
+                if entrada.get("asistencia") not in ASISTENCIAS:
+                    raise ValueError(f"Asistencia no válida: {entrada.get('asistencia')!r} "
+                                     f"(se espera una de {', '.join(ASISTENCIAS)})")
+                with registro_tiempos.alumno(nombre):
+                    resultado.update(registrar_actividad_alumno(
+                        alumno, entrada["tutor"], entrada["asistencia"],
+                        entrada.get("actividad"), entrada.get("evidencia"), indice_reporte, etapa,
+                    ))
+                texto = "Registrado" if resultado["insertado"] else "Ya estaba registrado"
+            except PermissionError:
+                resultado.update(estado="error", error="No se pudo guardar el Word (¿está abierto?)")
+                texto = f"Error: {resultado['error']}"
+            except Exception as e:
+                resultado.update(estado="error", error=str(e))
+                texto = f"Error: {e}"
+        if progreso is not None:
+            progreso.avanzar(nombre, texto)
+
+    if etapa is not None:
+        if progreso is not None:
+            progreso.mensaje("Terminando de comprimir evidencias...")
+        with registro_tiempos.alumno(ALUMNO_LOTE), medir_etapa(ETAPA_IMAGENES):
+            resumen_etapa = etapa.terminar()
+        for resultado in resultados:
+            evidencia = resumen_etapa["destinos"].get(resultado["evidencia"], resultado["evidencia"])
+            resultado["evidencia"] = evidencia
+            resultado["ahorro_bytes"] = resumen_etapa["por_destino"].get(evidencia, 0)
+    if propio:
+        registro_tiempos.terminar()
+    return resultados
+
+
+def resumen_actividades(resultados: list) -> str:
+    """Arma el texto de resumen del registro semanal por lote."""
+    ok = [r for r in resultados if r["estado"] == "ok"]
+    lineas = [
+        f"Actividades registradas: {sum(1 for r in ok if r['insertado'])}",
+        f"Ya estaban registradas: {sum(1 for r in ok if not r['insertado'])}",
+        f"Evidencias guardadas: {sum(1 for r in ok if r['evidencia'])}",
+    ]
+    ahorro = sum(r.get("ahorro_bytes", 0) for r in ok)
+    if ahorro:
+        lineas.append(f"Espacio ahorrado al comprimir evidencias: {formato_bytes(ahorro)}")
+    omitidos = sum(1 for r in resultados if r["estado"] == "omitido")
+    cancelados = sum(1 for r in resultados if r["estado"] == "cancelado")
+    if omitidos:
+        lineas.append(f"Omitidos: {omitidos}")
+    if cancelados:
+        lineas.append(f"Sin procesar (cancelado): {cancelados}")
+    errores = [r for r in resultados if r["estado"] == "error"]
+    lineas.append(f"Con error: {len(errores)}")
+    if errores:
+        lineas.append("")
+        for r in errores[:15]:
+            lineas.append(f"• {r['alumno']}: {r['error']}")
+        if len(errores) > 15:
+            lineas.append(f"... y {len(errores) - 15} más.")
+    return "\n".join(lineas)
+
+
 # -------------------------------------------------------------------------------
 # Módulo crear_expedientes
 # -------------------------------------------------------------------------------
 
+def _copiar_o_renderizar(src_path, dest_path, markers, resumen):
+    """
+    Si hay marcadores y el archivo es .docx, escribe el documento ya llenado directamente
+    en su destino (una sola escritura); si no, lo copia tal cual.
+    """
+    if markers is None or not src_path.lower().endswith(".docx"):
+        with medir_etapa(ETAPA_CARPETA):
+            shutil.copy2(src_path, dest_path)
+        return
+    inicio = perf_counter()
+    try:
+        with medir_etapa(ETAPA_ABRIR_DOCX):
+            compilada = compilar_plantilla(src_path)
+        with medir_etapa(ETAPA_GUARDAR_DOCX):
+            renderizar_plantilla(compilada, markers, dest_path)
+        resumen["archivos"].append((dest_path, perf_counter() - inicio))
+    except Exception as e:
+        # Plantilla que no se pudo compilar: se deja la copia sin llenar
+        shutil.copy2(src_path, dest_path)
+        resumen["fallos"].append((dest_path, str(e)))
+
+
+def crear_expedientes_lote(datos, raiz, plantilla_dir, prefijo, NombreTutor=None, registro_tiempos=None) -> dict:
+    """
+    Crea la estructura de carpetas de los alumnos y pone en ellas las plantillas.
+    Si se da `NombreTutor`, cada plantilla .docx se escribe ya llenada (crear + llenar
+    en una sola pasada); los demás archivos y la renombración de .jpeg no cambian.
+    Los tiempos por etapa van a `registro_tiempos` (ver registrar_actividades_lote).
+    Retorna el mismo resumen que llenar_documentos_lote.
+    """
+    inicio = perf_counter()
+    resumen = {"archivos": [], "fallos": [], "sin_carpeta": [], "segundos": 0.0}
+    propio = registro_tiempos is None
+    if propio:
+        registro_tiempos = RegistroTiempos("crear")
+
+    for i in range(len(datos.get("Nombre completo", []))):
+        with registro_tiempos.alumno(datos["Nombre completo"][i]):
+            _crear_expediente_alumno(datos, i, raiz, plantilla_dir, prefijo, NombreTutor, resumen)
+
+    resumen["segundos"] = perf_counter() - inicio
+    if propio:
+        registro_tiempos.terminar()
+    return resumen
+
+
+def _crear_expediente_alumno(datos, i, raiz, plantilla_dir, prefijo, NombreTutor, resumen):
+    """Crea las carpetas del alumno `i` de `datos` y pone en ellas las plantillas (ver crear_expedientes_lote)."""
+    nombre = datos["Nombre completo"][i].upper()
+    matricula = datos.get("Matrícula", [None])[i]
+    programa = datos.get("Programa", [None])[i]
+    periodo = datos.get("Período", [None])[i]
+
+    if not (nombre and matricula and programa and periodo):
+        return
+
+    base_folder = f"{matricula}_{nombre}_{programa}"
+    ruta_alumno = os.path.join(raiz, base_folder)
+    with medir_etapa(ETAPA_CARPETA):
+        os.makedirs(ruta_alumno, exist_ok=True)
+
+    markers = None
+    if NombreTutor:
+        _, markers = construir_marcadores_alumno(datos, i, NombreTutor)
+
+    iniciales = obtener_iniciales(nombre)
+    interna = f"{prefijo}@{periodo}_{matricula}_{iniciales}_{programa}"
+    ruta_interna = os.path.join(ruta_alumno, interna)
+    with medir_etapa(ETAPA_CARPETA):
+        os.makedirs(ruta_interna, exist_ok=True)
+
+    # Copiar/renombrar plantillas y carpetas
+    for item in os.listdir(plantilla_dir):
+        src_path = os.path.join(plantilla_dir, item)
+        if os.path.isfile(src_path):
+            nuevo_nombre = f"{os.path.splitext(item)[0]}_{iniciales}_{programa}_{periodo}{os.path.splitext(item)[1]}"
+            dest_path = os.path.join(ruta_interna, nuevo_nombre)
+            _copiar_o_renderizar(src_path, dest_path, markers, resumen)
+        elif os.path.isdir(src_path):
+            nuevo_nombre_carpeta = f"{item}_{iniciales}_{programa}_{periodo}"
+            dest_dir_path = os.path.join(ruta_interna, nuevo_nombre_carpeta)
+            os.makedirs(dest_dir_path, exist_ok=True)
+            for archivo_interno in os.listdir(src_path):
+                src_file_path = os.path.join(src_path, archivo_interno)
+                if archivo_interno.lower().endswith((".jpeg", ".jpg")):
+                    nombre_base, extension = os.path.splitext(archivo_interno)
+                    nuevo_nombre_archivo = f"{nombre_base}_{iniciales}{extension}"
+                else:
+                    nuevo_nombre_archivo = archivo_interno
+                dest_file_path = os.path.join(dest_dir_path, nuevo_nombre_archivo)
+                _copiar_o_renderizar(src_file_path, dest_file_path, markers, resumen)
+
+
 def crear_expedientes(datos):
     """
     Crea la estructura de carpetas y copia plantillas para los alumnos seleccionados.
+    Si el usuario lo elige, los documentos Word se escriben ya llenados.
     """
     global seleccion_primera_vez
     global ruta_carpeta_global
@@ -718,44 +2126,19 @@ def crear_expedientes(datos):
         messagebox.showerror("Error", "No ingresaste un prefijo. Proceso cancelado.")
         return
 
-    for i in range(len(datos.get("Nombre completo", []))):
-        nombre = datos["Nombre completo"][i].upper()
-        matricula = datos.get("Matrícula", [None])[i]
-        programa = datos.get("Programa", [None])[i]
-        periodo = datos.get("Período", [None])[i]
-
-        if not (nombre and matricula and programa and periodo):
-            continue
-
-        base_folder = f"{matricula}_{nombre}_{programa}"
-        ruta_alumno = os.path.join(ruta_carpeta_global, base_folder)
-        os.makedirs(ruta_alumno, exist_ok=True)
+    NombreTutor = None
+    if messagebox.askyesno("Llenar Documentos", "¿Deseas llenar los documentos Word al crear los expedientes?"):
+        NombreTutor = seleccionar_tutor_gui("Selecciona el Tutor para los documentos")
+        if not NombreTutor:
+            messagebox.showwarning("Sin Tutor", "No se seleccionó tutor. Los expedientes se crearán sin llenar.")
 
-        iniciales = obtener_iniciales(nombre)
-        interna = f"{prefijo}@{periodo}_{matricula}_{iniciales}_{programa}"
-        ruta_interna = os.path.join(ruta_alumno, interna)
-        os.makedirs(ruta_interna, exist_ok=True)
+    tiempos = RegistroTiempos("crear")
+    resumen = crear_expedientes_lote(datos, ruta_carpeta_global, ruta_plantillas, prefijo, NombreTutor, tiempos)
+    resumen_tiempos = texto_tiempos(tiempos.terminar())
 
-        # Copiar/renombrar plantillas y carpetas
-        for item in os.listdir(plantilla_dir):
-            src_path = os.path.join(plantilla_dir, item)
-            if os.path.isfile(src_path):
-                nuevo_nombre = f"{os.path.splitext(item)[0]}_{iniciales}_{programa}_{periodo}{os.path.splitext(item)[1]}"
-                dest_path = os.path.join(ruta_interna, nuevo_nombre)
-                shutil.copy2(src_path, dest_path)
-            elif os.path.isdir(src_path):
-                nuevo_nombre_carpeta = f"{item}_{iniciales}_{programa}_{periodo}"
-                dest_dir_path = os.path.join(ruta_interna, nuevo_nombre_carpeta)
-                os.makedirs(dest_dir_path, exist_ok=True)
-                for archivo_interno in os.listdir(src_path):
-                    src_file_path = os.path.join(src_path, archivo_interno)
-                    if archivo_interno.lower().endswith((".jpeg", ".jpg")):
-                        nombre_base, extension = os.path.splitext(archivo_interno)
-                        nuevo_nombre_archivo = f"{nombre_base}_{iniciales}{extension}"
-                    else:
-                        nuevo_nombre_archivo = archivo_interno
-                    dest_file_path = os.path.join(dest_dir_path, nuevo_nombre_archivo)
-                    shutil.copy2(src_file_path, dest_file_path)
+    if NombreTutor:
+        messagebox.showinfo("Proceso Completo", "Los expedientes fueron creados y llenados.\n\n" + resumen_llenado(resumen) + "\n\n" + resumen_tiempos)
+        return
 
     messagebox.showinfo("Proceso Completo", "Los expedientes fueron creados exitosamente.")
     mostrar_crear_opciones(datos)
@@ -780,6 +2163,198 @@ def mostrar_crear_opciones(datos):
 # Módulo llenar_documentos
 # -------------------------------------------------------------------------------
 
+def construir_marcadores_alumno(datos, i, NombreTutor):
+    """
+    Arma (una sola vez por alumno) la carpeta base y el diccionario de marcadores
+    del alumno `i` de `datos`.
+    Retorna (nombre de carpeta base, markers).
+    """
+    n = len(datos["Nombre completo"])
+
+    def _valor(col):
+        return datos.get(col, [None] * n)[i]
+
+    nombre = datos["Nombre completo"][i]
+    matricula = datos["Matrícula"][i]
+    programa = datos["Programa"][i]
+    periodo = datos["Período"][i]
+    dia = _valor("Dia")
+    hora_ini_raw = _valor("Hora inicio")
+    horafin_raw = _valor("Hora final")
+
+    hora_ini = formatear_hora(hora_ini_raw)
+    horafin = formatear_hora(horafin_raw)
+
+    horario = f"{dia} {hora_ini}-{horafin}"
+    area = _valor("Área de intervención") or ""
+    edad = _valor("Edad") or ""
+    semestre = _valor("Semestre") or ""
+    habilidades = _valor("Habilidades") or ""
+    grupoProv = _valor("Grupo") or ""
+    titularDir = _valor("Titular/Director") or ""
+    situacion = _valor("Situación") or ""
+    promedio = _valor("Promedio Anterior") or ""
+
+    base_folder = f"{matricula}_{nombre.upper()}_{programa}"
+
+    programa_bach = ""
+
+    if programa == "BUNLA" or programa == "BIUNLA" or programa == "BUNLAV":
+        programa_bach = programa
+        programa = ""
+    else:
+        grupoProv = ""
+
+    ahora = datetime.now()
+    markers = {
+        "{NOMBRE}": nombre,
+        "{NOMBREMAY}": nombre.upper(),
+        "{MATRICULA}": matricula,
+        "{PROGRAMA}": programa,
+        "{PROGRAMABACH}": programa_bach,
+        "{GRUPO}": grupoProv,
+        "{TitularDir}": titularDir,
+        "{SITUACIÓN}": situacion,
+        "{PERIODO}": periodo,
+        "{PROMEDIO}": promedio,
+        "{EDAD}": str(edad)+" años",
+        "{AREA}": area,
+        "{TUTOR}": NombreTutor,
+        "{SEMESTRE}": str(semestre),
+        "{HORARIO}": horario,
+        "{HABILIDADES}": habilidades,
+        "{FECHA}": ahora.strftime("%d/%m/%Y"),
+        "{FECHALARGA}": ahora.strftime("%d de %B de %Y"),
+        "{FECHADIASNANO}": ahora.strftime("%A %d de %B").upper(),
+        "{HORAINICIO}": hora_ini,
+        "{HORAFINAL}": horafin,
+        "{DIAINICIO}": dia,
+        "{PROXREUNION}": proxima_reunion(dia, hora_ini)
+    }
+    return base_folder, markers
+
+
+def llenar_docx(ruta_doc: str, markers: dict, plantillas=None) -> dict:
+    """
+    Abre un Word, reemplaza los marcadores y lo guarda. No usa Tk: corre en el pool.
+    Si el Word es una copia intacta de una de `plantillas` ({hash: ruta}, de
+    cargar_plantillas), se produce desde la plantilla compilada (sin volver a
+    analizarlo con python-docx).
+    Retorna {"reemplazos": int, "segundos": float}.
+    """
+    inicio = perf_counter()
+    with medir_etapa(ETAPA_ABRIR_DOCX):
+        compilada = plantilla_compilada_para(ruta_doc, plantillas)
+        doc = docx.Document(ruta_doc) if compilada is None else None
+    if compilada is not None:
+        # Reemplazo y escritura van juntos en renderizar_plantilla
+        with medir_etapa(ETAPA_GUARDAR_DOCX):
+            reemplazos = renderizar_plantilla(compilada, markers, ruta_doc)
+    else:
+        with medir_etapa(ETAPA_INSERTAR):
+            reemplazos = reemplazar_en_docx(doc, markers)
+        with medir_etapa(ETAPA_GUARDAR_DOCX):
+            guardar_docx(doc, ruta_doc)
+    return {"reemplazos": reemplazos, "segundos": perf_counter() - inicio}
+
+
+def llenar_documentos_lote(datos, raiz, NombreTutor, progreso=None, registro_tiempos=None) -> dict:
+    """
+    Llena todos los .docx de las carpetas de los alumnos de `datos` repartiendo los
+    archivos en el pool de procesos (con cola acotada).
+    Con `progreso` (ProgresoTrabajo) informa el avance por documento y, si se cancela,
+    deja de repartir documentos al pasar al siguiente alumno.
+    Los tiempos por etapa van a `registro_tiempos` (ver registrar_actividades_lote).
+    Retorna {"archivos": [(ruta, segundos)], "fallos": [(ruta, error)],
+             "sin_carpeta": [nombres], "cancelados": [nombres], "segundos": total}.
+    """
+    inicio = perf_counter()
+    resumen = {"archivos": [], "fallos": [], "sin_carpeta": [], "cancelados": [], "segundos": 0.0}
+    propio = registro_tiempos is None
+    if propio:
+        registro_tiempos = RegistroTiempos("llenar")
+
+    # Listar antes de empezar (con el índice de carpetas es barato) para conocer el total
+    documentos = []
+    por_alumno = {}     # nombre -> {"total", "hechos", "errores"}
+    for i in range(len(datos.get("Nombre completo", []))):
+        nombre = datos["Nombre completo"][i]
+        base_folder, markers = construir_marcadores_alumno(datos, i, NombreTutor)
+        ruta_base = os.path.join(raiz, base_folder)
+        with registro_tiempos.alumno(nombre), medir_etapa(ETAPA_CARPETA):
+            rutas = listar_docx_alumno(ruta_base) if os.path.isdir(ruta_base) else None
+        if rutas is None:
+            resumen["sin_carpeta"].append(nombre)
+            if progreso is not None:
+                progreso.estado(nombre, "Sin carpeta")
+            continue
+        por_alumno[nombre] = {"total": len(rutas), "hechos": 0, "errores": 0}
+        documentos += [(nombre, ruta_doc, markers) for ruta_doc in rutas]
+    alumno_de = {ruta_doc: nombre for nombre, ruta_doc, _ in documentos}
+    # Las plantillas se buscan y se hashean una sola vez para todo el lote
+    with registro_tiempos.alumno(ALUMNO_LOTE), medir_etapa(ETAPA_ABRIR_DOCX):
+        plantillas = cargar_plantillas(ruta_plantillas)
+
+    if progreso is not None:
+        progreso.iniciar(len(documentos), "Llenando documentos...")
+
+    def _tareas():
+        anterior = None
+        for nombre, ruta_doc, markers in documentos:
+            if nombre != anterior and progreso is not None and progreso.cancelado():
+                return
+            anterior = nombre
+            yield ruta_doc, (ruta_doc, markers, plantillas)
+
+    def _al_medir(ruta_doc, tiempos):
+        registro_tiempos.agregar(alumno_de[ruta_doc], tiempos)
+
+    for ruta_doc, resultado, error in ejecutar_en_paralelo(llenar_docx, _tareas(), al_medir=_al_medir):
+        cuenta = por_alumno[alumno_de[ruta_doc]]
+        cuenta["hechos"] += 1
+        if error is not None:
+            cuenta["errores"] += 1
+            resumen["fallos"].append((ruta_doc, str(error)))
+        else:
+            resumen["archivos"].append((ruta_doc, resultado["segundos"]))
+        if progreso is not None:
+            texto = f"{cuenta['hechos']}/{cuenta['total']} documentos"
+            if cuenta["errores"]:
+                texto += f" ({cuenta['errores']} con error)"
+            progreso.avanzar(alumno_de[ruta_doc], texto)
+
+    resumen["cancelados"] = [n for n, c in por_alumno.items() if c["hechos"] < c["total"]]
+    resumen["segundos"] = perf_counter() - inicio
+    if propio:
+        registro_tiempos.terminar()
+    return resumen
+
+
+def resumen_llenado(resumen: dict) -> str:
+    """Arma el texto de resumen del llenado de documentos."""
+    lineas = [
+        f"Documentos llenados: {len(resumen['archivos'])} en {resumen['segundos']:.1f} s",
+        f"Documentos con error: {len(resumen['fallos'])}",
+    ]
+    if resumen["sin_carpeta"]:
+        lineas.append(f"Alumnos sin carpeta: {len(resumen['sin_carpeta'])} ({', '.join(resumen['sin_carpeta'][:10])})")
+    if resumen.get("cancelados"):
+        lineas.append(f"Alumnos sin terminar (cancelado): {len(resumen['cancelados'])}")
+    if resumen["archivos"]:
+        lineas.append("")
+        lineas.append("Más lentos:")
+        for ruta, segundos in sorted(resumen["archivos"], key=lambda x: x[1], reverse=True)[:5]:
+            lineas.append(f"• {os.path.basename(ruta)}: {segundos:.2f} s")
+    if resumen["fallos"]:
+        lineas.append("")
+        lineas.append("Errores:")
+        for ruta, error in resumen["fallos"][:15]:
+            lineas.append(f"• {os.path.basename(ruta)}: {error}")
+        if len(resumen["fallos"]) > 15:
+            lineas.append(f"... y {len(resumen['fallos']) - 15} más.")
+    return "\n".join(lineas)
+
+
 def llenar_documentos(datos, ventana=None):
     """
     Rellena los documentos Word en las carpetas de los alumnos con los datos del Excel.
@@ -795,84 +2370,26 @@ def llenar_documentos(datos, ventana=None):
         messagebox.showwarning("Cancelado", "No se seleccionó tutor. Se cancela el llenado.")
         return
 
-    for i in range(len(datos.get("Nombre completo", []))):
-        nombre = datos["Nombre completo"][i]
-        matricula = datos["Matrícula"][i]
-        programa = datos["Programa"][i]
-        periodo = datos["Período"][i]
-        dia = datos.get("Dia", [None]*len(datos["Nombre completo"]))[i]
-        hora_ini_raw = datos.get("Hora inicio", [None]*len(datos["Nombre completo"]))[i]
-        horafin_raw = datos.get("Hora final", [None]*len(datos["Nombre completo"]))[i]
-
-        hora_ini = formatear_hora(hora_ini_raw)
-        horafin = formatear_hora(horafin_raw)
-
-        horario = f"{dia} {hora_ini}-{horafin}"
-        area = datos.get("Área de intervención", [None])[i] or ""
-        edad = datos.get("Edad", [None])[i] or ""
-        semestre = datos.get("Semestre", [None])[i] or ""
-        habilidades = datos.get("Habilidades", [None])[i] or ""
-        grupoProv = datos.get("Grupo", [None])[i] or ""
-        titularDir = datos.get("Titular/Director", [None])[i] or ""
-        situacion = datos.get("Situación", [None])[i] or ""
-        promedio = datos.get("Promedio Anterior", [None])[i] or ""
-
-        base_folder = f"{matricula}_{nombre.upper()}_{programa}"
-        ruta_base = os.path.join(raiz, base_folder)
-
-        programa_bach = ""
+    tiempos = RegistroTiempos("llenar")
 
-        if programa == "BUNLA" or programa == "BIUNLA" or programa == "BUNLAV":
-            programa_bach = programa
-            programa = ""
+    def al_terminar(resumen, error):
+        resumen_tiempos = texto_tiempos(tiempos.terminar())
+        if error is not None:
+            messagebox.showerror("Error", f"No se pudieron llenar los documentos.\n\nDetalle: {error}")
+            return
+        texto = resumen_llenado(resumen) + "\n\n" + resumen_tiempos
+        if resumen["cancelados"]:
+            messagebox.showwarning("Proceso Cancelado", "Se canceló el llenado.\n\n" + texto)
+        elif resumen["fallos"] or resumen["sin_carpeta"]:
+            messagebox.showwarning("Proceso Completo", "Los documentos se llenaron con advertencias.\n\n" + texto)
         else:
-            grupoProv = ""
-
-        if not os.path.isdir(ruta_base):
-            print(f"Advertencia: No se encontró la carpeta para {nombre}. Saltando...")
-            continue
+            messagebox.showinfo("Proceso Completo", "Los documentos fueron llenados exitosamente.\n\n" + texto)
 
-        for root_dir, _, files in os.walk(ruta_base):
-            for file in files:
-                if not file.lower().endswith(".docx"):
-                    continue
-
-                ruta_doc = os.path.join(root_dir, file)
-                try:
-                    doc = docx.Document(ruta_doc)
-
-                    markers = {
-                        "{NOMBRE}": nombre,
-                        "{NOMBREMAY}": nombre.upper(),
-                        "{MATRICULA}": matricula,
-                        "{PROGRAMA}": programa,
-                        "{PROGRAMABACH}": programa_bach,
-                        "{GRUPO}": grupoProv,
-                        "{TitularDir}": titularDir,
-                        "{SITUACIÓN}": situacion,
-                        "{PERIODO}": periodo,
-                        "{PROMEDIO}": promedio,
-                        "{EDAD}": str(edad)+" años",
-                        "{AREA}": area,
-                        "{TUTOR}": NombreTutor,
-                        "{SEMESTRE}": str(semestre),
-                        "{HORARIO}": horario,
-                        "{HABILIDADES}": habilidades,
-                        "{FECHA}": datetime.now().strftime("%d/%m/%Y"),
-                        "{FECHALARGA}": datetime.now().strftime("%d de %B de %Y"),
-                        "{FECHADIASNANO}": datetime.now().strftime("%A %d de %B").upper(),
-                        "{HORAINICIO}": hora_ini,
-                        "{HORAFINAL}": horafin,
-                        "{DIAINICIO}": dia,
-                        "{PROXREUNION}": proxima_reunion(dia, hora_ini)
-                    }
-
-                    reemplazar_en_docx(doc, markers)
-                    doc.save(ruta_doc)
-                except Exception as e:
-                    print(f"No se pudo procesar el archivo {ruta_doc}. Error: {e}")
-
-    messagebox.showinfo("Proceso Completo", "Los documentos fueron llenados exitosamente.")
+    ejecutar_trabajo(
+        "Llenando documentos",
+        lambda progreso: llenar_documentos_lote(datos, raiz, NombreTutor, progreso, tiempos),
+        al_terminar,
+    )
 
 
 # -------------------------------------------------------------------------------
@@ -919,6 +2436,79 @@ def seleccionar_carpeta_raiz(mensaje):
     return ruta
 
 
+VERSION_CACHE_ROSTER = 1
+
+
+def _huella_roster(ruta: str, calcular_hash=True) -> dict:
+    st = os.stat(ruta)
+    huella = {"tamano": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": None}
+    if calcular_hash:
+        h = hashlib.sha256()
+        with open(ruta, "rb") as f:
+            for bloque in iter(lambda: f.read(1 << 20), b""):
+                h.update(bloque)
+        huella["sha256"] = h.hexdigest()
+    return huella
+
+
+def _ruta_cache_roster(ruta: str) -> str:
+    clave = hashlib.sha1(os.path.abspath(ruta).encode("utf-8")).hexdigest()
+    return os.path.join(carpeta_cache("roster"), f"{clave}.pkl")
+
+
+def leer_roster(ruta: str) -> dict:
+    """
+    Devuelve los alumnos del Excel ({columna: [valores como texto]}). Si el archivo tiene
+    el mismo tamaño y mtime que al guardar la caché, se toma de ella sin leer el Excel.
+    Si solo cambió el mtime (copiado, sincronizado) se compara el SHA-256: con el mismo
+    contenido se reutiliza la caché y se actualiza su huella; con otro, se vuelve a leer.
+    """
+    ruta_cache = _ruta_cache_roster(ruta)
+    huella = _huella_roster(ruta, calcular_hash=False)
+    datos = None
+    try:
+        with open(ruta_cache, "rb") as f:
+            cache = pickle.loads(zlib.decompress(f.read()))
+        if cache.get("version") == VERSION_CACHE_ROSTER and cache["tamano"] == huella["tamano"]:
+            if cache["mtime_ns"] == huella["mtime_ns"]:
+                return cache["datos"]
+            huella = _huella_roster(ruta)
+            if cache["sha256"] == huella["sha256"]:
+                datos = cache["datos"]
+    except (OSError, ValueError, KeyError, EOFError, pickle.UnpicklingError, zlib.error):
+        pass
+
+    if huella["sha256"] is None:
+        huella = _huella_roster(ruta)
+    if datos is None:
+        datos = _leer_roster_excel(ruta)
+    if datos:
+        try:
+            with open(ruta_cache, "wb") as f:
+                f.write(zlib.compress(pickle.dumps({"version": VERSION_CACHE_ROSTER, **huella, "datos": datos},
+                                                   protocol=pickle.HIGHEST_PROTOCOL)))
+        except OSError as e:
+            registrar_evento(f"No se pudo guardar la caché de alumnos: {e}", "advertencia", ruta=ruta_cache)
+    return datos
+
+
+def _leer_roster_excel(ruta: str) -> dict:
+    """
+    Lee el Excel de alumnos y devuelve {columna: [valores como texto]} solo con los
+    alumnos que tienen 'Nombre completo'. Retorna None si no queda ninguno.
+    """
+    # Limpieza y tipos
+    df = pd.read_excel(ruta, dtype={"Matrícula": str, "Grupo": str})
+    df.dropna(subset=['Nombre completo'], inplace=True)
+    df = df[df['Nombre completo'].astype(str).str.strip().str.lower() != 'nan']
+    df = df[df['Nombre completo'].astype(str).str.strip() != '']
+
+    if df.empty:
+        return None
+
+    return {col: df[col].astype(str).tolist() for col in df.columns}
+
+
 def cargar_datos_excel():
     global ruta_excel_principal
     messagebox.showinfo("Instrucción", "Selecciona el archivo Excel con datos de los alumnos")
@@ -928,25 +2518,16 @@ def cargar_datos_excel():
         messagebox.showwarning("Aviso", "No se seleccionó archivo.")
         return None
 
-    # Limpieza y tipos
     try:
-        df = pd.read_excel(ruta, dtype={"Matrícula": str, "Grupo": str})
-        df.dropna(subset=['Nombre completo'], inplace=True)
-        df = df[df['Nombre completo'].astype(str).str.strip().str.lower() != 'nan']
-        df = df[df['Nombre completo'].astype(str).str.strip() != '']
+        datos = leer_roster(ruta)
     except Exception as e:
         messagebox.showerror("Error Excel", f"No se pudo leer el archivo Excel.\n\n{e}")
         return None
 
-    if df.empty:
+    if not datos:
         messagebox.showwarning("Aviso", "No se encontraron alumnos con nombre válido en el archivo.")
         return None
 
-    datos = {col: df[col].astype(str).tolist() for col in df.columns}
-
-    with open('datos.pkl', 'wb') as f:
-        pickle.dump(datos, f)
-
     mostrar_alumnos(datos)
     return datos
 
@@ -964,51 +2545,170 @@ def cerrar_programa():
     sys.exit()
 
 
+MARCA_SI = "☑"
+MARCA_NO = "☐"
+
+
+def indice_busqueda_alumnos(datos) -> list:
+    """Texto en minúsculas (nombre, matrícula y programa) de cada alumno, para filtrar sin recalcular."""
+    columnas = [datos.get(col) or [] for col in ("Nombre completo", "Matrícula", "Programa")]
+    total = len(datos.get("Nombre completo") or [])
+    return [
+        " ".join(str(col[i]) for col in columnas if i < len(col)).lower()
+        for i in range(total)
+    ]
+
+
+def filtrar_indice_alumnos(indice, texto, candidatos=None) -> list:
+    """
+    Posiciones cuyo texto contiene todas las palabras buscadas. Si se pasan
+    `candidatos` (resultado de una búsqueda más corta) solo se revisan esos.
+    """
+    palabras = texto.lower().split()
+    posiciones = range(len(indice)) if candidatos is None else candidatos
+    if not palabras:
+        return list(posiciones)
+    return [i for i in posiciones if all(p in indice[i] for p in palabras)]
+
+
 def mostrar_alumnos(datos):
-    win = crear_ventana_toplevel("Seleccionar Alumno(s)", ancho=450, alto=600)
+    win = crear_ventana_toplevel("Seleccionar Alumno(s)", ancho=560, alto=620)
     win.protocol("WM_DELETE_WINDOW", cerrar_programa)
 
     ttk.Label(win, text="Seleccione uno o varios alumnos:", style="Title.TLabel").pack(pady=15)
 
-    # Contenedor con scroll
-    frame = ttk.Frame(win)
-    frame.pack(fill="both", expand=True, padx=20, pady=5)
+    # Filtro incremental por nombre, matrícula o programa
+    filtro_frame = ttk.Frame(win)
+    filtro_frame.pack(fill="x", padx=20)
+    ttk.Label(filtro_frame, text="🔍 Buscar:").pack(side="left")
+    var_filtro = tk.StringVar()
+    entrada = ttk.Entry(filtro_frame, textvariable=var_filtro)
+    entrada.pack(side="left", fill="x", expand=True, padx=(8, 0))
 
-    canvas = tk.Canvas(frame, bg=COLOR_BG, highlightthickness=0)
-    scrollbar = ttk.Scrollbar(frame, orient="vertical", command=canvas.yview, style="Vertical.TScrollbar")
-    scrollable_frame = ttk.Frame(canvas)
+    # Lista virtualizada: el Treeview solo dibuja las filas visibles
+    frame = ttk.Frame(win)
+    frame.pack(fill="both", expand=True, padx=20, pady=8)
 
-    scrollable_frame.bind(
-        "<Configure>",
-        lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
+    tree = ttk.Treeview(
+        frame,
+        columns=("marca", "nombre", "matricula", "programa"),
+        show="headings",
+        selectmode="extended",
     )
-
-    canvas.create_window((0, 0), window=scrollable_frame, anchor="nw", width=380)
-    canvas.configure(yscrollcommand=scrollbar.set)
-
-    canvas.pack(side="left", fill="both", expand=True)
+    tree.heading("marca", text=MARCA_NO)
+    tree.heading("nombre", text="Nombre")
+    tree.heading("matricula", text="Matrícula")
+    tree.heading("programa", text="Programa")
+    tree.column("marca", width=36, minwidth=36, stretch=False, anchor="center")
+    tree.column("nombre", width=260)
+    tree.column("matricula", width=100, stretch=False)
+    tree.column("programa", width=100, stretch=False)
+
+    scrollbar = ttk.Scrollbar(frame, orient="vertical", command=tree.yview, style="Vertical.TScrollbar")
+    tree.configure(yscrollcommand=scrollbar.set)
+    tree.pack(side="left", fill="both", expand=True)
     scrollbar.pack(side="right", fill="y")
 
-    # Habilitar scroll con mouse
-    def _on_mousewheel(event):
-        canvas.yview_scroll(int(-1 * (event.delta / 120)), "units")
-    canvas.bind_all("<MouseWheel>", _on_mousewheel)
-
-    # Lista de alumnos con checkboxes
-    vars_checks = []
-    for i, nombre in enumerate(datos['Nombre completo']):
-        var = tk.BooleanVar(value=False)
-        chk = ttk.Checkbutton(
-            scrollable_frame,
-            text=nombre,
-            variable=var
+    nombres = datos.get("Nombre completo") or []
+    matriculas = datos.get("Matrícula") or []
+    programas = datos.get("Programa") or []
+    for i, nombre in enumerate(nombres):
+        tree.insert("", "end", iid=str(i), values=(
+            MARCA_NO,
+            nombre,
+            matriculas[i] if i < len(matriculas) else "",
+            programas[i] if i < len(programas) else "",
+        ))
+
+    indice = indice_busqueda_alumnos(datos)
+    marcados = set()
+    estado_filtro = {"texto": "", "visibles": list(range(len(nombres))), "pendiente": None}
+
+    lbl_contador = ttk.Label(win, text="")
+    lbl_contador.pack()
+
+    def actualizar_contador():
+        lbl_contador.config(
+            text=f"{len(marcados)} seleccionado(s) · {len(estado_filtro['visibles'])} de {len(nombres)} visibles"
         )
-        chk.pack(anchor="w", padx=10, pady=2)
-        vars_checks.append((var, i))
+
+    def marcar(posiciones, valor):
+        for i in posiciones:
+            if valor:
+                marcados.add(i)
+            else:
+                marcados.discard(i)
+            tree.set(str(i), "marca", MARCA_SI if valor else MARCA_NO)
+        actualizar_contador()
+
+    def alternar(posiciones):
+        posiciones = list(posiciones)
+        if posiciones:
+            marcar(posiciones, not all(i in marcados for i in posiciones))
+
+    def aplicar_filtro():
+        estado_filtro["pendiente"] = None
+        texto = var_filtro.get().strip().lower()
+        anterior = estado_filtro["texto"]
+        # Si la búsqueda solo se alargó, basta revisar los que ya coincidían
+        candidatos = estado_filtro["visibles"] if anterior and texto.startswith(anterior) else None
+        visibles = filtrar_indice_alumnos(indice, texto, candidatos)
+        if visibles != estado_filtro["visibles"]:
+            hijos = tree.get_children()
+            if hijos:
+                tree.detach(*hijos)
+            for pos, i in enumerate(visibles):
+                tree.move(str(i), "", pos)
+        estado_filtro.update(texto=texto, visibles=visibles)
+        actualizar_contador()
+
+    def al_escribir(*_):
+        # Agrupar las pulsaciones seguidas en un solo filtrado
+        if estado_filtro["pendiente"] is not None:
+            win.after_cancel(estado_filtro["pendiente"])
+        estado_filtro["pendiente"] = win.after(120, aplicar_filtro)
+
+    var_filtro.trace_add("write", al_escribir)
+
+    def al_clic(event):
+        region = tree.identify_region(event.x, event.y)
+        if region == "heading" and tree.identify_column(event.x) == "#1":
+            alternar(estado_filtro["visibles"])
+            return "break"
+        if region == "cell" and tree.identify_column(event.x) == "#1":
+            fila = tree.identify_row(event.y)
+            if fila:
+                alternar([int(fila)])
+                return "break"
+
+    def al_espacio(_event):
+        alternar(int(iid) for iid in tree.selection())
+        return "break"
+
+    def al_doble_clic(event):
+        # En la columna de marca el primer clic ya alternó la fila
+        fila = tree.identify_row(event.y)
+        if fila and tree.identify_column(event.x) != "#1":
+            alternar([int(fila)])
+        return "break"
+
+    def ir_a_lista(_event):
+        hijos = tree.get_children()
+        if hijos:
+            tree.focus_set()
+            tree.focus(hijos[0])
+            tree.selection_set(hijos[0])
+        return "break"
+
+    tree.bind("<Button-1>", al_clic)
+    tree.bind("<Double-1>", al_doble_clic)
+    tree.bind("<space>", al_espacio)
+    entrada.bind("<Down>", ir_a_lista)
+    entrada.bind("<Return>", lambda e: procesar_seleccion())
 
     # Procesar selección
     def procesar_seleccion():
-        seleccionados = [i for var, i in vars_checks if var.get()]
+        seleccionados = sorted(marcados) or [int(iid) for iid in tree.selection()]
         if not seleccionados:
             messagebox.showwarning("Atención", "Selecciona al menos un alumno.")
             return
@@ -1020,7 +2720,7 @@ def mostrar_alumnos(datos):
 
     # Botones de acción
     botones_frame = ttk.Frame(win)
-    botones_frame.pack(pady=20)
+    botones_frame.pack(pady=15)
 
     ttk.Button(
         botones_frame,
@@ -1030,8 +2730,8 @@ def mostrar_alumnos(datos):
     ).pack(side="left", padx=10)
 
     def select_all():
-        for var, _ in vars_checks:
-            var.set(True)
+        # Marca todos los alumnos visibles (los que pasan el filtro actual)
+        marcar(estado_filtro["visibles"], True)
 
     ttk.Button(
         botones_frame,
@@ -1040,6 +2740,9 @@ def mostrar_alumnos(datos):
         command=select_all
     ).pack(side="left", padx=10)
 
+    actualizar_contador()
+    entrada.focus_set()
+
 
 def seleccionar_todos(datos, win=None):
     if win:
@@ -1052,7 +2755,7 @@ def ventana_opciones(datos):
     Ventana de opciones que procesa todos los alumnos seleccionados
     de forma secuencial al presionar los botones.
     """
-    win = crear_ventana_toplevel("Opciones", ancho=450, alto=400)
+    win = crear_ventana_toplevel("Opciones", ancho=450, alto=460)
 
     nombre_display = "todos los alumnos" if len(datos['Nombre completo']) > 1 else datos['Nombre completo'][0]
     
@@ -1067,42 +2770,180 @@ def ventana_opciones(datos):
         command=lambda: (crear_expedientes(datos), win.destroy())
     ).pack(pady=10, fill="x", padx=50)
 
-    # Función auxiliar para procesar cada alumno uno por uno
+    # Primero se pregunta todo (tutor, asistencia, evidencia) y luego se procesa en segundo plano
     def procesar_actividad():
-        for idx in range(len(datos["Nombre completo"])):
-            alumno = {col: [datos[col][idx]] for col in datos.keys()}
-            try:
-                agregar_actividad_y_evidencia(alumno)
-            except InterruptedError:
-                break # Detener si el usuario cancela
-        win.destroy()
+        global seleccion_primera_vez, ruta_carpeta_global, ruta_excel_principal
+
+        if seleccion_primera_vez:
+            ruta_carpeta_global = seleccionar_carpeta("Selecciona la carpeta MAESTRA:")
+            ruta_excel_principal = seleccionar_excel_tabla_reporte()
+            seleccion_primera_vez = False
+
+        entradas = pedir_actividades_lote(datos)
+        if not entradas:
+            return
+
+        tiempos = RegistroTiempos("actividad")
+
+        def al_terminar(resultados, error):
+            resumen_tiempos = texto_tiempos(tiempos.terminar())
+            if error is not None:
+                messagebox.showerror("Error", f"No se pudo leer la hoja semanal del Excel.\n\nDetalle: {error}")
+                return
+            messagebox.showinfo("Proceso Terminado", resumen_actividades(resultados) + "\n\n" + resumen_tiempos)
+            if win.winfo_exists():
+                win.destroy()
+
+        excel = ruta_excel_principal
+        ejecutar_trabajo(
+            "Registrando actividades",
+            lambda progreso: registrar_actividades_lote(datos, entradas, excel, progreso, tiempos),
+            al_terminar,
+        )
     
     def procesar_consolidado_batch():
+        global ruta_carpeta_global
+
+        if not ruta_carpeta_global:
+            ruta_carpeta_global = seleccionar_carpeta("Selecciona la carpeta MAESTRA:")
+
         # 1. Pedir Tutor UNICA VEZ
         tutor_global = seleccionar_tutor_gui("Selecciona Tutor para el CONSOLIDADO")
         if not tutor_global:
             return
 
-        # 2. Loop
-        for idx in range(len(datos["Nombre completo"])):
-            alumno = {col: [datos[col][idx]] for col in datos.keys()}
-            procesar_consolidado_alumno(alumno, tutor_global)
-            
-        messagebox.showinfo("Proceso Terminado", "Se ha procesado el Excel Consolidado para los alumnos seleccionados.")
-        win.destroy()
+        # 2. Procesar todos los alumnos en segundo plano (Excel leído una vez, Words en paralelo)
+        tiempos = RegistroTiempos("consolidado")
+
+        def al_terminar(resultados, error):
+            # 3. Mostrar un solo resumen
+            resumen_tiempos = texto_tiempos(tiempos.terminar())
+            if error is not None:
+                messagebox.showerror("Error de Lectura", f"No se pudo leer el Excel consolidado.\n\nDetalle: {error}")
+                return
+            messagebox.showinfo(
+                "Proceso Terminado",
+                "Se ha procesado el Excel Consolidado para los alumnos seleccionados.\n\n"
+                + resumen_consolidado(resultados) + "\n\n" + resumen_tiempos,
+            )
+            if win.winfo_exists():
+                win.destroy()
+
+        excel = ruta_excel_principal
+        ejecutar_trabajo(
+            "Procesando consolidado",
+            lambda progreso: consolidar_lote(datos, tutor_global, excel, progreso=progreso, registro_tiempos=tiempos),
+            al_terminar,
+        )
 
     def procesar_entrevista():
+        global seleccion_primera_vez, ruta_carpeta_global, ruta_excel_principal
+
+        if seleccion_primera_vez:
+            ruta_carpeta_global = seleccionar_carpeta("Selecciona la carpeta MAESTRA que contiene todas las carpetas de alumnos:")
+            ruta_excel_principal = seleccionar_excel_tabla_reporte()
+            seleccion_primera_vez = False
+
+        respuesta = messagebox.askyesnocancel(
+            "Entrevistas",
+            "¿Tomar las fotos de TODOS los alumnos de una sola carpeta?\n\n"
+            "Cada archivo se asigna por la Matrícula o las iniciales en su nombre "
+            "(p. ej. 'A001_1.jpg' o 'JP 2.jpg').\n\nNo = elegir las fotos de cada alumno."
+        )
+        if respuesta is None:
+            return
+        if respuesta:
+            carpeta = filedialog.askdirectory(title="Selecciona la carpeta con las fotos de las entrevistas")
+            if not carpeta:
+                return
+
+            tiempos_carpeta = RegistroTiempos("entrevistas")
+
+            def al_terminar_carpeta(ingesta, error):
+                resumen_tiempos = texto_tiempos(tiempos_carpeta.terminar())
+                if error is not None:
+                    messagebox.showerror("Error", f"Ocurrió un problema al generar las entrevistas: {error}")
+                    return
+                messagebox.showinfo("Proceso Terminado", resumen_entrevistas(ingesta["resultados"], ingesta) + "\n\n" + resumen_tiempos)
+                if win.winfo_exists():
+                    win.destroy()
+
+            ejecutar_trabajo(
+                "Agregando entrevistas",
+                lambda progreso: ingestar_entrevistas_carpeta(datos, carpeta, progreso, tiempos_carpeta),
+                al_terminar_carpeta,
+            )
+            return
+
+        # Primero se eligen las imágenes de todos; la inserción va en segundo plano
+        pendientes = []
         for idx in range(len(datos["Nombre completo"])):
             alumno = {col: [datos[col][idx]] for col in datos.keys()}
-            agregar_entrevista_extendida(alumno)
-        win.destroy()
+            try:
+                pendiente = pedir_imagenes_entrevista(alumno)
+            except Exception as e:
+                messagebox.showerror("Error", f"Problema con {alumno['Nombre completo'][0]}: {e}")
+                continue
+            if pendiente is not None:
+                pendientes.append(pendiente)
+        if not pendientes:
+            return
 
-    # Botones de actividad y entrevista
-    ttk.Button(
-        win,
-        text="📝 Agregar actividad y evidencia (Semanal)",
-        style="Accent.TButton",
-        command=lambda: procesar_actividad()
+        tiempos = RegistroTiempos("entrevistas")
+
+        def al_terminar(resultados, error):
+            resumen_tiempos = texto_tiempos(tiempos.terminar())
+            if error is not None:
+                messagebox.showerror("Error", f"Ocurrió un problema al generar las entrevistas: {error}")
+                return
+            messagebox.showinfo("Proceso Terminado", resumen_entrevistas(resultados) + "\n\n" + resumen_tiempos)
+            if win.winfo_exists():
+                win.destroy()
+
+        ejecutar_trabajo(
+            "Agregando entrevistas",
+            lambda progreso: insertar_entrevistas_lote(pendientes, progreso, tiempos),
+            al_terminar,
+        )
+
+    def procesar_reporte_asistencia():
+        excel = ruta_excel_principal
+        if not excel:
+            messagebox.showerror("Error", "Primero selecciona el Excel con las hojas semanales.")
+            return
+        ruta_salida = filedialog.asksaveasfilename(
+            title="Guardar reporte de asistencia",
+            defaultextension=".xlsx",
+            initialfile=f"Reporte de asistencia {datetime.now():%Y-%m-%d}.xlsx",
+            filetypes=[("Excel", "*.xlsx")],
+        )
+        if not ruta_salida:
+            return
+
+        tiempos = RegistroTiempos("reporte")
+
+        def al_terminar(reporte, error):
+            resumen_tiempos = texto_tiempos(tiempos.terminar())
+            if error is not None:
+                messagebox.showerror("Error", f"No se pudo generar el reporte de asistencia.\n\nDetalle: {error}")
+                return
+            messagebox.showinfo(
+                "Reporte de asistencia",
+                resumen_reporte_asistencia(reporte) + f"\n\nGuardado en:\n{ruta_salida}\n\n" + resumen_tiempos,
+            )
+
+        ejecutar_trabajo(
+            "Reporte de asistencia",
+            lambda progreso: generar_reporte_asistencia(excel, datos, ruta_salida, tiempos, progreso),
+            al_terminar,
+        )
+
+    # Botones de actividad y entrevista
+    ttk.Button(
+        win,
+        text="📝 Agregar actividad y evidencia (Semanal)",
+        style="Accent.TButton",
+        command=lambda: procesar_actividad()
     ).pack(pady=5, fill="x", padx=50)
 
     ttk.Button(
@@ -1119,6 +2960,13 @@ def ventana_opciones(datos):
         command=lambda: procesar_entrevista()
     ).pack(pady=5, fill="x", padx=50)
 
+    ttk.Button(
+        win,
+        text="📊 Reporte de asistencia (Todas las semanas)",
+        style="Secondary.TButton",
+        command=lambda: procesar_reporte_asistencia()
+    ).pack(pady=5, fill="x", padx=50)
+
     # Botón cerrar
     ttk.Button(
         win,
@@ -1128,274 +2976,1038 @@ def ventana_opciones(datos):
     ).pack(pady=20, fill="x", padx=50)
 
 # -------------------------------------------------------------------------------
-# NUEVO: Implementación de "Agregar actividad y evidencia"
+# Registro del consolidado (qué hojas ya se pasaron a cada Word)
 # -------------------------------------------------------------------------------
 
-def procesar_consolidado_alumno(datos, tutor_global):
+REGISTRO_CONSOLIDADO = ".consolidado_registro.json"
+_NS_RELACIONES = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+# Partes compartidas por todas las hojas: el texto de las celdas t="s" vive en sharedStrings
+# y el formato (fechas incluidas) en styles, así que editar una celda puede no tocar la hoja
+PARTES_COMPARTIDAS_LIBRO = ("xl/sharedStrings.xml", "xl/styles.xml")
+
+
+def _actualizar_hash_miembro(h, zf, miembro):
+    """Agrega al hash el contenido de un miembro del zip, por bloques."""
+    with zf.open(miembro) as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+
+
+def hashes_hojas_excel(ruta_excel: str):
     """
-    Busca al alumno en TODAS las hojas del Excel consolidado (ruta_excel_principal)
-    e inserta los reportes encontrados en su documento Word.
+    Huella (SHA-1) del contenido de cada hoja de un .xlsx/.xlsm sin interpretarla:
+    se lee directo el XML de la hoja dentro del zip, junto con las partes compartidas
+    (PARTES_COMPARTIDAS_LIBRO); un cambio en ellas deja pendientes todas las hojas.
+    Retorna {hoja: sha1}, o None si el archivo no es un libro zip (.xls), en cuyo caso
+    no se usa el registro.
     """
-    global ruta_excel_principal
-    global ruta_carpeta_global
-    
-    nombre = datos["Nombre completo"][0]
-    nombre_may = nombre.upper()
-    matricula = datos.get("Matrícula", [""])[0]
-    programa = datos.get("Programa", [""])[0]
-    
-    print(f"Procesando CONSOLIDADO para: {nombre}")
+    try:
+        with zipfile.ZipFile(ruta_excel) as zf:
+            libro = etree.fromstring(zf.read("xl/workbook.xml"))
+            rels = etree.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+            destinos = {r.get("Id"): r.get("Target") for r in rels}
+
+            compartidas = hashlib.sha1()
+            nombres = set(zf.namelist())
+            for miembro in PARTES_COMPARTIDAS_LIBRO:
+                compartidas.update(miembro.encode() + b"\0")
+                if miembro in nombres:
+                    _actualizar_hash_miembro(compartidas, zf, miembro)
+
+            hashes = {}
+            for hoja in libro.iter(f"{{{libro.nsmap.get(None)}}}sheet"):
+                destino = destinos.get(hoja.get(f"{{{_NS_RELACIONES}}}id"), "")
+                miembro = destino.lstrip("/") if destino.startswith("/") else "xl/" + destino
+                h = compartidas.copy()
+                _actualizar_hash_miembro(h, zf, miembro)
+                hashes[hoja.get("name")] = h.hexdigest()
+            return hashes
+    except (zipfile.BadZipFile, KeyError, etree.XMLSyntaxError):
+        return None
 
+
+def cargar_registro_consolidado(raiz: str) -> dict:
+    """
+    Lee el registro del consolidado de la carpeta maestra:
+        {"alumnos": {Matrícula: {"docx": ruta, "mtime": mtime_ns del Word,
+                                 "hojas": {hoja: sha1 ya consolidado}}}}
+    """
     try:
-        # 1. Obtener todas las hojas del Excel
-        xl = pd.ExcelFile(ruta_excel_principal)
-        hojas = xl.sheet_names # Lista de nombres de hojas
-        
-        # 2. Localizar Word
-        ruta_alumno = localizar_carpeta_final_alumno(ruta_carpeta_global, matricula, nombre_may, programa)
-        ruta_docx = encontrar_archivo_seguimiento(ruta_alumno)
-        
-        if not ruta_docx:
-            print(f"  [Error] No hay Word para {nombre}")
-            return
+        with open(os.path.join(raiz, REGISTRO_CONSOLIDADO), "r", encoding="utf-8") as f:
+            registro = json.load(f)
+        if isinstance(registro.get("alumnos"), dict):
+            return registro
+    except (FileNotFoundError, ValueError, AttributeError):
+        pass
+    return {"alumnos": {}}
 
-        # 3. Abrir Word UNA VEZ
-        try:
-            doc = docx.Document(ruta_docx)
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudo abrir Word de {nombre}: {e}")
-            return
+
+def guardar_registro_consolidado(raiz: str, registro: dict):
+    """Guarda el registro en un temporal y lo reemplaza de forma atómica."""
+    ruta = os.path.join(raiz, REGISTRO_CONSOLIDADO)
+    fd, ruta_tmp = tempfile.mkstemp(dir=raiz, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(registro, f, ensure_ascii=False)
+    os.replace(ruta_tmp, ruta)
+
+
+def hojas_pendientes(registro: dict, matricula: str, ruta_docx: str, hashes: dict) -> list:
+    """
+    Hojas que faltan por consolidar para el alumno: las nuevas o modificadas desde la
+    última vez. Si el Word cambió (mtime distinto) o se movió, se revisan todas.
+    """
+    entrada = registro["alumnos"].get(matricula)
+    if not entrada or entrada.get("docx") != ruta_docx or entrada.get("mtime") != _mtime_carpeta(ruta_docx):
+        return list(hashes)
+    hechas = entrada.get("hojas", {})
+    return [hoja for hoja, sha1 in hashes.items() if hechas.get(hoja) != sha1]
+
+
+def aplicar_consolidado_docx(ruta_docx: str, filas_alumno: list, tutor_global: str) -> dict:
+    """
+    Abre el Word de seguimiento UNA VEZ, inserta las filas (con chequeo de duplicados)
+    y guarda solo si hubo cambios. No usa Tk: puede correr en un proceso del pool.
+    Retorna {"insertados": [hojas insertadas], "duplicados": int, "guardado": bool}.
+    """
+    with medir_etapa(ETAPA_ABRIR_DOCX):
+        doc = docx.Document(ruta_docx)
+    if not doc.tables:
+        raise ValueError(f"El documento {ruta_docx} no contiene tablas.")
+
+    tabla = doc.tables[0]
+    insertados = []
+    with medir_etapa(ETAPA_INSERTAR):
+        indice_tabla = indexar_tabla_seguimiento(tabla)
+        for hoja, fila in filas_alumno:
+            # Asumimos asistencia="Sí" si hay reporte, a menos que definamos lógica, 
+            # pero para consolidado usaremos "Sí" por defecto (o N/A si fuera el caso).
+            # Podríamos revisar el contenido para inferir "No", pero KISS por ahora.
+            asistio = "Sí" 
             
-        if not doc.tables:
-            return
+            # Insertar (con chequeo de duplicados interno)
+            if _escribir_renglon_seguimiento(tabla, fila, tutor_global, asistio, indice_tabla):
+                insertados.append(hoja)
 
-        tabla = doc.tables[0]
-        cambios = False
-        
-        # 4. Iterar hojas
-        for hoja in hojas:
-            # Filtro básico: ignorar hojas que no parezcan fechas o reportes
-            # Si el usuario dijo "fechas", asumimos que no son "Portada", "Datos", etc.
-            # Intento leer la hoja usando la lógica existente
-            try:
-                # DEBUG_LEER_REPORTE=False para no spamear
-                df_rep = leer_tabla_reporte(ruta_excel_principal, hoja=hoja)
-            except ValueError:
-                # Probablemente no tiene columnas Nombre/Apellido -> no es reporte
+    if insertados:
+        with medir_etapa(ETAPA_GUARDAR_DOCX):
+            guardar_docx(doc, ruta_docx)
+    return {"insertados": insertados, "duplicados": len(filas_alumno) - len(insertados), "guardado": bool(insertados)}
+
+
+ESTADOS_CONSOLIDADO = {
+    "actualizado": "Actualizado",
+    "sin_cambios": "Sin cambios",
+    "sin_registros": "Sin registros en el Excel",
+    "error": "Error",
+    "cancelado": "Cancelado",
+}
+
+
+def consolidar_lote(datos, tutor_global, ruta_excel, usar_registro=True, progreso=None, registro_tiempos=None) -> list:
+    """
+    Procesa el consolidado de todos los alumnos de `datos`. La búsqueda de carpetas y filas
+    se hace aquí; abrir/insertar/guardar cada Word (independientes entre sí) se reparte
+    en el pool de procesos.
+    Con el registro de la carpeta maestra (.xlsx/.xlsm) solo se leen las hojas nuevas o
+    modificadas y a cada alumno solo se le insertan las hojas que aún no tiene.
+    Con `progreso` (ProgresoTrabajo) informa el estado de cada alumno y, si se cancela,
+    no abre más Words (los que faltan quedan como "cancelado").
+    Los tiempos por etapa van a `registro_tiempos` (ver registrar_actividades_lote).
+    Retorna una lista con el resultado de cada alumno:
+        {"alumno", "estado": "actualizado"|"sin_cambios"|"sin_registros"|"error"|"cancelado",
+         "insertados": [hojas], "duplicados": int (filas que ya estaban), "error": str}
+    """
+    def _informar(idx):
+        if progreso is not None:
+            r = resultados[idx]
+            texto = ESTADOS_CONSOLIDADO[r["estado"]]
+            if r["insertados"]:
+                texto += f" ({len(r['insertados'])} hojas)"
+            if r["error"]:
+                texto += f": {r['error']}"
+            progreso.avanzar(r["alumno"], texto)
+
+    propio = registro_tiempos is None
+    if propio:
+        registro_tiempos = RegistroTiempos("consolidado")
+    if progreso is not None:
+        progreso.iniciar(len(datos["Nombre completo"]), "Buscando expedientes...")
+    with registro_tiempos.alumno(ALUMNO_LOTE), medir_etapa(ETAPA_EXCEL):
+        hashes = hashes_hojas_excel(ruta_excel) if usar_registro else None
+    registro = cargar_registro_consolidado(ruta_carpeta_global) if hashes is not None else None
+
+    resultados = {}
+    pendientes = {}
+    for idx in range(len(datos["Nombre completo"])):
+        alumno = {col: [datos[col][idx]] for col in datos.keys()}
+        matricula = str(alumno.get("Matrícula", [""])[0]).strip()
+        resultados[idx] = {"alumno": alumno["Nombre completo"][0], "estado": "error", "insertados": [], "duplicados": 0, "error": ""}
+        try:
+            with registro_tiempos.alumno(alumno["Nombre completo"][0]), medir_etapa(ETAPA_CARPETA):
+                ruta_alumno = localizar_carpeta_final_alumno(ruta_carpeta_global, matricula, alumno["Nombre completo"][0].upper(), alumno.get("Programa", [""])[0])
+                ruta_docx = encontrar_archivo_seguimiento(ruta_alumno)
+        except Exception as e:
+            resultados[idx]["error"] = str(e)
+            _informar(idx)
+            continue
+        hojas = None
+        if registro is not None and matricula and matricula.lower() != "nan":
+            hojas = hojas_pendientes(registro, matricula, ruta_docx, hashes)
+        pendientes[idx] = (alumno, matricula, ruta_docx, hojas)
+
+    # Leer UNA vez solo las hojas que le faltan a algún alumno
+    if progreso is not None:
+        progreso.mensaje("Leyendo el Excel consolidado...")
+    with registro_tiempos.alumno(ALUMNO_LOTE), medir_etapa(ETAPA_EXCEL):
+        if all(h is not None for _, _, _, h in pendientes.values()):
+            faltan = {hoja for _, _, _, h in pendientes.values() for hoja in h}
+            indice = construir_indice_libro_reporte(ruta_excel, [hoja for hoja in hashes if hoja in faltan])
+        else:
+            indice = construir_indice_libro_reporte(ruta_excel)
+
+    tareas = []
+    for idx, (alumno, matricula, ruta_docx, hojas) in pendientes.items():
+        filas_alumno = filas_alumno_en_libro(indice, alumno["Nombre completo"][0], matricula)
+        if hojas is not None:
+            if not hojas:
+                resultados[idx]["estado"] = "sin_cambios"
+                _informar(idx)
                 continue
-            except Exception:
+            filas_alumno = [(hoja, fila) for hoja, fila in filas_alumno if hoja in hojas]
+        if not filas_alumno:
+            resultados[idx]["estado"] = "sin_registros"
+            _informar(idx)
+            continue
+        tareas.append((idx, (ruta_docx, filas_alumno, tutor_global)))
+
+    def _tareas():
+        for tarea in tareas:
+            if progreso is not None and progreso.cancelado():
+                return
+            yield tarea
+
+    if progreso is not None:
+        progreso.mensaje("Actualizando expedientes...")
+    def _al_medir(idx, tiempos):
+        registro_tiempos.agregar(resultados[idx]["alumno"], tiempos)
+
+    procesados = set()
+    max_workers = 1 if len(tareas) < 2 else None
+    for idx, resultado, error in ejecutar_en_paralelo(aplicar_consolidado_docx, _tareas(), max_workers, _al_medir):
+        procesados.add(idx)
+        if error is not None:
+            if isinstance(error, PermissionError):
+                resultados[idx]["error"] = "No se pudo guardar el Word (¿está abierto?)"
+            else:
+                resultados[idx]["error"] = str(error)
+        else:
+            resultados[idx]["insertados"] = resultado["insertados"]
+            resultados[idx]["duplicados"] = resultado["duplicados"]
+            resultados[idx]["estado"] = "actualizado" if resultado["guardado"] else "sin_cambios"
+        _informar(idx)
+
+    for idx, _ in tareas:
+        if idx not in procesados:
+            resultados[idx]["estado"] = "cancelado"
+
+    # Anotar en el registro lo ya consolidado (incluye hojas donde el alumno no aparece)
+    if registro is not None:
+        for idx, (alumno, matricula, ruta_docx, hojas) in pendientes.items():
+            if hojas is None or resultados[idx]["estado"] in ("error", "cancelado"):
                 continue
-                
-            try:
-                fila = filtrar_fila_reciente_por_alumno(df_rep, nombre)
-                # Si encontramos fila, insertamos
-                # Asumimos asistencia="Sí" si hay reporte, a menos que definamos lógica, 
-                # pero para consolidado usaremos "Sí" por defecto (o N/A si fuera el caso).
-                # Podríamos revisar el contenido para inferir "No", pero KISS por ahora.
-                asistio = "Sí" 
-                
-                # Insertar (con chequeo de duplicados interno)
-                inserto = _escribir_renglon_seguimiento(tabla, fila, tutor_global, asistio)
-                if inserto:
-                    cambios = True
-                    print(f"  [Insertado] Hoja: {hoja}")
-            except ValueError:
-                # Alumno no está en esta hoja (semana)
-                pass
+            entrada = registro["alumnos"].get(matricula)
+            if not entrada or entrada.get("docx") != ruta_docx:
+                entrada = {"docx": ruta_docx, "hojas": {}}
+            entrada["hojas"].update({hoja: hashes[hoja] for hoja in hojas})
+            entrada["mtime"] = _mtime_carpeta(ruta_docx)
+            registro["alumnos"][matricula] = entrada
+        try:
+            guardar_registro_consolidado(ruta_carpeta_global, registro)
+        except OSError as e:
+            registrar_evento(f"No se pudo guardar el registro del consolidado: {e}", "advertencia")
+
+    if propio:
+        registro_tiempos.terminar()
+    return [resultados[idx] for idx in sorted(resultados)]
+
+
+def resumen_consolidado(resultados: list) -> str:
+    """Arma el texto de resumen del consolidado por lote."""
+    conteo = {estado: 0 for estado in ESTADOS_CONSOLIDADO}
+    for r in resultados:
+        conteo[r["estado"]] += 1
+    insertados = sum(len(r["insertados"]) for r in resultados)
+    duplicados = sum(r.get("duplicados", 0) for r in resultados)
+
+    lineas = [
+        f"Alumnos actualizados: {conteo['actualizado']} ({insertados} registros nuevos, {duplicados} ya estaban)",
+        f"Sin cambios (ya estaban al día): {conteo['sin_cambios']}",
+        f"Sin registros en el Excel: {conteo['sin_registros']}",
+        f"Con error: {conteo['error']}",
+    ]
+    if conteo["cancelado"]:
+        lineas.append(f"Sin procesar (cancelado): {conteo['cancelado']}")
+    errores = [r for r in resultados if r["estado"] == "error"]
+    if errores:
+        lineas.append("")
+        for r in errores[:15]:
+            lineas.append(f"• {r['alumno']}: {r['error']}")
+        if len(errores) > 15:
+            lineas.append(f"... y {len(errores) - 15} más.")
+    return "\n".join(lineas)
 
-        # 5. Guardar si hubo cambios
-        if cambios:
-            try:
-                doc.save(ruta_docx)
-                print(f"  [Guardado] {ruta_docx}")
-            except PermissionError:
-                messagebox.showerror("Error de Permiso", f"Cierra el archivo Word de {nombre}!")
+
+# -------------------------------------------------------------------------------
+# Reporte de asistencia (todas las semanas del Excel consolidado)
+# -------------------------------------------------------------------------------
+
+SIN_TUTOR = "Sin tutor"
+# Valores de la columna de asistencia (si la hoja la trae) que cuentan como asistencia;
+# sin esa columna, cada renglón del reporte es una sesión atendida
+VALORES_ASISTIO = {"SÍ", "SI"}
+# Días sin contacto a partir de los cuales un alumno se cuenta como "sin contacto reciente"
+DIAS_SIN_CONTACTO_ALERTA = 14
+
+
+def _columna_que_contiene(df: pd.DataFrame, *claves):
+    """Primera columna cuyo encabezado contiene alguna de `claves` (en minúsculas), o None."""
+    return next((c for c in df.columns if any(k in str(c).lower() for k in claves)), None)
+
+
+def _texto_columna(df: pd.DataFrame, columna) -> pd.Series:
+    """Columna como texto sin espacios extremos ('' si no existe o está vacía)."""
+    if columna is None:
+        return pd.Series("", index=df.index, dtype=object)
+    return df[columna].map(lambda v: "" if _celda_vacia(v) else str(v).strip())
+
+
+def apilar_hojas_reporte(ruta_excel: str, hojas=None) -> pd.DataFrame:
+    """
+    Lee en una pasada todas las hojas de reporte del libro (o las de `hojas`) y las apila
+    en una sola tabla larga, un renglón por registro:
+        Semana (categoría ordenada con todas las hojas de reporte), Alumno, Matrícula,
+        Clave (Matrícula o, si no hay, nombre en mayúsculas), Tutor, Fecha, Asistió, Tema
+    Las hojas sin encabezado de reporte (Portada, Datos, etc.) se omiten.
+    """
+    semanas = []
+    partes = []
+    for hoja, df in tablas_reporte_del_libro(ruta_excel, hojas):
+        semanas.append(hoja)
+        alumno = df["Nombre completo (Reporte)"].astype(str).str.strip()
+        matricula = _texto_columna(df, _columna_que_contiene(df, "matr")).str.upper()
+        tutor = _texto_columna(df, _columna_que_contiene(df, "tutor"))
+        col_asistencia = _columna_que_contiene(df, "asist")
+        if col_asistencia is None:
+            asistio = pd.Series(True, index=df.index)
         else:
-            print("  [Sin cambios] No se agregaron nuevos registros (o duplicados).")
-            
-    except Exception as e:
-        print(f"Error procesando {nombre}: {e}")
-        # No bloquear todo el proceso por un alumno fallido
-        pass
+            asistio = _texto_columna(df, col_asistencia).str.upper().isin(VALORES_ASISTIO)
+        partes.append(pd.DataFrame({
+            "Semana": hoja,
+            "Alumno": alumno,
+            "Matrícula": matricula,
+            "Clave": matricula.where(matricula.ne(""), alumno.str.upper()),
+            "Tutor": tutor.where(tutor.ne(""), SIN_TUTOR),
+            "Fecha": df[COL_FECHA_HORA],
+            "Asistió": asistio,
+            "Tema": _texto_columna(df, "Tema o asunto tratado" if "Tema o asunto tratado" in df.columns else None),
+        })[alumno.ne("")])
+
+    columnas = ["Semana", "Alumno", "Matrícula", "Clave", "Tutor", "Fecha", "Asistió", "Tema"]
+    registros = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(columns=columnas)
+    registros["Semana"] = pd.Categorical(registros["Semana"], categories=semanas, ordered=True)
+    registros["Fecha"] = pd.to_datetime(registros["Fecha"])
+    registros["Asistió"] = registros["Asistió"].astype(bool)
+    return registros
+
+
+def _claves_roster(datos) -> pd.DataFrame:
+    """Alumnos de `datos` con la misma Clave que apilar_hojas_reporte (Matrícula o nombre)."""
+    alumno = pd.Series(datos["Nombre completo"], dtype=object).astype(str).str.strip()
+    matricula = pd.Series(datos.get("Matrícula") or [""] * len(alumno), dtype=object).astype(str).str.strip().str.upper()
+    matricula = matricula.where(~matricula.isin(["NAN", "NONE"]), "")
+    return pd.DataFrame({
+        "Alumno": alumno,
+        "Matrícula": matricula,
+        "Clave": matricula.where(matricula.ne(""), alumno.str.upper()),
+    })
+
+
+def reporte_asistencia(ruta_excel: str, datos=None) -> dict:
+    """
+    Estadísticas de asistencia de todas las semanas con operaciones por columnas (groupby),
+    sin abrir ningún Word. Con `datos` (alumnos seleccionados) solo se cuentan esos alumnos,
+    emparejados por Matrícula o por nombre, y los que no tienen registros aparecen en cero.
+    Retorna {"registros", "por_alumno", "por_tutor", "por_semana", "alumno_semana"}
+    (DataFrames) y "semanas" (hojas de reporte en orden).
+    """
+    registros = apilar_hojas_reporte(ruta_excel)
+    semanas = list(registros["Semana"].cat.categories)
+
+    roster = None
+    if datos is not None:
+        roster = _claves_roster(datos)
+        con_clave = roster.drop_duplicates("Clave")
+        clave = registros["Matrícula"].map(dict(zip(con_clave["Matrícula"], con_clave["Clave"])))
+        clave = clave.where(registros["Matrícula"].ne(""))
+        clave = clave.fillna(registros["Alumno"].str.upper().map(dict(zip(con_clave["Alumno"].str.upper(), con_clave["Clave"]))))
+        registros = registros.assign(Clave=clave).dropna(subset=["Clave"]).reset_index(drop=True)
+
+    # Fecha de corte: el contacto más reciente de todo el libro
+    fecha_corte = registros["Fecha"].max()
+    ordenados = registros.sort_values(["Clave", "Fecha"], kind="mergesort", na_position="first")
+    por_clave = ordenados.groupby("Clave", sort=False)
+    por_alumno = por_clave.agg(
+        Alumno=("Alumno", "last"),
+        Matricula=("Matrícula", "last"),
+        Tutor=("Tutor", "last"),
+        Registros=("Alumno", "size"),
+        Asistencias=("Asistió", "sum"),
+        Semanas=("Semana", "nunique"),
+        Primer=("Fecha", "min"),
+        Ultimo=("Fecha", "max"),
+    )
+    huecos = por_clave["Fecha"].diff().dt.days
+    por_alumno["Mayor hueco (días)"] = huecos.groupby(ordenados["Clave"]).max()
+    por_alumno["Días sin contacto"] = (fecha_corte - por_alumno["Ultimo"]).dt.days
+    por_alumno["Semanas sin registro"] = len(semanas) - por_alumno["Semanas"]
+    por_alumno = por_alumno.reset_index()
+
+    if roster is not None:
+        por_alumno = roster.drop_duplicates("Clave").merge(
+            por_alumno.drop(columns=["Alumno", "Matricula"]), on="Clave", how="left"
+        ).rename(columns={"Matrícula": "Matricula"})
+        por_alumno["Tutor"] = por_alumno["Tutor"].fillna(SIN_TUTOR)
+        for col in ("Registros", "Asistencias", "Semanas"):
+            por_alumno[col] = por_alumno[col].fillna(0).astype(int)
+        por_alumno["Semanas sin registro"] = len(semanas) - por_alumno["Semanas"]
+
+    por_alumno = por_alumno.rename(columns={
+        "Matricula": "Matrícula", "Semanas": "Semanas con registro",
+        "Primer": "Primer contacto", "Ultimo": "Último contacto",
+    })[[
+        "Alumno", "Matrícula", "Clave", "Tutor", "Registros", "Asistencias", "Semanas con registro",
+        "Semanas sin registro", "Primer contacto", "Último contacto", "Mayor hueco (días)", "Días sin contacto",
+    ]].sort_values(["Tutor", "Alumno"], kind="mergesort").reset_index(drop=True)
+
+    sin_contacto = por_alumno["Días sin contacto"].isna() | (por_alumno["Días sin contacto"] > DIAS_SIN_CONTACTO_ALERTA)
+    por_tutor = por_alumno.assign(**{"Sin contacto reciente": sin_contacto}).groupby("Tutor").agg(**{
+        "Alumnos": ("Clave", "size"),
+        "Registros": ("Registros", "sum"),
+        "Asistencias": ("Asistencias", "sum"),
+        "Último contacto": ("Último contacto", "max"),
+        "Mayor hueco (días)": ("Mayor hueco (días)", "max"),
+        "Hueco promedio (días)": ("Mayor hueco (días)", "mean"),
+        f"Sin contacto en {DIAS_SIN_CONTACTO_ALERTA} días": ("Sin contacto reciente", "sum"),
+    })
+    por_tutor["Asistencias por alumno"] = (por_tutor["Asistencias"] / por_tutor["Alumnos"]).round(2)
+    por_tutor["Hueco promedio (días)"] = por_tutor["Hueco promedio (días)"].round(1)
+    por_tutor = por_tutor.reset_index()
+
+    asistencias = registros[registros["Asistió"]]
+    por_semana = (
+        asistencias.groupby(["Semana", "Tutor"], observed=False)["Clave"].nunique()
+        .unstack("Tutor", fill_value=0)
+    )
+    por_semana["Total alumnos"] = asistencias.groupby("Semana", observed=False)["Clave"].nunique()
+    por_semana = por_semana.rename_axis(columns=None).reset_index()
+
+    alumno_semana = pd.crosstab(asistencias["Clave"], asistencias["Semana"], dropna=False)
+    alumno_semana = (
+        por_alumno[["Clave", "Alumno", "Tutor"]]
+        .merge(alumno_semana, left_on="Clave", right_index=True, how="left")
+        .fillna({s: 0 for s in semanas})
+        .astype({s: int for s in semanas})
+    )
 
+    return {
+        "semanas": semanas,
+        "registros": registros,
+        "por_alumno": por_alumno,
+        "por_tutor": por_tutor,
+        "por_semana": por_semana,
+        "alumno_semana": alumno_semana,
+    }
 
-def agregar_actividad_y_evidencia(datos):
-    """Flujo para un único alumno (Manual o Consolidado)."""
-    global seleccion_primera_vez
-    global ruta_carpeta_global
-    global ruta_excel_principal
 
+def exportar_reporte_asistencia(reporte: dict, ruta_salida: str) -> str:
+    """Escribe el reporte en un Excel nuevo (una hoja por vista) de forma atómica."""
+    hojas = (
+        ("Por alumno", reporte["por_alumno"]),
+        ("Por tutor", reporte["por_tutor"]),
+        ("Por semana", reporte["por_semana"]),
+        ("Alumno por semana", reporte["alumno_semana"]),
+        ("Registros", reporte["registros"]),
+    )
+    fd, ruta_tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(ruta_salida)), suffix=".xlsx")
+    os.close(fd)
     try:
-        # Preguntar si procesar SEMANA ACTUAL (Hoja 3) o CONSOLIDADO (Todas)
-        # Esto podria ser una opción global, pero por ahora lo preguntamos al iniciar el proceso por lote o individual
-        # Para no romper flujos existentes, si 'datos' viene de lote, deberíamos saber el modo.
-        # Haremos una detección simple: Si el usuario selecciona "Procesar Consolidado" en el menú,
-        # llamaremos a otra función. Si llama a esta, es el flujo MANUAL (Semana actual + imagen).
-        pass
-    except:
-        pass
-    
-    # --- LOGICA ORIGINAL (Refactorizada) ---
-    try:
-        nombre = datos["Nombre completo"][0]
-        nombre_may = nombre.upper()
-        matricula = datos.get("Matrícula", [""])[0]
-        programa = datos.get("Programa", [""])[0]
-
-        if seleccion_primera_vez:
-            ruta_carpeta_global = seleccionar_carpeta("Selecciona la carpeta MAESTRA:")
-            ruta_excel_principal = seleccionar_excel_tabla_reporte()
-            seleccion_primera_vez = False
+        with pd.ExcelWriter(ruta_tmp, engine="openpyxl") as escritor:
+            for nombre, df in hojas:
+                df.to_excel(escritor, sheet_name=nombre, index=False)
+                hoja = escritor.sheets[nombre]
+                hoja.freeze_panes = "A2"
+                for k, col in enumerate(df.columns):
+                    ancho = max([len(str(col))] + [len(str(v)) for v in df[col].head(200)])
+                    hoja.column_dimensions[hoja.cell(row=1, column=k + 1).column_letter].width = min(ancho + 2, 50)
+        os.replace(ruta_tmp, ruta_salida)
+    except BaseException:
+        if os.path.exists(ruta_tmp):
+            os.remove(ruta_tmp)
+        raise
+    return ruta_salida
 
-        # 2) Leer reporte (Semana actual - Hoja index 2)
-        df_rep = leer_tabla_reporte(ruta_excel_principal, hoja=2) # Default hoja 3
-        fila = filtrar_fila_reciente_por_alumno(df_rep, nombre)
 
-        # 3) Localizar doc
-        ruta_alumno = localizar_carpeta_final_alumno(ruta_carpeta_global, matricula, nombre_may, programa)
-        ruta_docx = encontrar_archivo_seguimiento(ruta_alumno)
+def generar_reporte_asistencia(ruta_excel: str, datos, ruta_salida: str, registro_tiempos, progreso=None) -> dict:
+    """
+    reporte_asistencia + exportar_reporte_asistencia, con los tiempos en `registro_tiempos`
+    (RegistroTiempos) bajo ALUMNO_LOTE. Con `progreso` informa cada paso. Retorna el reporte.
+    """
+    with registro_tiempos.alumno(ALUMNO_LOTE):
+        if progreso is not None:
+            progreso.mensaje("Leyendo todas las semanas...")
+        with medir_etapa(ETAPA_EXCEL):
+            reporte = reporte_asistencia(ruta_excel, datos)
+        if progreso is not None:
+            progreso.mensaje("Escribiendo el reporte...")
+        with medir_etapa(ETAPA_EXPORTAR):
+            exportar_reporte_asistencia(reporte, ruta_salida)
+    return reporte
+
+
+def resumen_reporte_asistencia(reporte: dict) -> str:
+    """Texto corto del reporte de asistencia para la ventana de fin."""
+    por_alumno = reporte["por_alumno"]
+    lineas = [
+        f"Semanas leídas: {len(reporte['semanas'])}",
+        f"Alumnos: {len(por_alumno)} · Registros: {len(reporte['registros'])}",
+        "",
+    ]
+    for _, t in reporte["por_tutor"].iterrows():
+        lineas.append(
+            f"• {t['Tutor']}: {t['Alumnos']} alumnos, {t['Asistencias']} asistencias "
+            f"({t['Asistencias por alumno']} por alumno)"
+        )
+    lejanos = por_alumno.sort_values("Días sin contacto", ascending=False, na_position="first").head(5)
+    if len(lejanos):
+        lineas.append("")
+        lineas.append("Más tiempo sin contacto:")
+        for _, a in lejanos.iterrows():
+            dias = "sin registros" if pd.isna(a["Días sin contacto"]) else f"{int(a['Días sin contacto'])} días"
+            lineas.append(f"• {a['Alumno']}: {dias}")
+    return "\n".join(lineas)
 
-        # 4) Insertar
-        # Pide tutor/asistencia INTERACTIVAMENTE
-        _, asistio = insertar_actividad_en_word(ruta_docx, fila, nombre_may)
-        
-        if asistio is None: return
 
-        # 5) Evidencias
-        carpeta_evid = encontrar_carpeta_evidencias(ruta_alumno)
-        iniciales = obtener_iniciales(nombre)
+# Opciones de asistencia en el orden de los atajos 1-5 de la tabla de asistencia
+ASISTENCIAS = ("Sí", "No", "N/A", "Tarea", "Falta justificada")
+# Asistencias que llevan imagen de evidencia (actividad, tarea o justificante)
+ASISTENCIAS_CON_EVIDENCIA = ("Sí", "Tarea", "Falta justificada")
 
-        if asistio in ["Sí", "Tarea", "Falta justificada"]:
-            
-            # Avisos específicos
-            if asistio == "Tarea":
-                messagebox.showinfo("Aviso", "Por favor selecciona la imagen de la tarea.")
-            elif asistio == "Falta justificada":
-                messagebox.showinfo("Aviso", "Por favor selecciona la imagen del justificante.")
-
-            titulo = f"Selecciona la evidencia para {nombre}"
-            ruta_img = filedialog.askopenfilename(title=titulo, filetypes=[
-                ("Imágenes", "*.jpg;*.jpeg;*.png;*.heic;*.webp;*.bmp")
-            ])
-            if ruta_img:
-                actividad = simpledialog.askstring("Actividad", "Nombre de la actividad:")
-                if actividad:
-                    copiar_y_renombrar_evidencia(carpeta_evid, ruta_img, actividad, iniciales)
-                    messagebox.showinfo("Listo", "Actividad agregada y evidencia guardada.")
-            else:
-                 messagebox.showinfo("Aviso", "No se seleccionó imagen.")
-        
-        elif asistio == "No":
-            actividad = "BORRAR"
-            num_sesion = proximo_numero_sesion(carpeta_evid, iniciales)
-            actividad_limpia = "_".join(str(actividad).strip().split())
-            nombre_dest = f"Sesión{num_sesion}_{actividad_limpia}_{iniciales}.jpeg"
-            ruta_dest = os.path.join(carpeta_evid, nombre_dest)
-            crear_imagen_blanca(ruta_dest)
-            messagebox.showinfo("Listo", f"Creada evidencia en blanco: {nombre_dest}")
 
-        elif asistio == "N/A":
-            messagebox.showinfo("Listo", "Agregado N/A.")
+def entrada_actividad(fila: dict):
+    """
+    Convierte una fila de la tabla de asistencia ({"tutor", "asistencia", "actividad",
+    "evidencia"}) en la entrada de registrar_actividades_lote, o None si no se marcó
+    asistencia. La evidencia solo se registra si hay imagen y nombre de actividad.
+    """
+    if not fila["asistencia"]:
+        return None
+    entrada = {"tutor": fila["tutor"], "asistencia": fila["asistencia"], "actividad": None, "evidencia": None}
+    if fila["asistencia"] in ASISTENCIAS_CON_EVIDENCIA and fila["evidencia"] and fila["actividad"]:
+        entrada.update(actividad=fila["actividad"], evidencia=fila["evidencia"])
+    return entrada
 
-    except Exception as e:
-        messagebox.showerror("Error", f"Problema con {nombre}: {e}")
 
 
-def agregar_entrevista_extendida(datos):
+def pedir_actividades_lote(datos):
     """
-    Flujo para agregar entrevista extendida: busca archivo de entrevista y anexa imágenes seleccionadas.
+    Tabla (hilo de Tk) para capturar de una vez tutor, asistencia, actividad y evidencia
+    de todos los alumnos de `datos`. Atajos sobre las filas seleccionadas:
+        1-5: asistencia (Sí, No, N/A, Tarea, Falta justificada) · Supr: quitarla
+        Enter/F2: escribir la actividad · e: elegir la(s) evidencia(s) · Ctrl+A: todas
+    El tutor de arriba se aplica a las filas seleccionadas (o a todas) y a las que reciben
+    asistencia sin tutor.
+    Retorna la lista de entradas para registrar_actividades_lote (None para los alumnos
+    sin asistencia) o None si se cerró la ventana.
     """
-    global seleccion_primera_vez
-    global ruta_carpeta_global
-    global ruta_excel_principal
+    nombres = datos["Nombre completo"]
+    filas = [{"tutor": "", "asistencia": "", "actividad": "", "evidencia": ""} for _ in nombres]
+    resultado = {"entradas": None}
 
-    try:
-        nombre = datos["Nombre completo"][0]
-        nombre_may = nombre.upper()
-        matricula = datos.get("Matrícula", [""])[0]
-        programa = datos.get("Programa", [""])[0]
+    win = crear_ventana_toplevel("Asistencia semanal", ancho=980, alto=620)
+    ttk.Label(win, text="Asistencia y evidencias de la semana", style="Title.TLabel").pack(pady=(15, 5))
+    ttk.Label(
+        win,
+        text="1 Sí · 2 No · 3 N/A · 4 Tarea · 5 Falta justificada · Supr quitar · "
+             "Enter/F2 actividad · e evidencia · Ctrl+A todas",
+    ).pack()
 
-        if seleccion_primera_vez:
+    barra = ttk.Frame(win)
+    barra.pack(fill="x", padx=20, pady=8)
+    ttk.Label(barra, text="Tutor:").pack(side="left")
+    var_tutor = tk.StringVar(value="")
+    combo = ttk.Combobox(barra, textvariable=var_tutor, values=LISTA_TUTORES, state="readonly", width=30)
+    combo.pack(side="left", padx=8)
 
-            # 1) Seleccionar carpeta maestra y Excel semanal
-            ruta_carpeta_global = seleccionar_carpeta("Selecciona la carpeta MAESTRA que contiene todas las carpetas de alumnos:")
-            #ruta_carpeta_global = ruta_carpeta_global
-            ruta_excel_principal = seleccionar_excel_tabla_reporte() #Validar que si se haya seleccionado un excel
-            seleccion_primera_vez = False
+    frame = ttk.Frame(win)
+    frame.pack(fill="both", expand=True, padx=20)
+    columnas = ("nombre", "tutor", "asistencia", "actividad", "evidencia")
+    tree = ttk.Treeview(frame, columns=columnas, show="headings", selectmode="extended")
+    for col, texto, ancho in (("nombre", "Alumno", 240), ("tutor", "Tutor", 170), ("asistencia", "Asistencia", 120),
+                              ("actividad", "Actividad", 200), ("evidencia", "Evidencia", 180)):
+        tree.heading(col, text=texto)
+        tree.column(col, width=ancho, stretch=col in ("nombre", "actividad", "evidencia"))
+    scrollbar = ttk.Scrollbar(frame, orient="vertical", command=tree.yview, style="Vertical.TScrollbar")
+    tree.configure(yscrollcommand=scrollbar.set)
+    tree.pack(side="left", fill="both", expand=True)
+    scrollbar.pack(side="right", fill="y")
 
-        # 1) Ubicar carpeta final del alumno y archivo de entrevista
-        ruta_alumno = localizar_carpeta_final_alumno(ruta_carpeta_global, matricula, nombre_may, programa)
-        ruta_docx = encontrar_archivo_entrevista(ruta_alumno)
+    for i, nombre in enumerate(nombres):
+        tree.insert("", "end", iid=str(i), values=(nombre, "", "", "", ""))
 
-        if not ruta_docx:
-            messagebox.showerror("Error", f"No se encontró archivo de entrevista para {nombre}")
-            return
+    lbl_contador = ttk.Label(win, text="")
+    lbl_contador.pack(pady=(6, 0))
+
+    def pintar(i):
+        fila = filas[i]
+        tree.item(str(i), values=(nombres[i], fila["tutor"], fila["asistencia"], fila["actividad"],
+                                  os.path.basename(fila["evidencia"])))
 
-        # 2) Seleccionar imágenes
-        rutas_imagenes = filedialog.askopenfilenames(
-            title=f"Selecciona las imágenes de la entrevista de {nombre}",
-            filetypes=[("Archivos de imagen", "*.jpg *.jpeg *.png *.bmp *.tiff")]
+    def actualizar_contador():
+        marcados = sum(1 for f in filas if f["asistencia"])
+        sin_evidencia = sum(
+            1 for f in filas
+            if f["asistencia"] in ASISTENCIAS_CON_EVIDENCIA and not (f["evidencia"] and f["actividad"])
         )
-        if not rutas_imagenes:
-            return
+        lbl_contador.config(text=f"{marcados} de {len(filas)} con asistencia · {sin_evidencia} sin evidencia o actividad")
+
+    def seleccionadas():
+        return sorted(int(iid) for iid in tree.selection())
+
+    def siguiente(posiciones):
+        """Mueve la selección a la fila después de la última editada (para capturar seguido)."""
+        hijos = tree.get_children()
+        if len(posiciones) == 1 and posiciones[0] + 1 < len(hijos):
+            iid = str(posiciones[0] + 1)
+            tree.selection_set(iid)
+            tree.focus(iid)
+            tree.see(iid)
+
+    def poner_asistencia(valor):
+        posiciones = seleccionadas()
+        for i in posiciones:
+            filas[i]["asistencia"] = valor
+            if valor and not filas[i]["tutor"]:
+                filas[i]["tutor"] = var_tutor.get()
+            pintar(i)
+        actualizar_contador()
+        siguiente(posiciones)
+        return "break"
+
+    def aplicar_tutor(*_):
+        posiciones = seleccionadas() or range(len(filas))
+        for i in posiciones:
+            filas[i]["tutor"] = var_tutor.get()
+            pintar(i)
+
+    def elegir_evidencia(_event=None):
+        posiciones = seleccionadas()
+        if not posiciones:
+            return "break"
+        rutas = filedialog.askopenfilenames(
+            parent=win,
+            title="Evidencias (se asignan por matrícula o iniciales en el nombre del archivo)" if len(posiciones) > 1 else
+                  f"Selecciona la evidencia para {nombres[posiciones[0]]}",
+            filetypes=[("Imágenes", "*.jpg *.jpeg *.png *.heic *.webp *.bmp")],
+        )
+        if not rutas:
+            tree.focus_set()
+            return "break"
+        if len(posiciones) == 1 and len(rutas) == 1:
+            asignadas = {0: list(rutas)}
+            sin_asignar = []
+        else:
+            # Solo por el nombre del archivo; lo que no coincide se deja para asignarlo a mano
+            seleccion = {col: [datos[col][i] for i in posiciones] for col in ("Nombre completo", "Matrícula") if col in datos}
+            asignacion = asignar_rutas_por_alumno(rutas, seleccion)
+            asignadas = {}
+            sin_asignar = asignacion["sin_asignar"] + asignacion["ambiguas"]
+            for pos, rutas_alumno in asignacion["por_alumno"].items():
+                if len(rutas_alumno) == 1:
+                    asignadas[pos] = rutas_alumno
+                else:
+                    sin_asignar += rutas_alumno
+        for pos, (ruta,) in asignadas.items():
+            filas[posiciones[pos]]["evidencia"] = ruta
+            pintar(posiciones[pos])
+        actualizar_contador()
+        if sin_asignar:
+            messagebox.showwarning(
+                "Evidencias",
+                f"No se asignaron {len(sin_asignar)} imagen(es): su nombre no trae la matrícula o las "
+                f"iniciales de un solo alumno, o hay más de una para el mismo alumno.\n\n"
+                + "\n".join(os.path.basename(r) for r in sin_asignar[:10])
+                + "\n\nSelecciona la fila de cada alumno y elige su evidencia con 'e'.",
+                parent=win,
+            )
+        tree.focus_set()
+        return "break"
+
+    def editar_actividad(_event=None):
+        posiciones = seleccionadas()
+        if not posiciones:
+            return "break"
+        iid = str(posiciones[0])
+        tree.see(iid)
+        caja = tree.bbox(iid, "actividad")
+        if not caja:
+            return "break"
+        x, y, ancho, alto = caja
+        var = tk.StringVar(value=filas[posiciones[0]]["actividad"])
+        editor = ttk.Entry(tree, textvariable=var)
+        editor.place(x=x, y=y, width=ancho, height=alto)
+        editor.focus_set()
+        editor.select_range(0, "end")
+
+        def terminar(guardar):
+            if not editor.winfo_exists():
+                return "break"
+            if guardar:
+                for i in posiciones:
+                    filas[i]["actividad"] = var.get().strip()
+                    pintar(i)
+                actualizar_contador()
+            editor.destroy()
+            tree.focus_set()
+            if guardar:
+                siguiente(posiciones)
+            return "break"
+
+        editor.bind("<Return>", lambda e: terminar(True))
+        editor.bind("<KP_Enter>", lambda e: terminar(True))
+        editor.bind("<Escape>", lambda e: terminar(False))
+        editor.bind("<FocusOut>", lambda e: terminar(True))
+        return "break"
+
+    def al_doble_clic(event):
+        fila = tree.identify_row(event.y)
+        if not fila:
+            return "break"
+        tree.selection_set(fila)
+        columna = tree.identify_column(event.x)
+        if columna == "#5":
+            return elegir_evidencia()
+        return editar_actividad()
+
+    def seleccionar_todas(_event=None):
+        tree.selection_set(tree.get_children())
+        return "break"
+
+    for k, valor in enumerate(ASISTENCIAS, start=1):
+        tree.bind(f"<Key-{k}>", lambda e, v=valor: poner_asistencia(v))
+        tree.bind(f"<KP_{k}>", lambda e, v=valor: poner_asistencia(v))
+    tree.bind("<Delete>", lambda e: poner_asistencia(""))
+    tree.bind("<BackSpace>", lambda e: poner_asistencia(""))
+    tree.bind("<Return>", editar_actividad)
+    tree.bind("<F2>", editar_actividad)
+    tree.bind("<Key-e>", elegir_evidencia)
+    tree.bind("<Control-a>", seleccionar_todas)
+    if SYSTEM_OS == "Darwin":
+        tree.bind("<Command-a>", seleccionar_todas)
+    tree.bind("<Double-1>", al_doble_clic)
+    combo.bind("<<ComboboxSelected>>", aplicar_tutor)
 
-        # Ordenar imágenes por fecha de modificación (más antigua primero)
-        rutas_imagenes = sorted(rutas_imagenes, key=os.path.getmtime)
+    ttk.Button(barra, text="Aplicar tutor", command=aplicar_tutor).pack(side="left")
+    for valor in ASISTENCIAS:
+        ttk.Button(barra, text=valor, command=lambda v=valor: poner_asistencia(v)).pack(side="right", padx=2)
 
-        # 3) Insertar imágenes en el documento
-        try:
-            doc = Document(ruta_docx)
-        except Exception as e:
-            messagebox.showerror("Error Archivo", f"No se pudo abrir el archivo Word.\n{e}")
+    def confirmar():
+        sin_tutor = [nombres[i] for i, f in enumerate(filas) if f["asistencia"] and not f["tutor"]]
+        if sin_tutor:
+            messagebox.showwarning("Falta Tutor", "Selecciona el tutor de:\n\n" + "\n".join(sin_tutor[:15]), parent=win)
             return
+        entradas = [entrada_actividad(f) for f in filas]
+        if not any(entradas):
+            messagebox.showwarning("Atención", "Marca la asistencia de al menos un alumno.", parent=win)
+            return
+        avisos = []
+        omitidos = entradas.count(None)
+        if omitidos:
+            avisos.append(f"{omitidos} alumno(s) sin asistencia se omitirán.")
+        sin_evidencia = sum(
+            1 for f in filas
+            if f["asistencia"] in ASISTENCIAS_CON_EVIDENCIA and not (f["evidencia"] and f["actividad"])
+        )
+        if sin_evidencia:
+            avisos.append(f"{sin_evidencia} alumno(s) se registrarán sin evidencia (falta imagen o actividad).")
+        if avisos and not messagebox.askyesno("Confirmar", "\n".join(avisos) + "\n\n¿Continuar?", parent=win):
+            return
+        resultado["entradas"] = entradas
+        win.destroy()
 
-        section = doc.sections[0]
+    botones = ttk.Frame(win)
+    botones.pack(pady=12)
+    ttk.Button(botones, text="✅ Registrar", style="Accent.TButton", command=confirmar).pack(side="left", padx=10)
+    ttk.Button(botones, text="Cancelar", style="Danger.TButton", command=win.destroy).pack(side="left", padx=10)
 
-        # Dimensiones de página
-        ancho_pagina = section.page_width.inches
-        alto_pagina = section.page_height.inches
-        margen_izq = section.left_margin.inches
-        margen_der = section.right_margin.inches
-        margen_sup = section.top_margin.inches
-        margen_inf = section.bottom_margin.inches
+    actualizar_contador()
+    if nombres:
+        tree.selection_set("0")
+        tree.focus("0")
+    tree.focus_set()
+    win.grab_set()
+    win.wait_window()
+    return resultado["entradas"]
 
-        ancho_max = ancho_pagina - (margen_izq + margen_der)
-        alto_max = alto_pagina - (margen_sup + margen_inf)
 
-        for i, img_path in enumerate(rutas_imagenes):
-            if i > 0:
-                # Insertar salto de página limpio antes de la imagen
-                doc.paragraphs[-1].add_run().add_break(WD_BREAK.PAGE)
-                espacio_disp = alto_max
-            else:
-                # Primera imagen: reservar espacio por texto inicial
-                espacio_disp = alto_max - 2.0
-                if espacio_disp < alto_max * 0.5:
-                    espacio_disp = alto_max * 0.5
+def pedir_imagenes_entrevista(datos):
+    """
+    Ubica el Word de entrevista del alumno y pide (hilo de Tk) las imágenes a anexar.
+    Retorna (nombre, ruta_docx, rutas_imagenes ordenadas por fecha) o None si no hay
+    archivo de entrevista o no se eligieron imágenes.
+    """
+    nombre = datos["Nombre completo"][0]
+    matricula = datos.get("Matrícula", [""])[0]
+    programa = datos.get("Programa", [""])[0]
+
+    ruta_alumno = localizar_carpeta_final_alumno(ruta_carpeta_global, matricula, nombre.upper(), programa)
+    ruta_docx = encontrar_archivo_entrevista(ruta_alumno)
+    if not ruta_docx:
+        messagebox.showerror("Error", f"No se encontró archivo de entrevista para {nombre}")
+        return None
+
+    rutas_imagenes = filedialog.askopenfilenames(
+        title=f"Selecciona las imágenes de la entrevista de {nombre}",
+        filetypes=[("Archivos de imagen", "*.jpg *.jpeg *.png *.bmp *.tiff")]
+    )
+    if not rutas_imagenes:
+        return None
+
+    # Ordenar imágenes por fecha de modificación (más antigua primero)
+    return nombre, ruta_docx, sorted(rutas_imagenes, key=os.path.getmtime)
+
+
+def insertar_imagenes_entrevista(ruta_docx: str, rutas_imagenes) -> int:
+    """
+    Anexa las imágenes al Word de entrevista, una por página y escaladas al área útil,
+    y lo guarda. No usa Tk (se puede llamar desde un hilo o proceso secundario).
+    Retorna el número de imágenes insertadas.
+    """
+    with medir_etapa(ETAPA_ABRIR_DOCX):
+        doc = docx.Document(ruta_docx)
+    section = doc.sections[0]
+
+    # Dimensiones de página
+    ancho_pagina = section.page_width.inches
+    alto_pagina = section.page_height.inches
+    margen_izq = section.left_margin.inches
+    margen_der = section.right_margin.inches
+    margen_sup = section.top_margin.inches
+    margen_inf = section.bottom_margin.inches
+
+    ancho_max = ancho_pagina - (margen_izq + margen_der)
+    alto_max = alto_pagina - (margen_sup + margen_inf)
+
+    for i, img_path in enumerate(rutas_imagenes):
+        if i > 0:
+            # Insertar salto de página limpio antes de la imagen
+            doc.paragraphs[-1].add_run().add_break(WD_BREAK.PAGE)
+            espacio_disp = alto_max
+        else:
+            # Primera imagen: reservar espacio por texto inicial
+            espacio_disp = alto_max - 2.0
+            if espacio_disp < alto_max * 0.5:
+                espacio_disp = alto_max * 0.5
 
-            # Abrir imagen y calcular escalado
+        with medir_etapa(ETAPA_IMAGENES):
+            # Leer solo el encabezado de la imagen y calcular escalado
             with Image.open(img_path) as im:
-                w, h = im.size
-                dpi = im.info.get("dpi", (96, 96))
-                w_in = w / dpi[0]
-                h_in = h / dpi[1]
+                w, h = tamano_imagen_orientado(im)
+                dpi_x, dpi_y = dpi_imagen_orientado(im)
+                w_in = w / dpi_x
+                h_in = h / dpi_y
 
                 factor = min(ancho_max / w_in, espacio_disp / h_in)
                 ancho_final = Inches(w_in * factor)
                 alto_final = Inches(h_in * factor)
 
-            # Insertar imagen
-            doc.add_picture(img_path, width=ancho_final, height=alto_final)
+            # Insertar la imagen ya reducida a su tamaño en la página
+            ruta_derivado = derivado_imagen(
+                img_path,
+                max(1, round(w_in * factor * IMAGEN_DOCX_DPI)),
+                max(1, round(h_in * factor * IMAGEN_DOCX_DPI)),
+            )
+        with medir_etapa(ETAPA_INSERTAR):
+            doc.add_picture(ruta_derivado, width=ancho_final, height=alto_final)
+
+    with medir_etapa(ETAPA_GUARDAR_DOCX):
+        guardar_docx(doc, ruta_docx)
+    return len(rutas_imagenes)
+
 
-        # 4) Guardar cambios
+def insertar_entrevistas_lote(pendientes, progreso=None, registro_tiempos=None) -> list:
+    """
+    Inserta las imágenes de entrevista de varios alumnos, un Word por tarea en el pool de
+    procesos. `pendientes` es una lista de (nombre, ruta_docx, rutas_imagenes) como la de
+    pedir_imagenes_entrevista.
+    Con `progreso` (ProgresoTrabajo) informa cada alumno y, si se cancela, no abre más Words.
+    Los tiempos por etapa van a `registro_tiempos` (ver registrar_actividades_lote).
+    Retorna [{"alumno", "estado": "ok"|"error"|"cancelado", "imagenes", "error"}].
+    """
+    propio = registro_tiempos is None
+    if propio:
+        registro_tiempos = RegistroTiempos("entrevistas")
+    if progreso is not None:
+        progreso.iniciar(len(pendientes), "Insertando imágenes...")
+    resultados = [{"alumno": nombre, "estado": "cancelado", "imagenes": 0, "error": ""} for nombre, _, _ in pendientes]
+
+    def _tareas():
+        for idx, (_, ruta_docx, rutas_imagenes) in enumerate(pendientes):
+            if progreso is not None and progreso.cancelado():
+                return
+            yield idx, (ruta_docx, list(rutas_imagenes))
+
+    def _al_medir(idx, tiempos):
+        registro_tiempos.agregar(resultados[idx]["alumno"], tiempos)
+
+    max_workers = 1 if len(pendientes) < 2 else None
+    for idx, insertadas, error in ejecutar_en_paralelo(insertar_imagenes_entrevista, _tareas(), max_workers, _al_medir):
+        resultado = resultados[idx]
+        if error is None:
+            resultado.update(estado="ok", imagenes=insertadas)
+            texto = f"{insertadas} imágenes"
+        else:
+            mensaje = "No se pudo guardar el Word (¿está abierto?)" if isinstance(error, PermissionError) else str(error)
+            resultado.update(estado="error", error=mensaje)
+            texto = f"Error: {mensaje}"
+        if progreso is not None:
+            progreso.avanzar(resultado["alumno"], texto)
+
+    with registro_tiempos.alumno(ALUMNO_LOTE), medir_etapa(ETAPA_IMAGENES):
         try:
-            doc.save(ruta_docx)
-            messagebox.showinfo("Éxito", f"Entrevista actualizada con evidencias para {nombre}")
-        except PermissionError:
-            messagebox.showerror("Error de Permiso", "No se pudo guardar el archivo. ¡Ciérralo si está abierto!")
+            liberados = podar_cache_derivados()
+        except OSError as e:
+            registrar_evento(f"No se pudo podar la caché de derivados: {e}", "advertencia")
+            liberados = 0
+    if liberados:
+        registrar_evento(f"Caché de derivados: se liberaron {formato_bytes(liberados)}")
+    if propio:
+        registro_tiempos.terminar()
+    return resultados
+
+
+EXTENSIONES_ENTREVISTA = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff")
+
+
+def _palabras_archivo(nombre_archivo: str) -> set:
+    """'IMG_A001-2 (JP).jpg' -> {'IMG', 'A001', '2', 'JP'}"""
+    base = os.path.splitext(nombre_archivo)[0].upper()
+    return {p for p in re.split(r"[^0-9A-ZÁÉÍÓÚÜÑ]+", base) if p}
+
+
+def asignar_rutas_por_alumno(rutas, datos) -> dict:
+    """
+    Reparte imágenes entre los alumnos de `datos` según el nombre del archivo: la Matrícula
+    como palabra del nombre (p. ej. 'A001_1.jpg') o, si no aparece ninguna, las iniciales
+    del alumno ('JP 2.jpg') cuando ningún otro alumno las comparte. Nunca se asigna por
+    posición: lo que no coincide queda en "sin_asignar" y lo que coincide con varios
+    alumnos en "ambiguas". Las imágenes de cada alumno quedan ordenadas por fecha de
+    modificación.
+    Retorna {"por_alumno": {posición: [rutas]}, "sin_asignar": [rutas], "ambiguas": [rutas]}.
+    """
+    matriculas = {}
+    iniciales = {}
+    for i, nombre in enumerate(datos["Nombre completo"]):
+        matricula = str(datos.get("Matrícula", [""] * (i + 1))[i]).strip().upper()
+        if matricula and matricula != "NAN":
+            matriculas.setdefault(matricula, []).append(i)
+        iniciales.setdefault(obtener_iniciales(nombre), []).append(i)
+    iniciales_unicas = {ini: pos[0] for ini, pos in iniciales.items() if ini and len(pos) == 1}
+
+    asignacion = {"por_alumno": {}, "sin_asignar": [], "ambiguas": []}
+    for ruta in sorted(rutas, key=lambda r: (os.path.getmtime(r), os.path.basename(r))):
+        palabras = _palabras_archivo(os.path.basename(ruta))
+        candidatos = {i for m in palabras & matriculas.keys() for i in matriculas[m]}
+        if not candidatos:
+            candidatos = {iniciales_unicas[p] for p in palabras if p in iniciales_unicas}
+        if len(candidatos) == 1:
+            asignacion["por_alumno"].setdefault(candidatos.pop(), []).append(ruta)
+        elif candidatos:
+            asignacion["ambiguas"].append(ruta)
+        else:
+            asignacion["sin_asignar"].append(ruta)
+    return asignacion
+
+
+def asignar_imagenes_por_alumno(carpeta: str, datos) -> dict:
+    """Aplica asignar_rutas_por_alumno a las imágenes de entrevista de `carpeta`."""
+    with os.scandir(carpeta) as it:
+        rutas = [
+            e.path for e in it
+            if e.is_file() and not e.name.startswith((".", "~$")) and e.name.lower().endswith(EXTENSIONES_ENTREVISTA)
+        ]
+    return asignar_rutas_por_alumno(rutas, datos)
+
+
+def ingestar_entrevistas_carpeta(datos, carpeta_imagenes: str, progreso=None, registro_tiempos=None) -> dict:
+    """
+    Toma todas las fotos de entrevista de una sola carpeta, las asigna a cada alumno
+    (asignar_imagenes_por_alumno) y las inserta en su '3_Entrevista extendida_' en paralelo.
+    Retorna {"resultados": [...de insertar_entrevistas_lote], "sin_documento": [nombres],
+             "sin_asignar": [rutas], "ambiguas": [rutas]}.
+    """
+    propio = registro_tiempos is None
+    if propio:
+        registro_tiempos = RegistroTiempos("entrevistas")
+    if progreso is not None:
+        progreso.mensaje("Asignando imágenes...")
+    with registro_tiempos.alumno(ALUMNO_LOTE), medir_etapa(ETAPA_CARPETA):
+        asignacion = asignar_imagenes_por_alumno(carpeta_imagenes, datos)
+
+    pendientes = []
+    sin_documento = []
+    for idx, rutas in sorted(asignacion["por_alumno"].items()):
+        nombre = datos["Nombre completo"][idx]
+        matricula = datos.get("Matrícula", [""] * (idx + 1))[idx]
+        programa = datos.get("Programa", [""] * (idx + 1))[idx]
+        try:
+            with registro_tiempos.alumno(nombre), medir_etapa(ETAPA_CARPETA):
+                ruta_alumno = localizar_carpeta_final_alumno(ruta_carpeta_global, matricula, nombre.upper(), programa)
+                ruta_docx = encontrar_archivo_entrevista(ruta_alumno)
+        except Exception:
+            ruta_docx = None
+        if ruta_docx:
+            pendientes.append((nombre, ruta_docx, rutas))
+        else:
+            sin_documento.append(nombre)
+
+    ingesta = {
+        "resultados": insertar_entrevistas_lote(pendientes, progreso, registro_tiempos),
+        "sin_documento": sin_documento,
+        "sin_asignar": asignacion["sin_asignar"],
+        "ambiguas": asignacion["ambiguas"],
+    }
+    if propio:
+        registro_tiempos.terminar()
+    return ingesta
+
+
+def resumen_entrevistas(resultados: list, ingesta=None) -> str:
+    """Arma el texto de resumen de las entrevistas por lote (y de la carpeta, si se dio)."""
+    ok = [r for r in resultados if r["estado"] == "ok"]
+    lineas = [f"Entrevistas actualizadas: {len(ok)} ({sum(r['imagenes'] for r in ok)} imágenes)"]
+    cancelados = sum(1 for r in resultados if r["estado"] == "cancelado")
+    if cancelados:
+        lineas.append(f"Sin procesar (cancelado): {cancelados}")
+    if ingesta:
+        if ingesta["sin_documento"]:
+            lineas.append(f"Alumnos sin archivo de entrevista: {', '.join(ingesta['sin_documento'][:10])}")
+        for clave, texto in (("sin_asignar", "Imágenes sin alumno"), ("ambiguas", "Imágenes de varios alumnos")):
+            if ingesta[clave]:
+                nombres = ", ".join(os.path.basename(r) for r in ingesta[clave][:10])
+                lineas.append(f"{texto} ({len(ingesta[clave])}): {nombres}")
+    lineas += [f"• {r['alumno']}: {r['error']}" for r in resultados if r["estado"] == "error"]
+    return "\n".join(lineas)
 
-    except Exception as e:
-        messagebox.showerror("Error", f"Ocurrió un problema al generar las entrevistas: {e}")
 
 def previsualizar_datos_excel(datos_fila):
     """
@@ -1461,27 +4073,330 @@ def formatear_hora(valor):
         return "00:00"
 
 
+# Etiquetas WordprocessingML usadas por el motor de reemplazo
+_W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+_W_P = f"{{{_W_NS}}}p"
+_W_T = f"{{{_W_NS}}}t"
+_XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+
+
+@functools.lru_cache(maxsize=32)
+def _patron_marcadores(claves: tuple):
+    # Los marcadores más largos primero para que ninguno "gane" a otro que lo contenga
+    return re.compile("|".join(re.escape(k) for k in sorted(claves, key=len, reverse=True)))
+
+
+def compilar_marcadores(markers: dict):
+    """Compila el conjunto de marcadores en una sola expresión regular (cacheada por conjunto)."""
+    return _patron_marcadores(tuple(sorted(markers)))
+
+
+def reemplazar_en_xml(raiz, patron, valores: dict) -> int:
+    """
+    Reemplaza los marcadores en los nodos de texto (w:t) de un elemento XML de Word.
+    Cada párrafo se recorre una vez: se une su texto, se buscan todos los marcadores con
+    `patron` y cada coincidencia se escribe en el primer nodo que toca, vaciando la parte
+    que ocupaba en los siguientes (marcadores partidos entre varios runs).
+    Retorna la cantidad de reemplazos hechos.
+    """
+    total = 0
+    for p in raiz.iter(_W_P):
+        # Solo los textos propios del párrafo (no los de cuadros de texto anidados)
+        nodos = [t for t in p.iter(_W_T) if next(t.iterancestors(_W_P)) is p]
+        if not nodos:
+            continue
+        textos = [t.text or "" for t in nodos]
+        completo = "".join(textos)
+        coincidencias = list(patron.finditer(completo))
+        if not coincidencias:
+            continue
+
+        inicios = []
+        pos = 0
+        for texto in textos:
+            inicios.append(pos)
+            pos += len(texto)
+
+        # De atrás hacia adelante para que las posiciones anteriores sigan siendo válidas
+        for m in reversed(coincidencias):
+            i = bisect_right(inicios, m.start()) - 1
+            j = bisect_right(inicios, m.end() - 1) - 1
+            valor = valores[m.group(0)]
+            if i == j:
+                textos[i] = textos[i][:m.start() - inicios[i]] + valor + textos[i][m.end() - inicios[i]:]
+            else:
+                textos[i] = textos[i][:m.start() - inicios[i]] + valor
+                for k in range(i + 1, j):
+                    textos[k] = ""
+                textos[j] = textos[j][m.end() - inicios[j]:]
+            total += 1
+
+        for t, texto in zip(nodos, textos):
+            if (t.text or "") != texto:
+                t.text = texto
+                if texto != texto.strip():
+                    t.set(_XML_SPACE, "preserve")
+    return total
+
+
+def _elementos_con_texto(doc):
+    """Cuerpo del documento (incluye tablas) más encabezados y pies de página."""
+    yield doc.element
+    for rel in doc.part.rels.values():
+        if not rel.is_external and rel.reltype in (RT.HEADER, RT.FOOTER):
+            yield rel.target_part.element
+
+
 def reemplazar_en_docx(doc, markers):
-    for para in doc.paragraphs:
-        for mk, txt in markers.items():
-            if mk in para.text:
-                inline = para.runs
-                for i in range(len(inline)):
-                    if mk in inline[i].text:
-                        text = inline[i].text.replace(mk, str(txt))
-                        inline[i].text = text
-
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                for para in cell.paragraphs:
-                    for mk, txt in markers.items():
-                        if mk in para.text:
-                            inline = para.runs
-                            for i in range(len(inline)):
-                                if mk in inline[i].text:
-                                    text = inline[i].text.replace(mk, str(txt))
-                                    inline[i].text = text
+    """Reemplaza los marcadores en cuerpo, tablas, encabezados y pies en una sola pasada."""
+    if not markers:
+        return 0
+    patron = compilar_marcadores(markers)
+    valores = {mk: str(txt) for mk, txt in markers.items()}
+    return sum(reemplazar_en_xml(raiz, patron, valores) for raiz in _elementos_con_texto(doc))
+
+
+# -------------------------------------------------------------------------------
+# Caché de plantillas compiladas
+# -------------------------------------------------------------------------------
+
+# Forma genérica de un marcador ({NOMBRE}, {TitularDir}, {SITUACIÓN}, ...)
+_PATRON_MARCADOR_GENERICO = re.compile(r"\{[^{}\s<>&]{1,40}\}")
+# Partes XML de la plantilla donde puede haber marcadores
+_PARTES_CON_MARCADORES = re.compile(r"^word/(document|header\d*|footer\d*)\.xml$")
+# Caracteres de uso privado para delimitar los marcadores al serializar
+_INICIO_MARCA, _FIN_MARCA = "\ue000", "\ue001"
+_PATRON_MARCA = re.compile(f"{_INICIO_MARCA}([^{_FIN_MARCA}]*){_FIN_MARCA}")
+
+# {sha1 del archivo: plantilla compilada}
+_cache_plantillas = {}
+# {(ruta, tamaño, mtime_ns): sha1} para no volver a leer archivos que no cambiaron
+_hash_por_archivo = {}
+
+
+class _MarcaMarcador(dict):
+    """Valores para reemplazar_en_xml que dejan cada marcador delimitado en un solo nodo."""
+    def __missing__(self, marcador):
+        return _INICIO_MARCA + marcador + _FIN_MARCA
+
+
+def hash_archivo(ruta: str) -> str:
+    """SHA-1 del contenido; se recalcula solo si cambian tamaño o mtime."""
+    st = os.stat(ruta)
+    clave = (os.path.abspath(ruta), st.st_size, st.st_mtime_ns)
+    if clave not in _hash_por_archivo:
+        with open(ruta, "rb") as f:
+            _hash_por_archivo[clave] = hashlib.sha1(f.read()).hexdigest()
+    return _hash_por_archivo[clave]
+
+
+def compilar_plantilla(ruta_plantilla: str) -> dict:
+    """
+    Lee una plantilla .docx UNA vez y la deja lista para producir documentos:
+        {"miembros": [(ZipInfo, bytes ya comprimidos) en el orden del zip],
+         "partes": {nombre de parte XML: [literal, marcador, literal, marcador, ..., literal]}}
+    Los marcadores partidos entre runs se unen en un solo nodo antes de ubicarlos.
+    El resultado se guarda en caché por hash del archivo.
+    """
+    sha1 = hash_archivo(ruta_plantilla)
+    if sha1 in _cache_plantillas:
+        return _cache_plantillas[sha1]
+
+    miembros = []
+    partes = {}
+    with zipfile.ZipFile(ruta_plantilla) as zf:
+        for info in zf.infolist():
+            miembros.append((info, _leer_miembro_crudo(zf, info)))
+            if not _PARTES_CON_MARCADORES.match(info.filename):
+                continue
+            raiz = etree.fromstring(zf.read(info))
+            if not reemplazar_en_xml(raiz, _PATRON_MARCADOR_GENERICO, _MarcaMarcador()):
+                continue
+            # Los nodos con marcador conservan espacios al sustituir
+            for t in raiz.iter(_W_T):
+                if t.text and _INICIO_MARCA in t.text:
+                    t.set(_XML_SPACE, "preserve")
+            xml = etree.tostring(raiz, xml_declaration=True, encoding="UTF-8", standalone=True).decode("utf-8")
+            partes[info.filename] = _PATRON_MARCA.split(xml)
+
+    compilada = {"miembros": miembros, "partes": partes}
+    _cache_plantillas[sha1] = compilada
+    return compilada
+
+
+def cargar_plantillas(ruta_plantillas: str) -> dict:
+    """
+    Compila (o toma de la caché) todas las plantillas .docx de la carpeta.
+    Retorna {hash: ruta de la plantilla}; se calcula una vez por lote y se pasa a las tareas.
+    """
+    plantillas = {}
+    if not ruta_plantillas or not os.path.isdir(ruta_plantillas):
+        return plantillas
+    for root_dir, _, files in os.walk(ruta_plantillas):
+        for f in files:
+            if f.lower().endswith(".docx") and not f.startswith("~$"):
+                ruta = os.path.join(root_dir, f)
+                try:
+                    compilar_plantilla(ruta)
+                    plantillas[hash_archivo(ruta)] = ruta
+                except Exception:
+                    # Una plantilla dañada se procesa por la vía normal (python-docx)
+                    continue
+    return plantillas
+
+
+def plantilla_compilada_para(ruta_doc: str, plantillas: dict):
+    """
+    Si `ruta_doc` es una copia sin modificar de alguna de `plantillas` (de cargar_plantillas),
+    devuelve la plantilla compilada; si no, None. En un proceso del pool la plantilla se
+    compila la primera vez que se necesita (si no venía ya en la caché heredada).
+    """
+    if not plantillas:
+        return None
+    sha1 = hash_archivo(ruta_doc)
+    if sha1 not in plantillas:
+        return None
+    return _cache_plantillas.get(sha1) or compilar_plantilla(plantillas[sha1])
+
+
+def _leer_miembro_crudo(zf: zipfile.ZipFile, info: zipfile.ZipInfo) -> bytes:
+    """Bytes del miembro tal como están en el zip (comprimidos), sin descomprimirlos."""
+    zf.fp.seek(info.header_offset)
+    cabecera = struct.unpack(zipfile.structFileHeader, zf.fp.read(zipfile.sizeFileHeader))
+    zf.fp.seek(cabecera[zipfile._FH_FILENAME_LENGTH] + cabecera[zipfile._FH_EXTRA_FIELD_LENGTH], os.SEEK_CUR)
+    return zf.fp.read(info.compress_size)
+
+
+def _escribir_miembro_crudo(zf: zipfile.ZipFile, info: zipfile.ZipInfo, crudo: bytes):
+    """Agrega a `zf` (abierto para escribir) un miembro ya comprimido, copiando sus bytes tal cual."""
+    info = copy.copy(info)
+    # Sin descriptor de datos: CRC y tamaños van en la cabecera local
+    info.flag_bits &= ~0x08
+    info.header_offset = zf.fp.tell()
+    zf.fp.write(info.FileHeader())
+    zf.fp.write(crudo)
+    zf.filelist.append(info)
+    zf.NameToInfo[info.filename] = info
+    zf.start_dir = zf.fp.tell()
+
+
+def _escribir_zip(ruta_destino: str, miembros):
+    """
+    Escribe un zip en un temporal de la misma carpeta y lo reemplaza de forma atómica.
+    `miembros`: (ZipInfo, datos, crudo) en orden; con `crudo` el miembro se copia tal cual
+    (sin volver a comprimir) y si no, se escriben `datos` con la compresión de `info`.
+    """
+    fd, ruta_tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(ruta_destino)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f, zipfile.ZipFile(f, "w") as zf:
+            for info, datos, crudo in miembros:
+                if crudo is not None:
+                    _escribir_miembro_crudo(zf, info, crudo)
+                    continue
+                nuevo = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+                nuevo.compress_type = info.compress_type
+                zf.writestr(nuevo, datos)
+        os.replace(ruta_tmp, ruta_destino)
+    except BaseException:
+        if os.path.exists(ruta_tmp):
+            os.remove(ruta_tmp)
+        raise
+
+
+def _sin_declaracion_xml(datos: bytes) -> bytes:
+    """Quita la declaración <?xml ...?> (python-docx la escribe distinto que Word)."""
+    if datos.startswith(b"<?xml"):
+        fin = datos.find(b"?>")
+        if fin != -1:
+            return datos[fin + 2:].lstrip(b"\r\n")
+    return datos
+
+
+def _parte_sin_cambios(zf: zipfile.ZipFile, info: zipfile.ZipInfo, datos: bytes) -> bool:
+    """True si `datos` es el mismo contenido que el miembro `info` del zip original."""
+    if info.file_size == len(datos) and info.CRC == zlib.crc32(datos):
+        return True
+    if not info.filename.endswith((".xml", ".rels")):
+        return False
+    return _sin_declaracion_xml(zf.read(info)) == _sin_declaracion_xml(datos)
+
+
+def guardar_docx(doc, ruta_docx: str):
+    """
+    Guarda `doc` (python-docx, abierto desde `ruta_docx`) reescribiendo solo las partes que
+    cambiaron: las demás (las imágenes, por ejemplo) se copian del zip original sin volver
+    a comprimirlas. Escribe en un temporal y lo reemplaza de forma atómica.
+    Depende de detalles internos de python-docx (PackageWriter) y de zipfile, por eso
+    python-docx está fijado en requirements.txt. Si el original ya no es un zip legible o
+    esos detalles cambiaron, se registra el aviso y se usa doc.save; los demás errores
+    (p. ej. PermissionError con el Word abierto) se propagan.
+    Retorna la cantidad de partes reescritas, o None si se usó doc.save.
+    """
+    try:
+        paquete = doc.part.package
+        for parte in paquete.parts:
+            parte.before_marshal()
+        # Las mismas partes, en el mismo orden, que escribiría doc.save
+        nuevas = []
+        colector = SimpleNamespace(write=lambda uri, blob: nuevas.append((uri.membername, blob)))
+        escritor = docx.opc.pkgwriter.PackageWriter
+        escritor._write_content_types_stream(colector, paquete.parts)
+        escritor._write_pkg_rels(colector, paquete.rels)
+        escritor._write_parts(colector, paquete.parts)
+
+        miembros = []
+        reescritas = 0
+        with zipfile.ZipFile(ruta_docx) as origen:
+            originales = {info.filename: info for info in origen.infolist()}
+            for nombre, datos in nuevas:
+                info = originales.get(nombre)
+                if info is not None and _parte_sin_cambios(origen, info, datos):
+                    miembros.append((info, None, _leer_miembro_crudo(origen, info)))
+                    continue
+                if info is None:
+                    info = zipfile.ZipInfo(nombre, date_time=datetime.now().timetuple()[:6])
+                    # Las imágenes nuevas ya vienen comprimidas
+                    es_imagen = nombre.lower().endswith((".jpg", ".jpeg", ".png"))
+                    info.compress_type = zipfile.ZIP_STORED if es_imagen else zipfile.ZIP_DEFLATED
+                miembros.append((info, datos, None))
+                reescritas += 1
+        _escribir_zip(ruta_docx, miembros)
+    except (zipfile.BadZipFile, FileNotFoundError, KeyError, AttributeError, TypeError, struct.error) as e:
+        # _escribir_zip ya borró su temporal si falló a medias
+        registrar_evento(
+            f"Guardado parcial no disponible para {os.path.basename(ruta_docx)}; se usa doc.save: {e!r}",
+            "advertencia", docx=ruta_docx,
+        )
+        doc.save(ruta_docx)
+        return None
+    return reescritas
+
+
+def renderizar_plantilla(compilada: dict, markers: dict, ruta_destino: str) -> int:
+    """
+    Produce el documento de un alumno a partir de la plantilla compilada: solo sustituye
+    los marcadores en las partes ya ubicadas y escribe el zip. Los marcadores que no
+    están en `markers` se dejan como estaban. Retorna la cantidad de reemplazos.
+    """
+    reemplazos = 0
+    partes = {}
+    for nombre, segmentos in compilada["partes"].items():
+        piezas = []
+        for k, segmento in enumerate(segmentos):
+            if k % 2 == 0:
+                piezas.append(segmento)
+            elif segmento in markers:
+                piezas.append(escapar_xml(str(markers[segmento])))
+                reemplazos += 1
+            else:
+                piezas.append(segmento)
+        partes[nombre] = "".join(piezas).encode("utf-8")
+
+    _escribir_zip(ruta_destino, (
+        (info, partes[info.filename], None) if info.filename in partes else (info, None, crudo)
+        for info, crudo in compilada["miembros"]
+    ))
+    return reemplazos
 
 
 # -------------------------------------------------------------------------------
@@ -1495,18 +4410,30 @@ def ejecutar_y_ocultar(func, win):
 
 def iniciar_app():
     global root
+    marcar_inicio("definiciones del módulo")
     root = tk.Tk()
     root.title("Gestión de Expedientes")
     root.geometry("300x200")
-    
+    marcar_inicio("crear ventana raíz (Tk)")
+
     # Aplicar tema oscuro
     aplicar_estilo(root)
-    
+    marcar_inicio("aplicar estilo")
+
     root.withdraw()
     ventana_bienvenida()
+    marcar_inicio("construir ventana de bienvenida")
+    if PERFIL_INICIO:
+        root.after_idle(_reportar_inicio)
     root.mainloop()
 
 
+def _reportar_inicio():
+    """Se ejecuta cuando la bienvenida ya está pintada y el bucle de eventos libre."""
+    marcar_inicio("primer ciclo del bucle de eventos")
+    print(reporte_inicio(), file=sys.stderr)
+
+
 def ventana_bienvenida():
     win = crear_ventana_toplevel("Bienvenida", ancho=450, alto=300)
 
@@ -1526,5 +4453,152 @@ def ventana_bienvenida():
     ).pack(pady=20, ipadx=10, ipady=5)
 
 
+# -------------------------------------------------------------------------------
+# Modo línea de comandos (lotes sin ventanas)
+# -------------------------------------------------------------------------------
+
+COMANDOS_CLI = ("crear", "llenar", "consolidado", "actividad", "reporte")
+
+
+def _seleccionar_alumnos(datos, matriculas):
+    """Subconjunto de `datos` con las matrículas indicadas, en el orden del trabajo."""
+    posiciones = {m.strip(): i for i, m in enumerate(datos["Matrícula"])}
+    faltantes = [m for m in matriculas if str(m).strip() not in posiciones]
+    indices = [posiciones[str(m).strip()] for m in matriculas if str(m).strip() in posiciones]
+    return {col: [datos[col][i] for i in indices] for col in datos}, faltantes
+
+
+def ejecutar_cli(argv) -> int:
+    """
+    Ejecuta crear / llenar / consolidado / actividad / reporte sin diálogos y escribe el resultado
+    en JSON (stdout o --salida). Código de salida: 0 sin errores, 1 con errores por alumno,
+    2 si no se pudo ejecutar.
+
+    Archivo de trabajo (--trabajo, JSON, opcional):
+        {"prefijo": "...", "tutor": "...",
+         "alumnos": [{"matricula": "...", "asistencia": "Sí|No|N/A|Tarea|Falta justificada",
+                      "actividad": "...", "evidencia": "ruta/imagen.jpg"}]}
+    Sin "alumnos" se procesa todo el Excel (excepto en 'actividad', que requiere asistencia).
+    'reporte' escribe el reporte de asistencia de todas las semanas en --reporte (por omisión,
+    en la carpeta maestra) y devuelve en "alumnos" la vista por alumno.
+    --normalizar-evidencias (actividad) reduce y recomprime las evidencias a JPEG sin
+    metadatos en lugar de copiar el original (con pérdida).
+    El resultado incluye "tiempos" (RegistroTiempos.resumen) con los tiempos por etapa.
+    """
+    import argparse
+
+    global MODO_HEADLESS, ruta_excel_principal, ruta_carpeta_global, ruta_plantillas
+
+    parser = argparse.ArgumentParser(prog="Expedientes", description="Procesa expedientes por lote sin ventanas.")
+    parser.add_argument("comando", choices=COMANDOS_CLI)
+    parser.add_argument("--excel", required=True, help="Excel de alumnos (también es el Excel de reportes)")
+    parser.add_argument("--carpeta", required=True, help="Carpeta maestra de expedientes")
+    parser.add_argument("--plantillas", help="Carpeta de plantillas (crear)")
+    parser.add_argument("--tutor", help="Tutor para llenar/consolidar/registrar")
+    parser.add_argument("--prefijo", help="Prefijo antes de '@' en la carpeta interna (crear)")
+    parser.add_argument("--trabajo", help="Archivo JSON con alumnos y asistencia")
+    parser.add_argument("--salida", help="Escribir el resultado JSON en este archivo en lugar de stdout")
+    parser.add_argument("--reporte", help="Excel donde se escribe el reporte de asistencia (reporte)")
+    parser.add_argument("--normalizar-evidencias", action="store_true",
+                        help="Reducir y recomprimir las evidencias a JPEG sin metadatos (actividad; con pérdida)")
+    args = parser.parse_args(argv)
+
+    MODO_HEADLESS = True
+    resultado = {"comando": args.comando, "ok": False, "alumnos": [], "errores": []}
+    stdout = sys.stdout
+    # Los mensajes de avance van a stderr; stdout queda solo para el resultado JSON
+    sys.stdout = sys.stderr
+
+    def _terminar(codigo):
+        sys.stdout = stdout
+        texto = json.dumps(resultado, ensure_ascii=False, indent=2, default=str)
+        if args.salida:
+            with open(args.salida, "w", encoding="utf-8") as f:
+                f.write(texto)
+        else:
+            print(texto)
+        return codigo
+
+    try:
+        trabajo = {}
+        if args.trabajo:
+            with open(args.trabajo, "r", encoding="utf-8") as f:
+                trabajo = json.load(f)
+        tutor = args.tutor or trabajo.get("tutor")
+        prefijo = args.prefijo or trabajo.get("prefijo")
+
+        ruta_excel_principal = args.excel
+        ruta_carpeta_global = args.carpeta
+        ruta_plantillas = args.plantillas
+
+        datos = leer_roster(args.excel)
+        if not datos:
+            raise ValueError("No se encontraron alumnos con nombre válido en el archivo.")
+
+        por_alumno = {}
+        if "alumnos" in trabajo:
+            por_alumno = {str(a["matricula"]).strip(): a for a in trabajo["alumnos"]}
+            datos, faltantes = _seleccionar_alumnos(datos, list(por_alumno))
+            resultado["errores"] += [f"Matrícula no encontrada en el Excel: {m}" for m in faltantes]
+        elif args.comando == "actividad":
+            raise ValueError("'actividad' requiere --trabajo con la asistencia de cada alumno.")
+
+        if args.comando in ("llenar", "consolidado", "actividad") and not tutor:
+            raise ValueError(f"'{args.comando}' requiere --tutor (o \"tutor\" en el trabajo).")
+
+        tiempos = RegistroTiempos(args.comando)
+
+        if args.comando == "crear":
+            if not (args.plantillas and prefijo):
+                raise ValueError("'crear' requiere --plantillas y --prefijo.")
+            os.makedirs(args.carpeta, exist_ok=True)
+            resumen = crear_expedientes_lote(datos, args.carpeta, args.plantillas, prefijo, tutor, tiempos)
+            resultado["alumnos"] = datos["Nombre completo"]
+            resultado["documentos"] = [r for r, _ in resumen["archivos"]]
+            resultado["errores"] += [f"{r}: {e}" for r, e in resumen["fallos"]]
+
+        elif args.comando == "llenar":
+            resumen = llenar_documentos_lote(datos, args.carpeta, tutor, registro_tiempos=tiempos)
+            resultado["alumnos"] = datos["Nombre completo"]
+            resultado["documentos"] = [r for r, _ in resumen["archivos"]]
+            resultado["errores"] += [f"{r}: {e}" for r, e in resumen["fallos"]]
+            resultado["errores"] += [f"No se encontró la carpeta de {n}" for n in resumen["sin_carpeta"]]
+
+        elif args.comando == "consolidado":
+            resultado["alumnos"] = consolidar_lote(datos, tutor, args.excel, registro_tiempos=tiempos)
+            resultado["errores"] += [f"{r['alumno']}: {r['error']}" for r in resultado["alumnos"] if r["estado"] == "error"]
+
+        elif args.comando == "actividad":
+            entradas = []
+            for matricula in datos["Matrícula"]:
+                tarea = por_alumno[str(matricula).strip()]
+                entradas.append({"tutor": tarea.get("tutor", tutor), "asistencia": tarea.get("asistencia"),
+                                 "actividad": tarea.get("actividad"), "evidencia": tarea.get("evidencia")})
+            resultado["alumnos"] = registrar_actividades_lote(
+                datos, entradas, args.excel, registro_tiempos=tiempos,
+                normalizar=args.normalizar_evidencias or NORMALIZAR_EVIDENCIAS,
+            )
+            resultado["errores"] += [f"{r['alumno']}: {r['error']}" for r in resultado["alumnos"] if r["estado"] == "error"]
+
+        elif args.comando == "reporte":
+            ruta_reporte = args.reporte or os.path.join(args.carpeta, f"Reporte de asistencia {datetime.now():%Y-%m-%d}.xlsx")
+            reporte = generar_reporte_asistencia(args.excel, datos, ruta_reporte, tiempos)
+            resultado["reporte"] = ruta_reporte
+            resultado["alumnos"] = json.loads(reporte["por_alumno"].to_json(orient="records", date_format="iso", force_ascii=False))
+
+        resultado["tiempos"] = tiempos.terminar()
+
+    except Exception as e:
+        resultado["errores"].append(str(e))
+        return _terminar(2)
+
+    resultado["ok"] = not resultado["errores"]
+    return _terminar(0 if resultado["ok"] else 1)
+
+
 if __name__ == "__main__":
+    # Necesario para el pool de procesos dentro de la App empaquetada con PyInstaller
+    multiprocessing.freeze_support()
+    if len(sys.argv) > 1 and sys.argv[1] in COMANDOS_CLI:
+        sys.exit(ejecutar_cli(sys.argv[1:]))
     iniciar_app()
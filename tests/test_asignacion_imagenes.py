@@ -0,0 +1,36 @@
+import main
+
+
+DATOS = {"Nombre completo": ["Ana Uno", "Beto Dos", "Caro Tres"], "Matrícula": ["A001", "A002", "A003"]}
+
+
+def _imagenes(tmp_path, *nombres):
+    rutas = []
+    for nombre in nombres:
+        ruta = tmp_path / nombre
+        ruta.write_bytes(b"")
+        rutas.append(str(ruta))
+    return rutas
+
+
+def test_sin_coincidencia_no_se_asigna_por_posicion(tmp_path):
+    rutas = _imagenes(tmp_path, "A001_1.jpg", "A001_2.jpg", "foto.jpg")
+    asignacion = main.asignar_rutas_por_alumno(rutas, DATOS)
+    assert asignacion["por_alumno"] == {0: rutas[:2]}
+    assert asignacion["sin_asignar"] == [rutas[2]]
+
+
+def test_iniciales_unicas_y_ambiguas(tmp_path):
+    datos = {"Nombre completo": ["Ana Uno", "Beto Dos", "Ana Ulloa"], "Matrícula": ["", "", ""]}
+    rutas = _imagenes(tmp_path, "BD taller.jpg", "AU.jpg")
+    asignacion = main.asignar_rutas_por_alumno(rutas, datos)
+    assert asignacion["por_alumno"] == {1: [rutas[0]]}
+    # AU lo comparten dos alumnos: no cuenta como clave
+    assert asignacion["sin_asignar"] == [rutas[1]]
+
+
+def test_matricula_de_varios_alumnos_es_ambigua(tmp_path):
+    rutas = _imagenes(tmp_path, "A001 A002.jpg")
+    asignacion = main.asignar_rutas_por_alumno(rutas, DATOS)
+    assert asignacion["por_alumno"] == {}
+    assert asignacion["ambiguas"] == rutas
@@ -0,0 +1,44 @@
+from datetime import datetime, time
+
+import pandas as pd
+
+import main
+
+
+def test_fechas_de_excel_texto_y_vacias():
+    df = pd.DataFrame({
+        "Fecha de atención": [
+            datetime(2025, 1, 6, 8, 0), 45663, "07/01/2025", "45665", pd.NaT, "pendiente", 45663.75, "2025-01-09",
+        ],
+        "Hora": ["09:30", 0.5, None, None, "10:00", None, None, time(16, 5)],
+    })
+    df = main.normalizar_fechas_reporte(df)
+
+    assert df[main.COL_FECHA_TEXTO].tolist() == [
+        "06/01/2025 09:30",  # la hora de la columna 'Hora' reemplaza la de la fecha
+        "06/01/2025 12:00",  # número de serie de Excel + fracción de día
+        "07/01/2025",        # sin hora: solo la fecha
+        "08/01/2025",        # número de serie escrito como texto
+        "",                  # celda vacía (NaT)
+        "pendiente",         # texto no reconocido: se conserva
+        "06/01/2025 18:00",  # la fracción del número de serie es la hora
+        "09/01/2025 16:05",
+    ]
+    fechas = df[main.COL_FECHA_HORA]
+    assert fechas[1] == pd.Timestamp(2025, 1, 6, 12, 0)
+    assert fechas[4] is pd.NaT and fechas[5] is pd.NaT
+
+
+def test_sin_columna_de_fecha():
+    df = main.normalizar_fechas_reporte(pd.DataFrame({"Nombre": ["Ana"]}))
+    assert df[main.COL_FECHA_TEXTO].tolist() == [""]
+    assert df[main.COL_FECHA_HORA].isna().all()
+
+
+def test_clave_fecha_seguimiento():
+    assert main.clave_fecha_seguimiento("6/1/2025 9:00:00") == "06/01/2025 09:00"
+    assert main.clave_fecha_seguimiento(" 06/01/2025 09:00 ") == "06/01/2025 09:00"
+    assert main.clave_fecha_seguimiento("06/01/2025 nan") == "06/01/2025"
+    assert main.clave_fecha_seguimiento("06/01/2025 NaT") == "06/01/2025"
+    assert main.clave_fecha_seguimiento("6/1/2025") == "06/01/2025"
+    assert main.clave_fecha_seguimiento("pendiente") == "pendiente"
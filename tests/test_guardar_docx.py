@@ -0,0 +1,113 @@
+import io
+import zipfile
+
+import docx
+from PIL import Image
+
+import main
+
+
+def _png(color):
+    buf = io.BytesIO()
+    Image.new("RGB", (40, 20), color).save(buf, "PNG")
+    buf.seek(0)
+    return buf
+
+
+def _documento(ruta):
+    doc = docx.Document()
+    doc.add_paragraph("Cuerpo original")
+    doc.add_picture(_png("red"))
+    seccion = doc.sections[0]
+    seccion.header.paragraphs[0].text = "Encabezado original"
+    seccion.footer.paragraphs[0].text = "Pie original"
+    doc.save(ruta)
+
+
+def _reabrir(ruta):
+    with zipfile.ZipFile(ruta) as zf:
+        assert zf.testzip() is None
+    return docx.Document(ruta)
+
+
+def _crudo(ruta, nombre):
+    with zipfile.ZipFile(ruta) as zf:
+        return main._leer_miembro_crudo(zf, zf.getinfo(nombre))
+
+
+def test_sin_cambios_no_reescribe_partes(tmp_path):
+    ruta = str(tmp_path / "a.docx")
+    _documento(ruta)
+    imagen_antes = _crudo(ruta, "word/media/image1.png")
+
+    assert main.guardar_docx(docx.Document(ruta), ruta) == 0
+    doc = _reabrir(ruta)
+    assert doc.paragraphs[0].text == "Cuerpo original"
+    assert _crudo(ruta, "word/media/image1.png") == imagen_antes
+
+
+def test_cuerpo_editado(tmp_path):
+    ruta = str(tmp_path / "a.docx")
+    _documento(ruta)
+    imagen_antes = _crudo(ruta, "word/media/image1.png")
+
+    doc = docx.Document(ruta)
+    doc.paragraphs[0].text = "Cuerpo editado"
+    doc.add_paragraph("Renglón nuevo")
+    assert main.guardar_docx(doc, ruta) >= 1
+
+    doc = _reabrir(ruta)
+    assert [p.text for p in doc.paragraphs if p.text] == ["Cuerpo editado", "Renglón nuevo"]
+    assert len(doc.inline_shapes) == 1
+    # La imagen sin cambios se copia tal cual, sin volver a comprimir
+    assert _crudo(ruta, "word/media/image1.png") == imagen_antes
+
+
+def test_imagen_agregada(tmp_path):
+    ruta = str(tmp_path / "a.docx")
+    _documento(ruta)
+
+    doc = docx.Document(ruta)
+    doc.add_picture(_png("blue"))
+    main.guardar_docx(doc, ruta)
+
+    doc = _reabrir(ruta)
+    assert len(doc.inline_shapes) == 2
+    colores = set()
+    for forma in doc.inline_shapes:
+        rid = forma._inline.graphic.graphicData.pic.blipFill.blip.embed
+        blob = doc.part.related_parts[rid].blob
+        colores.add(Image.open(io.BytesIO(blob)).getpixel((0, 0)))
+    assert colores == {(255, 0, 0), (0, 0, 255)}
+
+
+def test_encabezado_y_pie_editados(tmp_path):
+    ruta = str(tmp_path / "a.docx")
+    _documento(ruta)
+
+    doc = docx.Document(ruta)
+    doc.sections[0].header.paragraphs[0].text = "Encabezado editado"
+    doc.sections[0].footer.paragraphs[0].text = "Pie editado"
+    main.guardar_docx(doc, ruta)
+
+    doc = _reabrir(ruta)
+    assert doc.sections[0].header.paragraphs[0].text == "Encabezado editado"
+    assert doc.sections[0].footer.paragraphs[0].text == "Pie editado"
+    assert doc.paragraphs[0].text == "Cuerpo original"
+
+
+def test_original_ilegible_usa_doc_save_y_lo_registra(tmp_path, monkeypatch):
+    ruta = str(tmp_path / "a.docx")
+    _documento(ruta)
+    eventos = []
+    monkeypatch.setattr(main, "registrar_evento", lambda mensaje, nivel="info", **campos: eventos.append(nivel))
+
+    doc = docx.Document(ruta)
+    doc.paragraphs[0].text = "Guardado por doc.save"
+    with open(ruta, "wb") as f:
+        f.write(b"ya no es un zip")
+    assert main.guardar_docx(doc, ruta) is None
+
+    assert eventos == ["advertencia"]
+    assert _reabrir(ruta).paragraphs[0].text == "Guardado por doc.save"
+    assert [p.name for p in tmp_path.iterdir()] == ["a.docx"]
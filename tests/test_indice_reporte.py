@@ -0,0 +1,82 @@
+from datetime import datetime, time
+
+import openpyxl
+import pytest
+
+import main
+
+
+ENCABEZADO = [None, "Nombre", "Apellidos", "Matrícula", "Fecha de atención", "Hora", "Tema o asunto tratado"]
+
+
+def _libro(ruta):
+    """Portada sin tabla y dos semanas con la tabla en B11, como el reporte real."""
+    wb = openpyxl.Workbook()
+    wb.active.title = "Portada"
+    wb.active.append(["Reporte de tutorías"])
+    semanas = {
+        "Semana1": [
+            # Dos alumnas con el mismo nombre; la fila más reciente no es la última
+            ["Ana", "López", "A001", datetime(2025, 1, 7), time(9, 0), "A001 martes"],
+            ["Ana", "López", "A009", datetime(2025, 1, 8), time(9, 0), "A009 miércoles"],
+            ["Ana", "López", "A001", datetime(2025, 1, 6), time(9, 0), "A001 lunes"],
+            ["Beto", "Dos", "A002", datetime(2025, 1, 6), time(8, 0), "Beto temprano"],
+            ["Beto", "Dos", "A002", datetime(2025, 1, 6), time(12, 0), "Beto mediodía"],
+        ],
+        "Semana2": [
+            ["Beto", "Dos", "A002", datetime(2025, 1, 13), time(10, 0), "Beto semana 2"],
+        ],
+    }
+    for hoja, filas in semanas.items():
+        ws = wb.create_sheet(hoja)
+        ws.append(["Reporte semanal"])
+        for _ in range(9):
+            ws.append([])
+        ws.append(ENCABEZADO)
+        for fila in filas:
+            ws.append([None] + fila)
+    wb.save(ruta)
+
+
+def _tema(fila):
+    return fila["Tema o asunto tratado"]
+
+
+def test_fila_reciente_por_matricula_y_por_nombre(tmp_path):
+    ruta = str(tmp_path / "reportes.xlsx")
+    _libro(ruta)
+    indice = main.construir_indice_libro_reporte(ruta)
+    assert indice["hojas"] == ["Semana1", "Semana2"]
+    semana1 = indice["indices"]["Semana1"]
+
+    def fila(nombre, matricula=None):
+        return _tema(main.filtrar_fila_reciente_por_alumno(None, nombre, matricula, indice=semana1))
+
+    assert fila("Ana López", "A001") == "A001 martes"
+    assert fila("Ana López", " a009 ") == "A009 miércoles"
+    # Sin matrícula (o con una que no está en la hoja) se busca por nombre
+    assert fila("  ana lópez ") == "A009 miércoles"
+    assert fila("Ana López", "A777") == "A009 miércoles"
+    # Mismo día: decide la hora
+    assert fila("Beto Dos", "A002") == "Beto mediodía"
+
+
+def test_alumno_sin_registros(tmp_path):
+    ruta = str(tmp_path / "reportes.xlsx")
+    _libro(ruta)
+    indice = main.construir_indice_libro_reporte(ruta, ["Semana2"])
+    assert indice["hojas"] == ["Semana2"]
+    with pytest.raises(ValueError):
+        main.filtrar_fila_reciente_por_alumno(None, "Ana López", "A001", indice=indice["indices"]["Semana2"])
+
+
+def test_filas_del_alumno_en_todas_las_semanas(tmp_path):
+    ruta = str(tmp_path / "reportes.xlsx")
+    _libro(ruta)
+    indice = main.construir_indice_libro_reporte(ruta)
+    filas = main.filas_alumno_en_libro(indice, "Beto Dos", "A002")
+    assert [(hoja, _tema(fila)) for hoja, fila in filas] == [
+        ("Semana1", "Beto mediodía"), ("Semana2", "Beto semana 2"),
+    ]
+    assert [hoja for hoja, _ in main.filas_alumno_en_libro(indice, "Ana López", "A001")] == ["Semana1"]
+    assert main.construir_indice_libro_reporte(ruta, []) == {"hojas": [], "indices": {}}
@@ -0,0 +1,76 @@
+import docx
+
+import main
+
+
+MARKERS = {
+    "{NOMBRE}": "Ana López",
+    "{MATRICULA}": "A001",
+    "{AREA}": "Lectura & <escritura>",
+    "{TUTOR}": "Tutor Uno",
+}
+
+
+def _plantilla(ruta):
+    doc = docx.Document()
+    p = doc.add_paragraph()
+    for texto in ("Alumno: {NOM", "BRE} ({MATRICULA})"):
+        p.add_run(texto)
+    doc.add_paragraph("Área: {AREA}. Sin dato: {OTRO}")
+    doc.add_table(rows=1, cols=1).cell(0, 0).paragraphs[0].add_run("{NOMBRE}")
+    seccion = doc.sections[0]
+    seccion.header.paragraphs[0].add_run("Expediente {MATRICULA}")
+    seccion.footer.paragraphs[0].add_run("Tutor: {TU")
+    seccion.footer.paragraphs[0].add_run("TOR}")
+    doc.save(ruta)
+
+
+def _textos(ruta):
+    doc = docx.Document(ruta)
+    seccion = doc.sections[0]
+    return (
+        [p.text for p in doc.paragraphs],
+        [c.text for fila in doc.tables[0].rows for c in fila.cells],
+        [p.text for p in seccion.header.paragraphs],
+        [p.text for p in seccion.footer.paragraphs],
+    )
+
+
+def test_render_compilado_igual_a_python_docx(tmp_path):
+    plantilla = str(tmp_path / "plantilla.docx")
+    _plantilla(plantilla)
+
+    ruta_compilada = str(tmp_path / "compilada.docx")
+    reemplazos = main.renderizar_plantilla(main.compilar_plantilla(plantilla), MARKERS, ruta_compilada)
+
+    ruta_docx = str(tmp_path / "python_docx.docx")
+    doc = docx.Document(plantilla)
+    assert main.reemplazar_en_docx(doc, MARKERS) == reemplazos == 6
+    doc.save(ruta_docx)
+
+    assert _textos(ruta_compilada) == _textos(ruta_docx)
+    cuerpo, tabla, encabezado, pie = _textos(ruta_compilada)
+    assert cuerpo == ["Alumno: Ana López (A001)", "Área: Lectura & <escritura>. Sin dato: {OTRO}"]
+    assert tabla == ["Ana López"]
+    assert encabezado == ["Expediente A001"]
+    assert pie == ["Tutor: Tutor Uno"]
+
+
+def test_plantilla_compilada_solo_para_copias_intactas(tmp_path):
+    ruta_plantillas = tmp_path / "plantillas"
+    ruta_plantillas.mkdir()
+    plantilla = str(ruta_plantillas / "1_Ficha.docx")
+    _plantilla(plantilla)
+    plantillas = main.cargar_plantillas(str(ruta_plantillas))
+    assert list(plantillas.values()) == [plantilla]
+
+    copia = tmp_path / "copia.docx"
+    copia.write_bytes(open(plantilla, "rb").read())
+    assert main.plantilla_compilada_para(str(copia), plantillas) is main.compilar_plantilla(plantilla)
+
+    editada = str(tmp_path / "editada.docx")
+    doc = docx.Document(plantilla)
+    doc.add_paragraph("Nota del tutor")
+    doc.save(editada)
+    assert main.plantilla_compilada_para(editada, plantillas) is None
+    assert main.plantilla_compilada_para(str(copia), {}) is None
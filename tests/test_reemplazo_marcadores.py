@@ -0,0 +1,59 @@
+import docx
+
+import main
+
+
+def _parrafo(contenedor, *runs):
+    p = contenedor.add_paragraph()
+    for texto in runs:
+        p.add_run(texto)
+    return p
+
+
+def test_marcador_partido_entre_runs():
+    doc = docx.Document()
+    p = _parrafo(doc, "Alumno: {NOM", "BR", "E}, ", "grupo {GRUPO}")
+    assert main.reemplazar_en_docx(doc, {"{NOMBRE}": "Ana López", "{GRUPO}": "3B"}) == 2
+    assert p.text == "Alumno: Ana López, grupo 3B"
+    # El valor queda en el primer run que tocaba el marcador; los demás solo pierden su parte
+    assert [r.text for r in p.runs] == ["Alumno: Ana López", "", ", ", "grupo 3B"]
+
+
+def test_encabezado_pie_y_tablas():
+    doc = docx.Document()
+    seccion = doc.sections[0]
+    _parrafo(seccion.header, "Expediente de {MAT", "RICULA}")
+    _parrafo(seccion.footer, "Tutor: {TUTOR}")
+    celda = doc.add_table(rows=1, cols=1).cell(0, 0)
+    celda.paragraphs[0].add_run("{NOMBRE}")
+
+    markers = {"{MATRICULA}": "A001", "{TUTOR}": "Tutor Uno", "{NOMBRE}": "Ana"}
+    assert main.reemplazar_en_docx(doc, markers) == 3
+    assert seccion.header.paragraphs[-1].text == "Expediente de A001"
+    assert seccion.footer.paragraphs[-1].text == "Tutor: Tutor Uno"
+    assert celda.text == "Ana"
+
+
+def test_llaves_desconocidas_no_se_tocan():
+    doc = docx.Document()
+    p = _parrafo(doc, "{OTRO} {NOMBRE} {NOMBRE_COMPLETO} {", "}")
+    assert main.reemplazar_en_docx(doc, {"{NOMBRE}": "Ana"}) == 1
+    assert p.text == "{OTRO} Ana {NOMBRE_COMPLETO} {}"
+
+
+def test_valores_con_caracteres_xml(tmp_path):
+    ruta = str(tmp_path / "a.docx")
+    doc = docx.Document()
+    _parrafo(doc, "{AREA}")
+    main.reemplazar_en_docx(doc, {"{AREA}": 'Lectura & "escritura" <básica>'})
+    doc.save(ruta)
+    assert docx.Document(ruta).paragraphs[0].text == 'Lectura & "escritura" <básica>'
+
+
+def test_espacios_al_borde_se_conservan(tmp_path):
+    ruta = str(tmp_path / "a.docx")
+    doc = docx.Document()
+    _parrafo(doc, "{EDAD}", "fin")
+    main.reemplazar_en_docx(doc, {"{EDAD}": "18 años "})
+    doc.save(ruta)
+    assert docx.Document(ruta).paragraphs[0].text == "18 años fin"
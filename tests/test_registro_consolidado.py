@@ -0,0 +1,84 @@
+import os
+import zipfile
+
+import main
+
+
+_NS = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+_NS_R = 'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+
+
+def _libro_reporte(ruta, tema):
+    """Libro mínimo como lo guarda Excel: el texto de las celdas va en sharedStrings.xml."""
+    partes = {
+        "[Content_Types].xml": (
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            '<Override PartName="/xl/sharedStrings.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>'
+            '</Types>'
+        ),
+        "_rels/.rels": (
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+            '</Relationships>'
+        ),
+        "xl/workbook.xml": (
+            f'<workbook {_NS} {_NS_R}><sheets><sheet name="Semana1" sheetId="1" r:id="rId1"/></sheets></workbook>'
+        ),
+        "xl/_rels/workbook.xml.rels": (
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+            '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings" Target="sharedStrings.xml"/>'
+            '</Relationships>'
+        ),
+        "xl/worksheets/sheet1.xml": (
+            f'<worksheet {_NS}><sheetData>'
+            '<row r="1"><c r="A1" t="s"><v>0</v></c><c r="B1" t="s"><v>1</v></c><c r="C1" t="s"><v>2</v></c></row>'
+            '<row r="2"><c r="A2" t="s"><v>3</v></c><c r="B2" t="s"><v>4</v></c><c r="C2" t="s"><v>5</v></c></row>'
+            '</sheetData></worksheet>'
+        ),
+        "xl/sharedStrings.xml": (
+            f'<sst {_NS} count="6" uniqueCount="6">'
+            + "".join(f"<si><t>{t}</t></si>" for t in ("Nombre", "Apellidos", "Tema o asunto tratado", "Ana", "López", tema))
+            + "</sst>"
+        ),
+    }
+    with zipfile.ZipFile(ruta, "w", zipfile.ZIP_DEFLATED) as zf:
+        for nombre, xml in partes.items():
+            zf.writestr(nombre, '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>' + xml)
+
+
+def _reemplazar_en_miembro(ruta, miembro, viejo, nuevo):
+    """Reescribe el zip cambiando solo el contenido de `miembro`."""
+    with zipfile.ZipFile(ruta) as zf:
+        partes = [(info, zf.read(info)) for info in zf.infolist()]
+    with zipfile.ZipFile(ruta, "w", zipfile.ZIP_DEFLATED) as zf:
+        for info, datos in partes:
+            if info.filename == miembro:
+                datos = datos.replace(viejo, nuevo)
+            zf.writestr(info, datos)
+
+
+def test_editar_cadena_compartida_deja_la_hoja_pendiente(tmp_path):
+    ruta_excel = str(tmp_path / "reportes.xlsx")
+    ruta_docx = str(tmp_path / "alumno.docx")
+    open(ruta_docx, "wb").close()
+    _libro_reporte(ruta_excel, "Tema original")
+
+    hashes = main.hashes_hojas_excel(ruta_excel)
+    registro = {"alumnos": {"A001": {
+        "docx": ruta_docx, "mtime": os.stat(ruta_docx).st_mtime_ns, "hojas": dict(hashes),
+    }}}
+    assert main.hojas_pendientes(registro, "A001", ruta_docx, hashes) == []
+
+    with zipfile.ZipFile(ruta_excel) as zf:
+        hoja_antes = zf.read("xl/worksheets/sheet1.xml")
+    _reemplazar_en_miembro(ruta_excel, "xl/sharedStrings.xml", b"Tema original", b"Tema editado")
+    with zipfile.ZipFile(ruta_excel) as zf:
+        assert zf.read("xl/worksheets/sheet1.xml") == hoja_antes
+
+    hashes = main.hashes_hojas_excel(ruta_excel)
+    assert main.hojas_pendientes(registro, "A001", ruta_docx, hashes) == ["Semana1"]